@@ -15,31 +15,48 @@
 # You should have received a copy of the GNU General Public License
 # along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
 
+import signal
+#first of all, a SIGHUP from reload_daemon() before conf.watch() must not kill the daemon
+signal.signal(signal.SIGHUP, lambda signum, frame: None)
+
 import socket, pynmea2, time
 from w1thermsensor import W1ThermSensor
-from classes.conf import Conf
+from classes.conf import Conf, changed_sections
+from classes.metrics import Metrics
 
 conf=Conf()
+conf.watch()
 
 sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
-sensors_list=eval(conf.get('1W', 'DS18B20'))
+metrics=Metrics('1w')
+metrics.serve()
 
-sensors=[]
-for index,item in enumerate(sensors_list):
-	try:
-		type=W1ThermSensor.THERM_SENSOR_DS18B20
-		for sensor in W1ThermSensor.get_available_sensors():
-			if item[3] == sensor.id:
-				type = sensor.type
-		
-		sensors.append(W1ThermSensor(type, item[3]))
-	except Exception,e: 
-		sensors_list[index][5]='0'
-		print str(e)
+def read_sensors():
+	#also called when openplotter.conf changes
+	global sensors_list, sensors
+	sensors_list=conf.get_list('1W', 'DS18B20')
+
+	sensors=[]
+	for index,item in enumerate(sensors_list):
+		try:
+			type=W1ThermSensor.THERM_SENSOR_DS18B20
+			for sensor in W1ThermSensor.get_available_sensors():
+				if item[3] == sensor.id:
+					type = sensor.type
+			
+			sensors.append(W1ThermSensor(type, item[3]))
+		except Exception,e: 
+			sensors_list[index][5]='0'
+			print str(e)
+
+read_sensors()
 
 while True:
+	metrics.loop_end()
 	time.sleep(0.01)
+	metrics.loop_start()
+	if '1W' in changed_sections(conf.check()): read_sensors()
 	temp=''
 	list_tmp=[]	
 	ib=0
@@ -50,7 +67,9 @@ while True:
  				if i[2]=='C': unit=W1ThermSensor.DEGREES_C
 				if i[2]=='F': unit=W1ThermSensor.DEGREES_F
 				if i[2]=='K': unit=W1ThermSensor.KELVIN
+				start=time.time()
 				temp=sensors[ib].get_temperature(unit)
+				metrics.observe('sensor_read_seconds', time.time()-start, {'sensor': i[3]})
 			
 				temp=round(temp,1)
 				list_tmp.append('C')
@@ -63,13 +82,13 @@ while True:
 					xdr = pynmea2.XDR('OS', 'XDR', (list_tmp))
 					xdr1=str(xdr)
 					xdr2=xdr1+"\r\n"
-					sock.sendto(xdr2, ('127.0.0.1', 10110))
+					metrics.sendto(sock, xdr2, ('127.0.0.1', 10110))
 					list_tmp=[]
 					c=0
 		if c>0:
 			xdr = pynmea2.XDR('OS', 'XDR', (list_tmp))
 			xdr1=str(xdr)
 			xdr2=xdr1+"\r\n"
-			sock.sendto(xdr2, ('127.0.0.1', 10110))
+			metrics.sendto(sock, xdr2, ('127.0.0.1', 10110))
 
 	except Exception,e: print str(e)
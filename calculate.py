@@ -14,62 +14,35 @@
 # You should have received a copy of the GNU General Public License
 # along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
 
-import time, socket, threading, datetime, geomag, pynmea2, math
+import signal
+#first of all, a SIGHUP from reload_daemon() before conf.watch() must not kill the daemon
+signal.signal(signal.SIGHUP, lambda signum, frame: None)
+
+import time, socket, datetime, geomag, pynmea2, math
 from classes.datastream import DataStream
-from classes.conf import Conf
+from classes.datasnapshot import DataSnapshot
+from classes.conf import Conf, changed_sections
 from classes.language import Language
+from classes.metrics import Metrics
 
 conf=Conf()
+conf.watch()
 
 Language(conf.get('GENERAL','lang'))
 
-global sock_in
-global error
-sock_in=''
-error=0
 a=DataStream(conf)
+snapshot=DataSnapshot()
 last_heading=''
 heading_time=''
 
 sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
+metrics=Metrics('calculate')
+metrics.serve()
+
 accuracy=float(conf.get('STARTUP', 'cal_accuracy'))
 rate=float(conf.get('STARTUP', 'nmea_rate_cal'))
 
-#thread1
-def parse_nmea():
-	global sock_in
-	global error
-	while True:
-		if not sock_in: connect()
-		else:
-			frase_nmea =''
-			try:
-				frase_nmea = sock_in.recv(1024)
-			except socket.error, error_msg:
-				error= _('Failed to connect with localhost:10110. Error: ')+ str(error_msg[0])
-				print error
-			else:
-				if frase_nmea: 
-					a.parse_nmea(frase_nmea)
-					error=0
-				else:
-					sock_in=''
-
-def connect():
-	global sock_in
-	global error
-	try:
-		sock_in = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		sock_in.settimeout(5)
-		sock_in.connect(('localhost', 10110))
-	except socket.error, error_msg:
-		error= _('Failed to connect with localhost:10110. Error: ')+ str(error_msg[0])
-		print error
-		sock_in=''
-		time.sleep(7)
-	else: error=0
-#end thread1
 
 def calculate_mag_var(position, date):
 	if position[0] and position[2] and date:
@@ -84,24 +57,28 @@ def calculate_mag_var(position, date):
 	else: mag_var=['','']
 	return mag_var
 
-thread1=threading.Thread(target=parse_nmea)	
-thread1.start()
-
 sent=time.time()
 # loop
 while True:
 	#calculations			
+	metrics.loop_end()
 	time.sleep(0.01)
+	metrics.loop_start()
+	#the nmea_ flags are read with conf.get in every loop
+	if 'STARTUP' in changed_sections(conf.check()):
+		accuracy=float(conf.get('STARTUP', 'cal_accuracy'))
+		rate=float(conf.get('STARTUP', 'nmea_rate_cal'))
+	snapshot.update(a)
 	now=time.time()
 	# refresh values
-	position =[a.validate('Lat',now,accuracy), a.DataList[a.getDataListIndex('Lat')][3], a.validate('Lon',now,accuracy), a.DataList[a.getDataListIndex('Lon')][3]]
+	position =[a.validate('Lat',now,accuracy), a.getDataItem('Lat').unit, a.validate('Lon',now,accuracy), a.getDataItem('Lon').unit]
 	date = a.validate('Date',now,accuracy)
 	if not date: date = datetime.date.today()
 	heading_m = a.validate('HDM',now,accuracy)
-	if a.DataList[a.getDataListIndex('Var')][5] == 'OC': mag_var=['','']
-	else: mag_var = [a.validate('Var',now,accuracy), a.DataList[a.getDataListIndex('Var')][3]]
+	if a.getDataItem('Var').talker == 'OC': mag_var=['','']
+	else: mag_var = [a.validate('Var',now,accuracy), a.getDataItem('Var').unit]
 	if not mag_var[0]: mag_var = calculate_mag_var(position,date)
-	if a.DataList[a.getDataListIndex('HDT')][5] == 'OC': heading_t=''
+	if a.getDataItem('HDT').talker == 'OC': heading_t=''
 	else: heading_t = a.validate('HDT',now,accuracy)
 	if not heading_t:
 		if heading_m and mag_var[0]:
@@ -112,7 +89,7 @@ while True:
 			if heading_t<0: heading_t=360+heading_t
 	STW = a.validate('STW',now,accuracy)
 	AWS = a.validate('AWS',now,accuracy) 
-	AWA = [a.validate('AWA',now,accuracy), a.DataList[a.getDataListIndex('AWA')][3]]
+	AWA = [a.validate('AWA',now,accuracy), a.getDataItem('AWA').unit]
 	if AWA[0]:
 		if AWA[1]=='D':
 			AWA[1]='R'
@@ -132,13 +109,13 @@ while True:
 			hdg = pynmea2.HDG('OC', 'HDG', (value,'','',str(mag_var[0]),mag_var[1]))
 			hdg1=str(hdg)
 			hdg2=hdg1+'\r\n'
-			sock.sendto(hdg2, ('127.0.0.1', 10110))
+			metrics.sendto(sock, hdg2, ('127.0.0.1', 10110))
 		#generate headint_t
 		if  conf.get('STARTUP', 'nmea_hdt')=='1' and heading_t:
 			hdt = pynmea2.HDT('OC', 'HDT', (str(round(heading_t,1)),'T'))
 			hdt1=str(hdt)
 			hdt2=hdt1+'\r\n'
-			sock.sendto(hdt2, ('127.0.0.1', 10110))
+			metrics.sendto(sock, hdt2, ('127.0.0.1', 10110))
 		#generate Rate of Turn (ROT)
 		if conf.get('STARTUP', 'nmea_rot')=='1' and heading_m:
 			if not last_heading: #initialize
@@ -159,7 +136,7 @@ while True:
 				rot = pynmea2.ROT('OC', 'ROT', (str(rot),'A'))
 				rot1=str(rot)
 				rot2=rot1+'\r\n'
-				sock.sendto(rot2, ('127.0.0.1', 10110))
+				metrics.sendto(sock, rot2, ('127.0.0.1', 10110))
 		#generate True Wind STW
 		if conf.get('STARTUP', 'tw_stw')=='1' and STW and AWS and AWA:
 			#TWA
@@ -172,7 +149,7 @@ while True:
 			mwv = pynmea2.MWV('OC', 'MWV', (str(TWA0r),'T',str(TWSr),'N','A'))
 			mwv1=str(mwv)
 			mwv2=mwv1+'\r\n'
-			sock.sendto(mwv2, ('127.0.0.1', 10110))
+			metrics.sendto(sock, mwv2, ('127.0.0.1', 10110))
 			#TWD
 			if heading_t:
 				if AWA[1]=='R':
@@ -185,7 +162,7 @@ while True:
 				mwd = pynmea2.MWD('OC', 'MWD', (str(TWDr),'T','','M',str(TWSr),'N','',''))
 				mwd1=str(mwd)
 				mwd2=mwd1+'\r\n'
-				sock.sendto(mwd2, ('127.0.0.1', 10110))
+				metrics.sendto(sock, mwd2, ('127.0.0.1', 10110))
 		#generate True Wind SOG
 		if conf.get('STARTUP', 'tw_sog')=='1' and SOG and COG and heading_t and AWS and AWA:
 			#TWD
@@ -205,7 +182,7 @@ while True:
 			mwd = pynmea2.MWD('OC', 'MWD', (str(TWDr),'T','','M',str(TWSr),'N','',''))
 			mwd1=str(mwd)
 			mwd2=mwd1+'\r\n'
-			sock.sendto(mwd2, ('127.0.0.1', 10110))
+			metrics.sendto(sock, mwd2, ('127.0.0.1', 10110))
 			#TWA
 			TWA=TWD-heading_t
 			TWA0=TWA
@@ -214,4 +191,4 @@ while True:
 			mwv = pynmea2.MWV('OC', 'MWV', (str(TWA0r),'T',str(TWSr),'N','A'))
 			mwv1=str(mwv)
 			mwv2=mwv1+'\r\n'
-			sock.sendto(mwv2, ('127.0.0.1', 10110))
+			metrics.sendto(sock, mwv2, ('127.0.0.1', 10110))
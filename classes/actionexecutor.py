@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import time, threading, heapq, Queue
+
+#worker pools: name, threads, queue size. Actions that find their queue full are dropped.
+POOLS=[
+	('system', 1, 32),	#commands, services, wifi, SDR-AIS
+	('network', 2, 16),	#twitter, e-mail, MQTT
+	('modem', 1, 4),	#SMS, gammu uses the serial port
+]
+
+def action_pool(option):
+	#pool for an action, None for the ones run at once in the trigger loop
+	if option=='ACT19': return None
+	if option[:4]=='HOUT' or option[:4]=='LOUT': return None
+	if option=='ACT13' or option=='ACT14' or option[:4]=='MQTT': return 'network'
+	if option=='ACT21': return 'modem'
+	return 'system'
+
+class ActionExecutor:
+
+	#runs Actions.run_action out of the trigger loop. "wait" (ACT1) does not sleep, the actions after it
+	#are scheduled and sent to their pools when the time is up (call tick() from the loop).
+	#An action of a trigger already queued or running with the same data is not queued again, the same action
+	#fired by another trigger is.
+	def __init__(self, actions, conf, a, reload=None):
+		self.actions=actions
+		self.conf=conf
+		self.a=a
+		#called when an action returns 'read' (start all actions)
+		self.reload=reload
+		self.lock=threading.Lock()
+		self.inflight=set()
+		self.waiting=[]
+		self.sequence=0
+		#option -> [runs, total sec., max sec., max sec. in queue, skipped, dropped]
+		self.stats={}
+		self.queues={}
+		for name, threads, size in POOLS:
+			self.queues[name]=Queue.Queue(size)
+			for i in range(threads):
+				worker=threading.Thread(target=self.worker, args=(self.queues[name],))
+				worker.daemon=True
+				worker.start()
+
+	def run(self, actions, trigger=None):
+		#actions: [(action, data)] in the order they have to run. trigger: key of the trigger firing them
+		for index, (option, text) in enumerate(actions):
+			if option=='ACT1':
+				try: delay=float(self.a.getVariablesValue(text))
+				except Exception,e:
+					print str(e)
+					delay=0
+				rest=actions[index+1:]
+				if rest:
+					self.sequence+=1
+					heapq.heappush(self.waiting, (time.time()+delay, self.sequence, rest, trigger))
+				return
+			self.dispatch(option, text, trigger)
+
+	def tick(self, now=None):
+		if now is None: now=time.time()
+		while self.waiting and self.waiting[0][0] <= now:
+			due, sequence, rest, trigger=heapq.heappop(self.waiting)
+			self.run(rest, trigger)
+
+	def next_due(self):
+		if self.waiting: return self.waiting[0][0]
+		return None
+
+	def dispatch(self, option, text, trigger=None):
+		pool=action_pool(option)
+		if pool is None:
+			self.execute(option, text, time.time())
+			return
+		key=(trigger, option, text)
+		with self.lock:
+			if key in self.inflight:
+				self.stat(option)[4]+=1
+				return
+			try: self.queues[pool].put_nowait((key, time.time()))
+			except Queue.Full:
+				self.stat(option)[5]+=1
+				print 'Action '+option+' dropped, too many actions waiting'
+				return
+			self.inflight.add(key)
+
+	def worker(self, queue):
+		while True:
+			key, queued=queue.get()
+			trigger, option, text=key
+			try: self.execute(option, text, queued)
+			finally:
+				with self.lock: self.inflight.discard(key)
+
+	def execute(self, option, text, queued):
+		start=time.time()
+		result=''
+		try: result=self.actions.run_action(option,text,self.conf,self.a)
+		except Exception,e: print str(e)
+		end=time.time()
+		with self.lock:
+			stat=self.stat(option)
+			stat[0]+=1
+			stat[1]+=end-start
+			stat[2]=max(stat[2], end-start)
+			stat[3]=max(stat[3], start-queued)
+		if result=='read' and self.reload: self.reload()
+
+	def stat(self, option):
+		if option not in self.stats: self.stats[option]=[0, 0.0, 0.0, 0.0, 0, 0]
+		return self.stats[option]
+
+	def queue_depth(self):
+		#[({'pool': name}, actions waiting)]
+		return [({'pool': name}, queue.qsize()) for name, queue in self.queues.iteritems()]
+
+	def latency(self):
+		#{action: (runs, average sec., max sec., max sec. in queue, skipped, dropped)}
+		result={}
+		with self.lock:
+			for option, stat in self.stats.iteritems():
+				average=0.0
+				if stat[0]: average=stat[1]/stat[0]
+				result[option]=(stat[0], average, stat[2], stat[3], stat[4], stat[5])
+		return result
@@ -19,7 +19,7 @@ from paths import Paths
 from classes.twitterbot import TwitterBot
 from classes.gmailbot import GmailBot
 import RPi.GPIO as GPIO
-import paho.mqtt.publish as publish
+from classes.mqtt import mqtt_connection
 
 class Actions():
 
@@ -51,9 +51,7 @@ class Actions():
 		self.options.append([_('stop all actions'),_('This action will stop all the triggers except the trigger which has an action "start all actions" defined.'),0,'ACT20'])
 
 		#Outputs
-		x=conf.get('OUTPUTS', 'outputs')
-		if x: self.out_list=eval(x)
-		else: self.out_list=[]
+		self.out_list=conf.get_list('OUTPUTS', 'outputs')
 		for i in self.out_list:
 			try:
 				if i[0]=='1':
@@ -62,9 +60,7 @@ class Actions():
 			except Exception,e: print str(e)
 
 		#mqtt
-		x=conf.get('MQTT', 'topics')
-		if x: self.mqtt_list=eval(x)
-		else: self.mqtt_list=[]
+		self.mqtt_list=conf.get_list('MQTT', 'topics')
 		for i in self.mqtt_list:
 			try:
 				self.options.append([_('Publish on topic ')+i[1],0,1,i[2]])
@@ -104,13 +100,18 @@ class Actions():
 		if option=='ACT4': 
 			subprocess.Popen(['sudo', 'shutdown', '-h', 'now'])
 		if option=='ACT5': 
+			#disabled first so startup.py does not restart it
+			conf.set('STARTUP', 'kplex', '0')
 			subprocess.Popen(['pkill', '-9', 'kplex'])
 		if option=='ACT6':
+			conf.set('STARTUP', 'kplex', '1')
 			subprocess.call(['pkill', '-9', 'kplex'])
 			subprocess.Popen('kplex')
 		if option=='ACT7': 
+			conf.set('SIGNALK', 'enable', '0')
 			subprocess.Popen(["pkill", '-9', "node"])
 		if option=='ACT8':
+			conf.set('SIGNALK', 'enable', '1')
 			subprocess.call(["pkill", '-9', "node"]) 
 			subprocess.Popen(self.home+'/.config/signalk-server-node/bin/openplotter', cwd=self.home+'/.config/signalk-server-node') 
 		if option=='ACT9':
@@ -210,7 +211,10 @@ class Actions():
 		if option[:4]=='MQTT':
 			topic=self.mqtt_list[self.getmqttlistIndex(option)][1]
 			payload= text
-			auth = {'username':conf.get('MQTT','username'), 'password':conf.get('MQTT','password')}
-			publish.single(topic, payload=payload, hostname='127.0.0.1', port='1883', auth=auth)
-			publish.single(topic, payload=payload, hostname=conf.get('MQTT','broker'), port=conf.get('MQTT','port'), auth=auth)
+			user=conf.get('MQTT','username')
+			passw=conf.get('MQTT','password')
+			mqtt_connection('127.0.0.1', '1883', user, passw).publish(topic, payload)
+			broker=conf.get('MQTT','broker')
+			port=conf.get('MQTT','port')
+			if broker and port: mqtt_connection(broker, port, user, passw).publish(topic, payload)
 			
\ No newline at end of file
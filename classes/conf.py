@@ -14,30 +14,344 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
-import ConfigParser
+import ConfigParser, os, threading, ast, signal, subprocess, time, tempfile, fcntl
+from contextlib import contextmanager
 from paths import Paths
+from liststore import ListStore
+
+TEXT=(str, unicode)
+NUMBER=(int, long, float)
+#list valued items, kept in openplotter.db (see ListStore) and read from openplotter.conf the first time.
+#Each row is checked against its columns (None accepts anything)
+LIST_SCHEMAS={
+	#0 enabled, 1 name, 2 short, 3 GPIO, 4 pull, 5 unique id
+	('INPUTS', 'switches'): (TEXT, TEXT, TEXT, NUMBER, TEXT, TEXT),
+	#0 enabled, 1 name, 2 short, 3 GPIO, 4 unique id
+	('OUTPUTS', 'outputs'): (TEXT, TEXT, TEXT, NUMBER, TEXT),
+	#0 enabled, 1 unique id (-1 always true), 2 operator, 3 value, 4 actions
+	('ACTIONS', 'triggers'): (NUMBER, TEXT+NUMBER, NUMBER, TEXT+NUMBER, list),
+	#0 name, 1 short, 2 unit, 3 sensor id, 4 unique id, 5 enabled
+	('1W', 'ds18b20'): (TEXT, TEXT, TEXT, TEXT, TEXT, TEXT),
+	#0 name, 1 vendor, 2 product, 3 serial, 4 port, 5 remove, 6 device
+	('UDEV', 'usbinst'): (None, None, None, None, None, None, None),
+	#0 short, 1 topic, 2 unique id
+	('MQTT', 'topics'): (TEXT, TEXT, TEXT),
+}
+#actions of a trigger: 0 action, 1 data, 2 repeat, 3 repeat unit
+ACTION_SCHEMA=(TEXT, TEXT, NUMBER, NUMBER)
+
+def catches_hup(pid):
+	#True when the process has a SIGHUP handler, the default action would kill it
+	try:
+		for line in open('/proc/%d/status' % pid):
+			if line.startswith('SigCgt:'): return bool(int(line.split()[1], 16) & (1 << (signal.SIGHUP-1)))
+	except (IOError, ValueError): pass
+	return False
+
+def reload_daemon(script, currentpath, cwd=None):
+	#asks a running daemon to read openplotter.conf again (SIGHUP) or starts it if it is not running.
+	#A daemon still starting is not signalled, it reads the file when it creates Conf.
+	try: pids=[int(i) for i in subprocess.check_output(['pgrep', '-f', script]).split()]
+	except subprocess.CalledProcessError: pids=[]
+	pids=[i for i in pids if i!=os.getpid()]
+	if pids:
+		for pid in pids:
+			if not catches_hup(pid): continue
+			try: os.kill(pid, signal.SIGHUP)
+			except OSError: pass
+		return True
+	subprocess.Popen(['python', currentpath+'/'+script], cwd=cwd)
+	return False
+
+def changed_sections(changed):
+	return set(i[0] for i in changed)
+
+def check_row(schema, row):
+	if not isinstance(row, list) or len(row) < len(schema): return False
+	for column, value in zip(schema, row):
+		if column and not isinstance(value, column): return False
+	return True
+
+def copy_rows(rows):
+	#rows are lists of numbers, strings and lists
+	return [copy_rows(i) if isinstance(i, list) else i for i in rows]
 
 class Conf:
 
+	#openplotter.conf is parsed again only when the file changes (mtime, size or inode).
+	#Writes go to a temporary file renamed over the old one, under a lock shared by all the processes.
 	def __init__(self):
 
 		self.paths=Paths()
+		self.file=self.paths.currentpath+'/openplotter.conf'
 
 		self.data_conf = ConfigParser.SafeConfigParser()
+		self.stat=None
+		self.lock=threading.RLock()
+		self.batching=0
+		#(section, item) -> value set and not written yet
+		self.pending={}
+		#(section, item) -> (text in the file or version in the store, parsed rows)
+		self.lists={}
+		#openplotter.db, opened by the first list used
+		self.store=None
+		self.list_versions={}
+		self.data_version=None
+		#listener(changed) called with the set of (section, item) changed, see subscribe()
+		self.listeners=[]
+		#changes made by other processes, see watch()
+		self.watching=False
+		self.hup=False
+		self.external=set()
+		self.last_check=0
 		
 		self.read()
 
+	def file_stat(self):
+		try: st=os.stat(self.file)
+		except OSError: return None
+		return (st.st_mtime, st.st_size, st.st_ino)
+
+	def values(self):
+		result={}
+		for section in self.data_conf.sections():
+			for item, value in self.data_conf.items(section, raw=True):
+				result[(section, item)]=value
+		return result
+
 	def read(self):
-		self.data_conf.read(self.paths.currentpath+'/openplotter.conf')
+		#True if the file or the lists have changed since the last read
+		lists=self.read_lists()
+		with self.lock:
+			stat=self.file_stat()
+			if stat==self.stat: return lists
+			old=self.values()
+			data_conf=ConfigParser.SafeConfigParser()
+			data_conf.read(self.file)
+			#values set in a batch are kept over the ones of other processes
+			for (section, item), value in self.pending.iteritems():
+				if data_conf.has_section(section): data_conf.set(section, item, value)
+			self.data_conf=data_conf
+			self.stat=stat
+			new=self.values()
+			changed=set(i for i in set(old)|set(new) if old.get(i)!=new.get(i))
+			if self.watching: self.external.update(changed)
+		self.notify(changed)
+		return True
 
 	def write(self):
-		with open(self.paths.currentpath+'/openplotter.conf', 'wb') as configfile:
-			self.data_conf.write(configfile)
+		with self.lock:
+			#a unique temporary file, other processes may be writing too
+			fd, tmp=tempfile.mkstemp(prefix='.openplotter.conf.', dir=os.path.dirname(self.file))
+			try:
+				with os.fdopen(fd, 'wb') as configfile:
+					self.data_conf.write(configfile)
+					configfile.flush()
+					os.fsync(configfile.fileno())
+				os.chmod(tmp, 0644)
+				os.rename(tmp, self.file)
+			except:
+				try: os.remove(tmp)
+				except OSError: pass
+				raise
+			self.stat=self.file_stat()
+
+	@contextmanager
+	def file_lock(self):
+		#held across read, merge and rename so the changes of another process are not lost
+		with open(self.file+'.lock', 'a') as lockfile:
+			fcntl.flock(lockfile, fcntl.LOCK_EX)
+			try: yield
+			finally: fcntl.flock(lockfile, fcntl.LOCK_UN)
 
 	def get(self,section,item):
 		return self.data_conf.get(section,item)
 
+	def list_store(self):
+		path=os.path.join(os.path.dirname(self.file), 'openplotter.db')
+		if not self.store or self.store.path!=path:
+			self.store=ListStore(path)
+			self.list_versions=self.store.versions()
+			self.data_version=self.store.data_version()
+		return self.store
+
+	def read_lists(self):
+		#True if another process has changed a list since the last call
+		with self.lock:
+			if not self.store: return False
+			data_version=self.store.data_version()
+			if data_version==self.data_version: return False
+			self.data_version=data_version
+			old=self.list_versions
+			self.list_versions=self.store.versions()
+			changed=set(i for i in self.list_versions if old.get(i)!=self.list_versions[i])
+			if self.watching: self.external.update(changed)
+		self.notify(changed)
+		return bool(changed)
+
+	def list_version(self, key):
+		#a list used for the first time is copied from openplotter.conf into the store
+		store=self.list_store()
+		self.read_lists()
+		if key not in self.list_versions:
+			try: data=self.data_conf.get(key[0],key[1],raw=True)
+			except ConfigParser.Error: data=''
+			store.create(key, self.parse_list(key, data))
+			self.list_versions[key]=store.versions()[key]
+		return self.list_versions[key]
+
+	def get_list(self,section,item):
+		#list valued items parsed once, every call returns a new copy that can be changed
+		key=(section, item.lower())
+		with self.lock:
+			if key in LIST_SCHEMAS:
+				version=self.list_version(key)
+				cached=self.lists.get(key)
+				if not cached or cached[0]!=version:
+					cached=(version, self.check_list(key, self.store.rows(key)))
+					self.lists[key]=cached
+				return copy_rows(cached[1])
+			try: data=self.data_conf.get(section,item,raw=True)
+			except ConfigParser.Error: data=''
+			cached=self.lists.get(key)
+			if not cached or cached[0]!=data:
+				cached=(data, self.parse_list(key, data))
+				self.lists[key]=cached
+			return copy_rows(cached[1])
+
+	def parse_list(self, key, data):
+		if not data: return []
+		try: rows=ast.literal_eval(data)
+		except (ValueError, SyntaxError), e:
+			print 'Error reading '+key[0]+' '+key[1]+': '+str(e)
+			return []
+		if not isinstance(rows, list): return []
+		return self.check_list(key, rows)
+
+	def check_list(self, key, rows):
+		schema=LIST_SCHEMAS.get(key)
+		if not schema: return rows
+		result=[]
+		for row in rows:
+			if not check_row(schema, row):
+				print 'Wrong row in '+key[0]+' '+key[1]+': '+repr(row)
+				continue
+			if key==('ACTIONS', 'triggers'):
+				row[4]=[i for i in row[4] if check_row(ACTION_SCHEMA, i)]
+			result.append(row)
+		return result
+
+	def set_list(self,section,item,rows):
+		key=(section, item.lower())
+		with self.lock:
+			rows=self.check_list(key, copy_rows(rows))
+			if key not in LIST_SCHEMAS:
+				data=str(rows)
+				self.set(section,item,data)
+				self.lists[key]=(data, rows)
+				return
+			self.list_version(key)
+			version=self.store.replace(key, rows)
+			self.list_versions[key]=version
+			self.lists[key]=(version, rows)
+		self.notify(set([key]))
+
+	def set_list_row(self,section,item,index,row):
+		#changes one row of a list in LIST_SCHEMAS, index None appends it. False if the row is wrong
+		key=(section, item.lower())
+		with self.lock:
+			rows=self.check_list(key, [copy_rows(row)])
+			if not rows: return False
+			self.list_version(key)
+			self.list_versions[key]=self.store.set_row(key, index, rows[0])[0]
+		self.notify(set([key]))
+		return True
+
+	def delete_list_row(self,section,item,index):
+		key=(section, item.lower())
+		with self.lock:
+			self.list_version(key)
+			self.list_versions[key]=self.store.delete_row(key, index)
+		self.notify(set([key]))
+
+	def update_list(self,section,item,rows,indexes):
+		#rows edited in memory, indexes are their positions in the stored list (None for new rows).
+		#Only the rows changed, deleted or added are written, all of them at once
+		key=(section, item.lower())
+		with self.lock:
+			self.list_version(key)
+			with self.store.transaction():
+				stored=self.store.rows(key)
+				for row, index in zip(rows, indexes):
+					if index is not None and row!=stored[index]: self.set_list_row(section,item,index,row)
+				kept=set(i for i in indexes if i is not None)
+				for index in reversed(range(len(stored))):
+					if index not in kept: self.delete_list_row(section,item,index)
+				for row, index in zip(rows, indexes):
+					if index is None: self.set_list_row(section,item,None,row)
+
 	def set(self,section,item,value):
-		self.read()
-		self.data_conf.set(section, item, value)
-		self.write()
+		with self.lock:
+			#in a batch the file is read once, when it is written
+			if not self.batching: self.read()
+			if self.data_conf.has_option(section, item) and self.data_conf.get(section, item, raw=True)==value: return
+			self.data_conf.set(section, item, value)
+			self.pending[(section, item)]=value
+			if self.batching: return
+			self.commit()
+
+	def commit(self):
+		with self.lock:
+			if not self.pending: return
+			#changes written by other processes during the batch are not lost
+			with self.file_lock():
+				self.read()
+				self.write()
+				changed=set(self.pending)
+				self.pending={}
+		self.notify(changed)
+
+	@contextmanager
+	def batch(self):
+		#several set() written to disk once at the end
+		with self.lock: self.batching+=1
+		try: yield self
+		finally:
+			with self.lock: self.batching-=1
+			if not self.batching: self.commit()
+
+	def subscribe(self, listener):
+		#listener(changed) with changed a set of (section, item), for local set() and changes read from the file
+		self.listeners.append(listener)
+
+	def notify(self, changed):
+		if not changed: return
+		for i in self.listeners:
+			try: i(changed)
+			except Exception,e: print str(e)
+
+	def watch(self):
+		#daemons install a SIGHUP handler as their first statement and call it after creating Conf.
+		#A SIGHUP received before is not lost, the first check() reads the file again.
+		self.watching=True
+		self.hup=True
+		#changes of the lists are seen even if the daemon has not read any yet
+		self.list_store()
+		signal.signal(signal.SIGHUP, self.on_hup)
+		signal.siginterrupt(signal.SIGHUP, False)
+
+	def on_hup(self, signum, frame):
+		self.hup=True
+
+	def check(self, interval=5):
+		#set of (section, item) changed by other processes since the last call. The file is read on SIGHUP
+		#or every interval seconds
+		now=time.time()
+		if self.hup or now-self.last_check > interval:
+			self.hup=False
+			self.last_check=now
+			self.read()
+		with self.lock:
+			changed=self.external
+			self.external=set()
+		return changed
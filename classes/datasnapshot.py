@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import mmap, struct, os, time
+from classes.nmeabus import value_kind, decode_value
+
+#memory mapped copy of the last value of every magnitude. nmea_bus.py writes it and any process can map it read only.
+#header: magic, version, generation, slots, used slots, sequence (incremented on every update)
+#slot: sequence (odd while being written), unique id, value type, float value, text value, unit, timestamp, talker, sentence
+SNAPSHOT_FILE='/dev/shm/openplotter-data'
+if not os.path.isdir('/dev/shm'): SNAPSHOT_FILE='/tmp/openplotter-data'
+MAGIC='OPDS'
+VERSION=1
+HEADER=struct.Struct('<4sIIIII')
+SLOT=struct.Struct('<I16sc3xd24s8sd4s8s')
+SEQ=struct.Struct('<I')
+SLOTS=256
+SIZE=HEADER.size+SLOTS*SLOT.size
+
+class DataSnapshot:
+
+	def __init__(self, path=SNAPSHOT_FILE, writer=False):
+		self.path=path
+		self.writer=writer
+		self.map=''
+		self.generation=0
+		self.slots={}
+		self.used=0
+		self.seen={}
+		self.last_open=0
+		#writes of magnitudes without a slot and of fields cut to the slot size
+		self.dropped=0
+		self.truncated=0
+		self.warned=set()
+		if writer: self.create()
+		else: self.open()
+
+	def create(self):
+		#the file is reused in place so readers that already mapped it keep working
+		fd=os.open(self.path, os.O_RDWR|os.O_CREAT, 0644)
+		if os.fstat(fd).st_size != SIZE: os.ftruncate(fd, SIZE)
+		self.map=mmap.mmap(fd, SIZE)
+		os.close(fd)
+		#a new generation on every start, even in the same second, so readers reload the slot index
+		header=HEADER.unpack_from(self.map, 0)
+		if header[0]==MAGIC: self.generation=(header[2]+1) & 0xffffffff
+		else: self.generation=struct.unpack('<I', os.urandom(4))[0]
+		if not self.generation: self.generation=1
+		self.map[0:SIZE]='\0'*SIZE
+		HEADER.pack_into(self.map, 0, MAGIC, VERSION, self.generation, SLOTS, 0, 0)
+
+	def open(self):
+		self.last_open=time.time()
+		try:
+			fd=os.open(self.path, os.O_RDONLY)
+			try: self.map=mmap.mmap(fd, SIZE, access=mmap.ACCESS_READ)
+			finally: os.close(fd)
+		except (OSError, mmap.error, ValueError):
+			self.map=''
+			return False
+		self.slots={}
+		self.seen={}
+		self.used=0
+		self.generation=0
+		return True
+
+	def warn(self, data, message):
+		#once per magnitude
+		if data in self.warned: return
+		self.warned.add(data)
+		print 'snapshot: '+data+' '+message
+
+	def write(self,data,value,unit,timestamp,talker,nmea_type):
+		index=self.slots.get(data)
+		if index is None:
+			if len(data) > 16:
+				self.dropped+=1
+				self.warn(data, 'not written, unique id longer than 16 characters')
+				return
+			if self.used >= SLOTS:
+				self.dropped+=1
+				self.warn(data, 'not written, all %d slots used' % SLOTS)
+				return
+			index=self.used
+			self.slots[data]=index
+			self.used+=1
+		kind, text=value_kind(value)
+		number=0.0
+		if kind=='f':
+			number=float(value)
+			text=''
+		if len(text) > 24 or len(unit or '') > 8:
+			self.truncated+=1
+			self.warn(data, 'cut, text longer than 24 or unit longer than 8 characters')
+		offset=HEADER.size+index*SLOT.size
+		seq=SEQ.unpack_from(self.map, offset)[0]
+		SEQ.pack_into(self.map, offset, seq+1)
+		SLOT.pack_into(self.map, offset, seq+1, data, kind, number, text, unit or '', timestamp, talker or '', nmea_type or '')
+		SEQ.pack_into(self.map, offset, seq+2)
+		header=HEADER.unpack_from(self.map, 0)
+		HEADER.pack_into(self.map, 0, MAGIC, VERSION, self.generation, SLOTS, self.used, (header[5]+1) & 0xffffffff)
+
+	def read_slot(self, index):
+		#seqlock read, retries while the writer is in the middle of this slot
+		offset=HEADER.size+index*SLOT.size
+		for i in range(1000):
+			slot=SLOT.unpack_from(self.map, offset)
+			if slot[0] & 1: continue
+			if SEQ.unpack_from(self.map, offset)[0]==slot[0]: return slot
+		return slot
+
+	def check(self):
+		#True if the map is valid. Reopens the file when missing and reloads the slot index when the writer restarted
+		if not self.map:
+			if time.time()-self.last_open < 1: return False
+			if not self.open(): return False
+		header=HEADER.unpack_from(self.map, 0)
+		if header[0]!=MAGIC or header[1]!=VERSION: return False
+		if header[2]!=self.generation:
+			self.generation=header[2]
+			self.slots={}
+			self.seen={}
+			self.used=0
+		if header[4]!=self.used:
+			for index in range(self.used, header[4]):
+				self.slots[self.read_slot(index)[1].rstrip('\0')]=index
+			self.used=header[4]
+		return True
+
+	def sequence(self):
+		if not self.check(): return None
+		return HEADER.unpack_from(self.map, 0)[5]
+
+	def read(self, data):
+		#(value, unit, timestamp, talker, sentence) of one magnitude or None
+		if not self.check(): return None
+		index=self.slots.get(data)
+		if index is None: return None
+		return self.decode(self.read_slot(index))
+
+	def decode(self, slot):
+		kind=slot[2]
+		if kind=='f': value=slot[3]
+		else: value=decode_value(kind, slot[4].rstrip('\0'))
+		return (value, slot[5].rstrip('\0'), slot[6], slot[7].rstrip('\0'), slot[8].rstrip('\0'))
+
+	def update(self, a):
+		#copies the magnitudes changed since the last call into the DataStream a and returns their unique ids
+		changed=[]
+		if not self.check(): return changed
+		for data, index in self.slots.iteritems():
+			seq=SEQ.unpack_from(self.map, HEADER.size+index*SLOT.size)[0]
+			if self.seen.get(data)==seq: continue
+			slot=self.read_slot(index)
+			self.seen[data]=slot[0]
+			value, unit, timestamp, talker, nmea_type=self.decode(slot)
+			try:
+				a.updateDataList(data,value,unit,talker,nmea_type,timestamp)
+				changed.append(data)
+			except KeyError: pass
+		return changed
@@ -17,58 +17,404 @@
 
 import pynmea2, time, re
 import RPi.GPIO as GPIO
+from classes.nmea import split_nmea, has_checksum, nmea_float, nmea_latlon, nmea_date, nmea_time
+
+class DataItem(object):
+	#one magnitude of DataList. Fields can be read by name or by position so old code using item[2] keeps working
+	#(0 name, 1 short, 2 value, 3 unit, 4 timestamp, 5 talker, 6 sentence, 7 valid operators, 8 disable field, 9 unique id)
+	__slots__=('name','short','value','unit','timestamp','talker','sentence','operators','disable','uid')
+
+	def __init__(self,name,short,value,unit,timestamp,talker,sentence,operators,disable,uid):
+		self.name=name
+		self.short=short
+		self.value=value
+		self.unit=unit
+		self.timestamp=timestamp
+		self.talker=talker
+		self.sentence=sentence
+		self.operators=operators
+		self.disable=disable
+		self.uid=uid
+
+	def __getitem__(self, index):
+		#a slice returns a list, as the old rows did
+		if isinstance(index, slice): return [getattr(self, i) for i in self.__slots__[index]]
+		return getattr(self, self.__slots__[index])
+
+	def __setitem__(self, index, value):
+		setattr(self, self.__slots__[index], value)
+
+	def __len__(self):
+		return len(self.__slots__)
+
+	def __iter__(self):
+		for i in self.__slots__: yield getattr(self, i)
+
+#NMEA dispatch tables. parse_nmea looks up the sentence type and runs only the extractors registered for it.
+#Plugins can add new sentences or XDR transducers calling register_sentence, register_xdr or register_xdr_prefix.
+#extractor(datastream, msg, talker, nmea_type) must call datastream.updateDataList for every value found.
+NMEA_EXTRACTORS={}
+#transducer id -> (unique id, unit). A unit None means the unit sent in the XDR sentence.
+XDR_TRANSDUCERS={}
+#[(prefix, unit)] for transducers whose id is the unique id itself (1W sensors)
+XDR_PREFIXES=[]
+#fast path for the most frequent sentences: fast_extractor(datastream, fields, talker, nmea_type) reads the
+#comma separated fields directly and pynmea2 is only used for sentences not registered here
+NMEA_FAST={}
+
+def register_sentence(nmea_type, extractor):
+	#new extractors need the pynmea2 message so this sentence leaves the fast path
+	NMEA_FAST.pop(nmea_type, None)
+	NMEA_EXTRACTORS.setdefault(nmea_type,[]).append(extractor)
+
+def register_fast_sentence(nmea_type, fast_extractor):
+	NMEA_FAST[nmea_type]=fast_extractor
+
+def register_xdr(transducer_id, data, unit):
+	XDR_TRANSDUCERS[transducer_id]=(data, unit)
+
+def register_xdr_prefix(prefix, unit=None):
+	XDR_PREFIXES.append((prefix, unit))
+
+def extract_position(ds,msg,talker,nmea_type):
+	#lat
+	value=round(msg.latitude,4)
+	if value: ds.updateDataList('Lat',value,msg.lat_dir,talker,nmea_type) #N, S
+	#lon
+	value=round(msg.longitude,4)
+	if value: ds.updateDataList('Lon',value,msg.lon_dir,talker,nmea_type) #E, W
+
+def extract_rmc(ds,msg,talker,nmea_type):
+	#date
+	value=msg.datestamp
+	if value: ds.updateDataList('Date',value,'UTC',talker,nmea_type)
+	#time
+	value=msg.timestamp
+	if value: ds.updateDataList('Time',value,'UTC',talker,nmea_type)
+	#magnetic variation
+	value=msg.mag_variation
+	if value: ds.updateDataList('Var',value,msg.mag_var_dir,talker,nmea_type) #E, W
+	#course over ground
+	value=msg.true_course
+	if value: ds.updateDataList('COG',value,'D',talker,nmea_type)
+	#speed over ground
+	value=msg.spd_over_grnd
+	if value: ds.updateDataList('SOG',value,'N',talker,nmea_type)
+
+def extract_hdg(ds,msg,talker,nmea_type):
+	#magnetic variation
+	value=msg.variation
+	if value: ds.updateDataList('Var',value,msg.var_dir,talker,nmea_type) #E, W
+	#magnetic heading
+	value=msg.heading
+	if value: ds.updateDataList('HDM',value,'D',talker,nmea_type)
+
+def extract_vhw(ds,msg,talker,nmea_type):
+	#magnetic heading
+	value=msg.heading_magnetic
+	if value: ds.updateDataList('HDM',value,'D',talker,nmea_type)
+	#true heading
+	value=msg.heading_true
+	if value: ds.updateDataList('HDT',value,'D',talker,nmea_type)
+	#speed trought water
+	value=msg.water_speed_knots
+	if value: ds.updateDataList('STW',value,'N',talker,nmea_type)
+
+def extract_hdm(ds,msg,talker,nmea_type):
+	#magnetic heading
+	value=msg.heading
+	if value: ds.updateDataList('HDM',value,'D',talker,nmea_type)
+
+def extract_hdt(ds,msg,talker,nmea_type):
+	#true heading
+	value=msg.heading
+	if value: ds.updateDataList('HDT',value,'D',talker,nmea_type)
+
+def extract_vtg(ds,msg,talker,nmea_type):
+	#course over ground
+	value=msg.true_track
+	if value: ds.updateDataList('COG',value,'D',talker,nmea_type)
+	#speed over ground
+	value=msg.spd_over_grnd_kts
+	if value: ds.updateDataList('SOG',value,'N',talker,nmea_type)
+
+def extract_vbw(ds,msg,talker,nmea_type):
+	#speed trought water
+	value=msg.lon_water_spd
+	if value: ds.updateDataList('STW',value,'N',talker,nmea_type)
+
+def extract_vwr(ds,msg,talker,nmea_type):
+	#apparent wind angle
+	value=msg.deg_r
+	if value: ds.updateDataList('AWA',value,msg.l_r,talker,nmea_type) #L=Left, R=Right
+	#apparent wind speed
+	value=msg.wind_speed_kn
+	if value: ds.updateDataList('AWS',value,'N',talker,nmea_type)
+
+def extract_mwv(ds,msg,talker,nmea_type):
+	reference=msg.reference
+	if reference=='R':
+		#apparent wind angle
+		value=msg.wind_angle
+		if value: ds.updateDataList('AWA',value,'D',talker,nmea_type)
+		#apparent wind speed
+		if msg.wind_speed_units=='N':
+			value=msg.wind_speed
+			if value: ds.updateDataList('AWS',value,'N',talker,nmea_type)
+	if reference=='T':
+		#true wind angle
+		value=msg.wind_angle
+		if value: ds.updateDataList('TWA',value,'D',talker,nmea_type)
+		#true wind speed
+		value=msg.wind_speed
+		if value: ds.updateDataList('TWS',value,'N',talker,nmea_type)
+
+def extract_vwt(ds,msg,talker,nmea_type):
+	#true wind angle
+	value=msg.wind_angle_vessel
+	if value: ds.updateDataList('TWA',value,msg.direction,talker,nmea_type) #L=Left, R=Right
+	#true wind speed
+	value=msg.wind_speed_knots
+	if value: ds.updateDataList('TWS',value,'N',talker,nmea_type)
+
+def extract_mwd(ds,msg,talker,nmea_type):
+	#true wind direction
+	value=msg.direction_true
+	if value: ds.updateDataList('TWD',value,'D',talker,nmea_type)
+	#true wind speed
+	value=msg.wind_speed_knots
+	if value: ds.updateDataList('TWS',value,'N',talker,nmea_type)
+
+def extract_rot(ds,msg,talker,nmea_type):
+	#rate of turn
+	value=msg.rate_of_turn
+	if value: ds.updateDataList('ROT',value,'D/M',talker,nmea_type)
+
+def extract_dpt(ds,msg,talker,nmea_type):
+	#water Depth
+	value=msg.depth
+	if value: ds.updateDataList('DPT',value,'M',talker,nmea_type)
+
+def extract_dbt(ds,msg,talker,nmea_type):
+	#water Depth
+	value=msg.depth_meters
+	if value: ds.updateDataList('DPT',value,'M',talker,nmea_type)
+
+def extract_xdr(ds,msg,talker,nmea_type):
+	for i in range(0, msg.num_transducers):
+		transducer=msg.get_transducer(i)
+		value=transducer.value
+		if not value: continue
+		target=XDR_TRANSDUCERS.get(transducer.id)
+		if target:
+			unit=target[1]
+			if unit is None: unit=transducer.units
+			ds.updateDataList(target[0],value,unit,talker,nmea_type)
+			continue
+		for prefix, unit in XDR_PREFIXES:
+			if transducer.id.startswith(prefix):
+				if unit is None: unit=transducer.units
+				ds.updateDataList(transducer.id,value,unit,talker,nmea_type)
+				break
+
+def fast_position(ds,fields,talker,nmea_type,lat):
+	#lat
+	value=round(nmea_latlon(fields[lat],fields[lat+1]),4)
+	if value: ds.updateDataList('Lat',value,fields[lat+1],talker,nmea_type)
+	#lon
+	value=round(nmea_latlon(fields[lat+2],fields[lat+3]),4)
+	if value: ds.updateDataList('Lon',value,fields[lat+3],talker,nmea_type)
+
+def fast_rmc(ds,fields,talker,nmea_type):
+	fast_position(ds,fields,talker,nmea_type,2)
+	#date
+	value=nmea_date(fields[8])
+	if value: ds.updateDataList('Date',value,'UTC',talker,nmea_type)
+	#time
+	value=nmea_time(fields[0])
+	if value: ds.updateDataList('Time',value,'UTC',talker,nmea_type)
+	#magnetic variation
+	value=fields[9]
+	if value: ds.updateDataList('Var',value,fields[10],talker,nmea_type)
+	#course over ground
+	value=nmea_float(fields[7])
+	if value: ds.updateDataList('COG',value,'D',talker,nmea_type)
+	#speed over ground
+	value=nmea_float(fields[6])
+	if value: ds.updateDataList('SOG',value,'N',talker,nmea_type)
+
+def fast_gga(ds,fields,talker,nmea_type):
+	fast_position(ds,fields,talker,nmea_type,1)
+
+def fast_vtg(ds,fields,talker,nmea_type):
+	#course over ground
+	value=nmea_float(fields[0])
+	if value: ds.updateDataList('COG',value,'D',talker,nmea_type)
+	#speed over ground
+	value=nmea_float(fields[4])
+	if value: ds.updateDataList('SOG',value,'N',talker,nmea_type)
+
+def fast_hdg(ds,fields,talker,nmea_type):
+	#magnetic variation
+	value=nmea_float(fields[3])
+	if value: ds.updateDataList('Var',value,fields[4],talker,nmea_type)
+	#magnetic heading
+	value=nmea_float(fields[0])
+	if value: ds.updateDataList('HDM',value,'D',talker,nmea_type)
+
+def fast_hdm(ds,fields,talker,nmea_type):
+	value=nmea_float(fields[0])
+	if value: ds.updateDataList('HDM',value,'D',talker,nmea_type)
+
+def fast_hdt(ds,fields,talker,nmea_type):
+	value=nmea_float(fields[0])
+	if value: ds.updateDataList('HDT',value,'D',talker,nmea_type)
+
+def fast_mwv(ds,fields,talker,nmea_type):
+	reference=fields[1]
+	if reference=='R':
+		value=nmea_float(fields[0])
+		if value: ds.updateDataList('AWA',value,'D',talker,nmea_type)
+		if fields[3]=='N':
+			value=nmea_float(fields[2])
+			if value: ds.updateDataList('AWS',value,'N',talker,nmea_type)
+	if reference=='T':
+		value=nmea_float(fields[0])
+		if value: ds.updateDataList('TWA',value,'D',talker,nmea_type)
+		value=nmea_float(fields[2])
+		if value: ds.updateDataList('TWS',value,'N',talker,nmea_type)
+
+def fast_vhw(ds,fields,talker,nmea_type):
+	value=nmea_float(fields[2])
+	if value: ds.updateDataList('HDM',value,'D',talker,nmea_type)
+	value=nmea_float(fields[0])
+	if value: ds.updateDataList('HDT',value,'D',talker,nmea_type)
+	value=nmea_float(fields[4])
+	if value: ds.updateDataList('STW',value,'N',talker,nmea_type)
+
+def fast_dpt(ds,fields,talker,nmea_type):
+	value=nmea_float(fields[0])
+	if value: ds.updateDataList('DPT',value,'M',talker,nmea_type)
+
+def fast_dbt(ds,fields,talker,nmea_type):
+	value=nmea_float(fields[2])
+	if value: ds.updateDataList('DPT',value,'M',talker,nmea_type)
+
+def fast_rot(ds,fields,talker,nmea_type):
+	value=fields[0]
+	if value: ds.updateDataList('ROT',value,'D/M',talker,nmea_type)
+
+def fast_xdr(ds,fields,talker,nmea_type):
+	for i in range(0, len(fields)-3, 4):
+		value=fields[i+1]
+		if not value: continue
+		transducer_id=fields[i+3]
+		target=XDR_TRANSDUCERS.get(transducer_id)
+		if target:
+			unit=target[1]
+			if unit is None: unit=fields[i+2]
+			ds.updateDataList(target[0],value,unit,talker,nmea_type)
+			continue
+		for prefix, unit in XDR_PREFIXES:
+			if transducer_id.startswith(prefix):
+				if unit is None: unit=fields[i+2]
+				ds.updateDataList(transducer_id,value,unit,talker,nmea_type)
+				break
+
+for i in ('RMC','GGA','GNS','GLL'): register_sentence(i, extract_position)
+register_sentence('RMC', extract_rmc)
+register_sentence('HDG', extract_hdg)
+register_sentence('VHW', extract_vhw)
+register_sentence('HDM', extract_hdm)
+register_sentence('HDT', extract_hdt)
+register_sentence('VTG', extract_vtg)
+register_sentence('VBW', extract_vbw)
+register_sentence('VWR', extract_vwr)
+register_sentence('MWV', extract_mwv)
+register_sentence('VWT', extract_vwt)
+register_sentence('MWD', extract_mwd)
+register_sentence('ROT', extract_rot)
+register_sentence('DPT', extract_dpt)
+register_sentence('DBT', extract_dbt)
+register_sentence('XDR', extract_xdr)
+
+register_xdr('I2CP', 'I2CP', 'hPa') #pressure
+register_xdr('I2CT', 'I2CT', 'C') #temperature
+register_xdr('I2CH', 'I2CH', '%') #humidity
+register_xdr('I2CX', 'I2CX', 'D') #heel
+register_xdr('I2CY', 'I2CY', 'D') #pitch
+register_xdr_prefix('1W') #DS18B20 temperature
+
+register_fast_sentence('RMC', fast_rmc)
+register_fast_sentence('GGA', fast_gga)
+register_fast_sentence('VTG', fast_vtg)
+register_fast_sentence('HDG', fast_hdg)
+register_fast_sentence('HDM', fast_hdm)
+register_fast_sentence('HDT', fast_hdt)
+register_fast_sentence('MWV', fast_mwv)
+register_fast_sentence('VHW', fast_vhw)
+register_fast_sentence('DPT', fast_dpt)
+register_fast_sentence('DBT', fast_dbt)
+register_fast_sentence('ROT', fast_rot)
+register_fast_sentence('XDR', fast_xdr)
 
 class DataStream:
 
+	#sentence type -> sentences parsed, counted when nmea_bus.py sets a dictionary here
+	sentences=None
+	parse_errors=0
+
 	def __init__(self,conf):
 
 		GPIO.setmode(GPIO.BCM)
 		GPIO.setwarnings(False)
 
+		#DataList keeps the GUI order, DataIndex maps unique id -> position and DataItems unique id -> item
 		self.DataList=[]
+		self.DataIndex={}
+		self.DataItems={}
+		self.ShortItems={}
+		#functions called with the unique id of every magnitude updated
+		self.listeners=[]
 		
 		#(0 name, 1 short, 2 value, 3 unit, 4 timestamp, 5 talker, 6 sentence, 7 valid operators, 8 disable field, 9 unique id)
-		self.DataList.append([_('Latitude'),_('Lat'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'Lat'])
-		self.DataList.append([_('Longitude'),_('Lon'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'Lon'])
-		self.DataList.append([_('Date'),_('Date'),None,None,None,None,None,(0,1),1,'Date'])
-		self.DataList.append([_('Time'),_('Time'),None,None,None,None,None,(0,1),1,'Time'])
-		self.DataList.append([_('Magnetic Variation'),_('Var'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'Var'])
-		self.DataList.append([_('Magnetic Heading'),_('HDM'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'HDM'])
-		self.DataList.append([_('True Heading'),_('HDT'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'HDT'])
-		self.DataList.append([_('Course Over Ground'),_('COG'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'COG'])
-		self.DataList.append([_('Speed Over Ground'),_('SOG'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'SOG'])
-		self.DataList.append([_('Speed Through Water'),_('STW'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'STW'])
-		self.DataList.append([_('Water Depth (from transducer)'),_('DPT'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'DPT'])
-		self.DataList.append([_('Apparent Wind Angle'),_('AWA'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'AWA'])
-		self.DataList.append([_('True Wind Angle'),_('TWA'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'TWA'])
-		self.DataList.append([_('Apparent Wind Speed'),_('AWS'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'AWS'])
-		self.DataList.append([_('True Wind Speed'),_('TWS'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'TWS'])
-		self.DataList.append([_('True Wind Direction'),_('TWD'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'TWD'])
-		self.DataList.append([_('Air Pressure'),_('AP'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'I2CP'])
-		self.DataList.append([_('Air Temperature'),_('AT'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'I2CT'])
-		self.DataList.append([_('Air Relative Humidity'),_('ARH'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'I2CH'])
-		self.DataList.append([_('Rate of Turn'),_('ROT'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'ROT'])
-		self.DataList.append([_('Heel'),_('Heel'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'I2CX'])
-		self.DataList.append([_('Pitch'),_('Pitch'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'I2CY'])
+		self.appendDataList([_('Latitude'),_('Lat'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'Lat'])
+		self.appendDataList([_('Longitude'),_('Lon'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'Lon'])
+		self.appendDataList([_('Date'),_('Date'),None,None,None,None,None,(0,1),1,'Date'])
+		self.appendDataList([_('Time'),_('Time'),None,None,None,None,None,(0,1),1,'Time'])
+		self.appendDataList([_('Magnetic Variation'),_('Var'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'Var'])
+		self.appendDataList([_('Magnetic Heading'),_('HDM'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'HDM'])
+		self.appendDataList([_('True Heading'),_('HDT'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'HDT'])
+		self.appendDataList([_('Course Over Ground'),_('COG'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'COG'])
+		self.appendDataList([_('Speed Over Ground'),_('SOG'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'SOG'])
+		self.appendDataList([_('Speed Through Water'),_('STW'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'STW'])
+		self.appendDataList([_('Water Depth (from transducer)'),_('DPT'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'DPT'])
+		self.appendDataList([_('Apparent Wind Angle'),_('AWA'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'AWA'])
+		self.appendDataList([_('True Wind Angle'),_('TWA'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'TWA'])
+		self.appendDataList([_('Apparent Wind Speed'),_('AWS'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'AWS'])
+		self.appendDataList([_('True Wind Speed'),_('TWS'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'TWS'])
+		self.appendDataList([_('True Wind Direction'),_('TWD'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'TWD'])
+		self.appendDataList([_('Air Pressure'),_('AP'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'I2CP'])
+		self.appendDataList([_('Air Temperature'),_('AT'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'I2CT'])
+		self.appendDataList([_('Air Relative Humidity'),_('ARH'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'I2CH'])
+		self.appendDataList([_('Rate of Turn'),_('ROT'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'ROT'])
+		self.appendDataList([_('Heel'),_('Heel'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'I2CX'])
+		self.appendDataList([_('Pitch'),_('Pitch'),None,None,None,None,None,(0,1,2,3,4,5,6),1,'I2CY'])
 
 		#1W
-		x=conf.get('1W', 'DS18B20')
-		if x: sensors_list=eval(x)
-		else: sensors_list=[]
+		sensors_list=conf.get_list('1W', 'DS18B20')
 		for i in sensors_list:
 			try:
 				if i[5]=='1':
-					self.DataList.append([i[0],i[1],None,None,None,None,None,(0,1,2,3,4,5,6),1, i[4]])
+					self.appendDataList([i[0],i[1],None,None,None,None,None,(0,1,2,3,4,5,6),1, i[4]])
 			except Exception,e: print str(e)
 
 		#Switches
-		x=conf.get('INPUTS', 'switches')
-		if x: self.sw_list=eval(x)
-		else: self.sw_list=[]
+		self.sw_list=conf.get_list('INPUTS', 'switches')
 		for i in self.sw_list:
 			try:
 				if i[0]=='1':
-					self.DataList.append([i[1],i[2],None,None,None,None,None,(7,8),0, i[5]])
+					self.appendDataList([i[1],i[2],None,None,None,None,None,(7,8),0, i[5]])
 					channel=i[3]
 					pull_up_down=GPIO.PUD_DOWN
 					if i[4]=='up': pull_up_down=GPIO.PUD_UP
@@ -76,24 +422,20 @@ class DataStream:
 			except Exception,e: print str(e)
 
 		#Outputs
-		x=conf.get('OUTPUTS', 'outputs')
-		if x: self.out_list=eval(x)
-		else: self.out_list=[]
+		self.out_list=conf.get_list('OUTPUTS', 'outputs')
 		for i in self.out_list:
 			try:
 				if i[0]=='1':
-					self.DataList.append([i[1],i[2],None,None,None,None,None,(7,8),0, i[4]])
+					self.appendDataList([i[1],i[2],None,None,None,None,None,(7,8),0, i[4]])
 					channel=i[3]
 					GPIO.setup(channel, GPIO.OUT)
 			except Exception,e: print str(e)
 		
 		#MQTT
-		x=conf.get('MQTT', 'topics')
-		if x: topics_list=eval(x)
-		else: topics_list=[]
+		topics_list=conf.get_list('MQTT', 'topics')
 		for i in topics_list:
 			try:
-				self.DataList.append([i[1],i[0],None,None,None,None,None,(0,1,2,3,4,5,6),1, i[2]])
+				self.appendDataList([i[1],i[0],None,None,None,None,None,(0,1,2,3,4,5,6),1, i[2]])
 			except Exception,e: print str(e)
 
 
@@ -101,276 +443,104 @@ class DataStream:
 		#ATENTION. If order changes, edit monitoring.py: "#actions"
 		self.operators_list=[_('was not present in the last (sec.)'),_('was present in the last (sec.)'),_('is equal to'), _('is less than'), _('is less than or equal to'), _('is greater than'), _('is greater than or equal to'), _('is on'), _('is off')]
 		
+	def appendDataList(self, data):
+		item=DataItem(*data)
+		if item.uid not in self.DataIndex:
+			self.DataIndex[item.uid]=len(self.DataList)
+			self.DataItems[item.uid]=item
+		if item.short not in self.ShortItems: self.ShortItems[item.short]=item
+		self.DataList.append(item)
+
+	def notify(self, data):
+		for i in self.listeners: i(data)
+
 	def checkinputs(self):
 		for i in self.sw_list:
 			try:
 				if i[0]=='1':
-					if GPIO.input(i[3]):
-						self.DataList[self.getDataListIndex(i[5])][2]=1
-						self.DataList[self.getDataListIndex(i[5])][4]=time.time()
-					else:
-						self.DataList[self.getDataListIndex(i[5])][2]=0
-						self.DataList[self.getDataListIndex(i[5])][4]=time.time()
+					item=self.DataItems[i[5]]
+					if GPIO.input(i[3]): item.value=1
+					else: item.value=0
+					item.timestamp=time.time()
+					if self.listeners: self.notify(item.uid)
 			except Exception,e: print str(e)
 
 	def checkoutputs(self):
 		for i in self.out_list:
 			try:
 				if i[0]=='1':
-					if GPIO.input(i[3]):
-						self.DataList[self.getDataListIndex(i[4])][2]=1
-						self.DataList[self.getDataListIndex(i[4])][4]=time.time()
-					else:
-						self.DataList[self.getDataListIndex(i[4])][2]=0
-						self.DataList[self.getDataListIndex(i[4])][4]=time.time()
+					item=self.DataItems[i[4]]
+					if GPIO.input(i[3]): item.value=1
+					else: item.value=0
+					item.timestamp=time.time()
+					if self.listeners: self.notify(item.uid)
 			except Exception,e: print str(e)
 	
 	def getVariablesValue(self, data):
 		var_list=re.findall(r'\[(.*?)\]',data)
 		for i in var_list:
-			for ii in self.DataList:
-				if i==ii[1]: data=data.replace('['+i+']', str(ii[2]))
+			item=self.ShortItems.get(i)
+			if item: data=data.replace('['+i+']', str(item.value))
 		return data
 
 	def getDataListIndex(self, data):
-		for index, item in enumerate(self.DataList):
-			if item[9]==data: return index
+		return self.DataIndex.get(data)
+
+	def getDataItem(self, data):
+		return self.DataItems.get(data)
 
 	def validate(self,data,now,accuracy):
-		timestamp=self.DataList[self.getDataListIndex(data)][4]
+		item=self.DataItems[data]
+		timestamp=item.timestamp
 		if timestamp:
 			age=now-timestamp
 			if age <= accuracy: 
 				if data !='Date':
-					return float(self.DataList[self.getDataListIndex(data)][2])
+					return float(item.value)
 				else:
-					return self.DataList[self.getDataListIndex('Date')][2]
+					return item.value
 			else: return None
 	
-	def updateDataList(self,data,value,unit,talker,nmea_type):
-		i=self.getDataListIndex(data)
-		self.DataList[i][2]=value
-		self.DataList[i][3]=unit
-		self.DataList[i][4]=time.time()
-		self.DataList[i][5]=talker
-		self.DataList[i][6]=nmea_type
+	def updateDataList(self,data,value,unit,talker,nmea_type,timestamp=None):
+		item=self.DataItems[data]
+		item.value=value
+		item.unit=unit
+		if timestamp is None: timestamp=time.time()
+		item.timestamp=timestamp
+		item.talker=talker
+		item.sentence=nmea_type
+		if self.listeners: self.notify(data)
 
 	def parse_nmea(self, frase_nmea):
 		nmea_list=frase_nmea.split()
+		sentences=self.sentences
 		for i in nmea_list:
 			try:
+				nmea_type = i[3:6]
+				#AIS, pynmea2 can not parse it. Plugins registering an extractor for it get it
+				if i[:1]=='!' and nmea_type not in NMEA_EXTRACTORS:
+					if sentences is not None: sentences[nmea_type]=sentences.get(nmea_type,0)+1
+					continue
+				fast_extractor = NMEA_FAST.get(nmea_type)
+				if fast_extractor and i[0]=='$' and i[6:7]==',' and has_checksum(i):
+					fields = split_nmea(i)
+					#bad checksum, counted as pynmea2 would
+					if not fields:
+						self.parse_errors+=1
+						continue
+					try:
+						fast_extractor(self,fields,i[1:3],nmea_type)
+						if sentences is not None: sentences[nmea_type]=sentences.get(nmea_type,0)+1
+						continue
+					#short sentence, let pynmea2 deal with it
+					except IndexError: pass
 				msg = pynmea2.parse(i)
 				nmea_type = msg.sentence_type
-				talker = msg.talker
-
-				if nmea_type == 'RMC' or nmea_type =='GGA' or nmea_type =='GNS' or nmea_type =='GLL':
-					#lat
-					value=round(msg.latitude,4)
-					if value:
-						unit=msg.lat_dir #N, S
-						self.updateDataList('Lat',value,unit,talker,nmea_type)
-					#lon
-					value=round(msg.longitude,4)
-					if value:
-						unit=msg.lon_dir #E, W
-						self.updateDataList('Lon',value,unit,talker,nmea_type)						
-				if nmea_type == 'RMC':
-					#date
-					value=msg.datestamp
-					if value:
-						unit='UTC'
-						self.updateDataList('Date',value,unit,talker,nmea_type)
-					#time
-					value=msg.timestamp
-					if value:
-						unit='UTC'
-						self.updateDataList('Time',value,unit,talker,nmea_type)
-					#magnetic variation
-					value=msg.mag_variation
-					if value:
-						unit=msg.mag_var_dir #E, W
-						self.updateDataList('Var',value,unit,talker,nmea_type)
-					#course over ground
-					value=msg.true_course
-					if value:
-						unit='D'
-						self.updateDataList('COG',value,unit,talker,nmea_type)
-					#speed over ground
-					value=msg.spd_over_grnd
-					if value:
-						unit='N'
-						self.updateDataList('SOG',value,unit,talker,nmea_type)
-				if nmea_type == 'HDG':
-					#magnetic variation
-					value=msg.variation
-					if value:
-						unit=msg.var_dir #E, W
-						self.updateDataList('Var',value,unit,talker,nmea_type)
-					#magnetic heading
-					value=msg.heading
-					if value:
-						unit='D'
-						self.updateDataList('HDM',value,unit,talker,nmea_type)
-				if nmea_type == 'VHW':
-					#magnetic heading
-					value=msg.heading_magnetic
-					if value:
-						unit='D'
-						self.updateDataList('HDM',value,unit,talker,nmea_type)
-					#true heading
-					value=msg.heading_true
-					if value:
-						unit='D'
-						self.updateDataList('HDT',value,unit,talker,nmea_type)
-					#speed trought water
-					value=msg.water_speed_knots
-					if value:
-						unit='N'
-						self.updateDataList('STW',value,unit,talker,nmea_type)
-				if nmea_type == 'HDM':
-					#magnetic heading
-					value=msg.heading
-					if value:
-						unit='D'
-						self.updateDataList('HDM',value,unit,talker,nmea_type)
-				if nmea_type == 'HDT':
-					#true heading
-					value=msg.heading
-					if value:
-						unit='D'
-						self.updateDataList('HDT',value,unit,talker,nmea_type)
-				if nmea_type == 'VTG':
-					#course over ground
-					value=msg.true_track
-					if value:
-						unit='D'
-						self.updateDataList('COG',value,unit,talker,nmea_type)
-					#speed over ground
-					value=msg.spd_over_grnd_kts
-					if value:
-						unit='N'
-						self.updateDataList('SOG',value,unit,talker,nmea_type)
-				if nmea_type == 'VBW':
-					#speed trought water
-					value=msg.lon_water_spd
-					if value:
-						unit='N'
-						self.updateDataList('STW',value,unit,talker,nmea_type)
-				if nmea_type == 'VWR':
-					#apparent wind angle
-					value=msg.deg_r
-					if value:
-						unit=msg.l_r #L=Left, R=Right
-						self.updateDataList('AWA',value,unit,talker,nmea_type)
-					#apparent wind speed
-					value=msg.wind_speed_kn
-					if value:
-						unit='N'
-						self.updateDataList('AWS',value,unit,talker,nmea_type)
-				if nmea_type == 'MWV':
-					value0=msg.reference
-					if value0=='R':
-						#apparent wind angle
-						value=msg.wind_angle
-						if value:
-							unit='D'
-							self.updateDataList('AWA',value,unit,talker,nmea_type)
-						#apparent wind speed
-						if msg.wind_speed_units=='N':
-							value=msg.wind_speed
-						if value:
-							unit='N'
-							self.updateDataList('AWS',value,unit,talker,nmea_type)
-					if value0=='T':
-						#true wind angle
-						value=msg.wind_angle
-						if value:
-							unit='D'
-							self.updateDataList('TWA',value,unit,talker,nmea_type)
-						#true wind speed
-						value=msg.wind_speed
-						if value:
-							unit='N'
-							self.updateDataList('TWS',value,unit,talker,nmea_type)
-				if nmea_type == 'VWT':
-					#true wind angle
-					value=msg.wind_angle_vessel
-					if value:
-						unit=msg.direction #L=Left, R=Right
-						self.updateDataList('TWA',value,unit,talker,nmea_type)
-					#true wind speed
-					value=msg.wind_speed_knots
-					if value:
-						unit='N'
-						self.updateDataList('TWS',value,unit,talker,nmea_type)
-				if nmea_type == 'MWD':
-					#true wind direction
-					value=msg.direction_true
-					if value:
-						unit='D'
-						self.updateDataList('TWD',value,unit,talker,nmea_type)
-					#true wind speed
-					value=msg.wind_speed_knots
-					if value:
-						unit='N'
-						self.updateDataList('TWS',value,unit,talker,nmea_type)
-				if nmea_type == 'ROT':
-					#rate of turn
-					value=msg.rate_of_turn
-					if value:
-						unit='D/M'
-						self.updateDataList('ROT',value,unit,talker,nmea_type)
-				if nmea_type == 'DPT':
-					#water Depth
-					value=msg.depth
-					if value:
-						unit='M'
-						self.updateDataList('DPT',value,unit,talker,nmea_type)
-				if nmea_type == 'DBT':
-					#water Depth
-					value=msg.depth_meters
-					if value:
-						unit='M'
-						self.updateDataList('DPT',value,unit,talker,nmea_type)
-				if nmea_type == 'XDR':
-					n=msg.num_transducers
-					for i in range(0, n):
-						transducer=msg.get_transducer(i)
-						if transducer.id=='I2CP':		
-							#pressure
-							value=transducer.value
-							if value:
-								unit='hPa'
-								self.updateDataList('I2CP',value,unit,talker,nmea_type)
-						if transducer.id=='I2CT':		
-							#temperature
-							value=transducer.value
-							if value:
-								unit='C'
-								self.updateDataList('I2CT',value,unit,talker,nmea_type)
-						if transducer.id=='I2CH':		
-							#humidity
-							value=transducer.value
-							if value:
-								unit='%'
-								self.updateDataList('I2CH',value,unit,talker,nmea_type)
-						if transducer.id=='I2CX':		
-							#heel
-							value=transducer.value
-							if value:
-								unit='D'
-								self.updateDataList('I2CX',value,unit,talker,nmea_type)		
-						if transducer.id=='I2CY':		
-							#pitch
-							value=transducer.value
-							if value:
-								unit='D'
-								self.updateDataList('I2CY',value,unit,talker,nmea_type)					
-						if transducer.id[:2]=='1W':		
-							#DS18B20 temperature
-							value=transducer.value
-							if value:
-								unit=transducer.units
-								self.updateDataList(transducer.id,value,unit,talker,nmea_type)
+				if sentences is not None: sentences[nmea_type]=sentences.get(nmea_type,0)+1
+				extractors = NMEA_EXTRACTORS.get(nmea_type)
+				if extractors:
+					talker = msg.talker
+					for extractor in extractors:
+						extractor(self,msg,talker,nmea_type)
 			#except Exception,e: print str(e)
-			except: pass
\ No newline at end of file
+			except: self.parse_errors+=1
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import sqlite3, ast
+from contextlib import contextmanager
+
+class ListStore:
+
+	#list valued config items in a SQLite file, one table row for each list row, so changing a row writes
+	#only that row. Rows are kept as python literals, they read back with the same types they had in
+	#openplotter.conf. Every change increases the version of its list, other processes compare versions.
+	def __init__(self, path):
+		self.path=path
+		#transactions are started by hand, see transaction()
+		self.db=sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+		self.depth=0
+		self.db.execute('CREATE TABLE IF NOT EXISTS lists (section TEXT, item TEXT, version INTEGER, PRIMARY KEY (section, item))')
+		self.db.execute('CREATE TABLE IF NOT EXISTS rows (section TEXT, item TEXT, position INTEGER, data TEXT)')
+		self.db.execute('CREATE INDEX IF NOT EXISTS rows_position ON rows (section, item, position)')
+
+	@contextmanager
+	def transaction(self):
+		#nested transactions are part of the outer one, the database is locked until it ends
+		if not self.depth: self.db.execute('BEGIN IMMEDIATE')
+		self.depth+=1
+		try: yield
+		except:
+			self.depth-=1
+			if not self.depth: self.db.execute('ROLLBACK')
+			raise
+		self.depth-=1
+		if not self.depth: self.db.execute('COMMIT')
+
+	def data_version(self):
+		#changes when another connection commits
+		return self.db.execute('PRAGMA data_version').fetchone()[0]
+
+	def versions(self):
+		#{(section, item): version} of the lists stored
+		return dict(((section, item), version) for section, item, version in self.db.execute('SELECT section, item, version FROM lists'))
+
+	def rows(self, key):
+		cursor=self.db.execute('SELECT data FROM rows WHERE section=? AND item=? ORDER BY position', key)
+		return [ast.literal_eval(i[0]) for i in cursor]
+
+	def bump(self, key):
+		self.db.execute('UPDATE lists SET version=version+1 WHERE section=? AND item=?', key)
+		return self.db.execute('SELECT version FROM lists WHERE section=? AND item=?', key).fetchone()[0]
+
+	def create(self, key, rows):
+		#first use of a list, rows are the ones of openplotter.conf. False if another process created it before
+		with self.transaction():
+			if self.db.execute('SELECT 1 FROM lists WHERE section=? AND item=?', key).fetchone(): return False
+			self.db.execute('INSERT INTO lists VALUES (?, ?, 1)', key)
+			self.insert(key, 0, rows)
+		return True
+
+	def insert(self, key, start, rows):
+		self.db.executemany('INSERT INTO rows VALUES (?, ?, ?, ?)', [key+(start+i, repr(row)) for i, row in enumerate(rows)])
+
+	def count(self, key):
+		return self.db.execute('SELECT COUNT(*) FROM rows WHERE section=? AND item=?', key).fetchone()[0]
+
+	def replace(self, key, rows):
+		with self.transaction():
+			self.db.execute('DELETE FROM rows WHERE section=? AND item=?', key)
+			self.insert(key, 0, rows)
+			return self.bump(key)
+
+	def set_row(self, key, index, row):
+		#index None appends the row. Returns the new version and the index of the row
+		with self.transaction():
+			count=self.count(key)
+			if index is None: index=count
+			if index < 0 or index > count: raise IndexError('list index out of range')
+			if index==count: self.insert(key, index, [row])
+			else: self.db.execute('UPDATE rows SET data=? WHERE section=? AND item=? AND position=?', (repr(row),)+key+(index,))
+			return self.bump(key), index
+
+	def delete_row(self, key, index):
+		with self.transaction():
+			if not 0 <= index < self.count(key): raise IndexError('list index out of range')
+			self.db.execute('DELETE FROM rows WHERE section=? AND item=? AND position=?', key+(index,))
+			self.db.execute('UPDATE rows SET position=position-1 WHERE section=? AND item=? AND position>?', key+(index,))
+			return self.bump(key)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import threading, time, resource, socket, BaseHTTPServer
+
+#http://127.0.0.1:<port>/metrics (Prometheus text format) and /health of every daemon
+METRICS_PORTS={
+	'nmea_bus': 9101,
+	'monitoring': 9102,
+	'calculate': 9103,
+	'i2c': 9104,
+	'1w': 9105,
+}
+
+PREFIX='openplotter_'
+
+def labels_key(labels):
+	if not labels: return ()
+	return tuple(sorted(labels.items()))
+
+def labels_text(key):
+	if not key: return ''
+	return '{'+','.join('%s="%s"' % (i, str(j).replace('\\', '\\\\').replace('"', '\\"')) for i, j in key)+'}'
+
+class Metrics:
+
+	#counters, gauges and timings of one daemon. Every method can be called from any thread.
+	#Timings are written as summaries (_count, _sum) plus a gauge _max with the longest one since the last scrape.
+	def __init__(self, daemon):
+		self.daemon=daemon
+		self.lock=threading.Lock()
+		#(name, labels) -> value
+		self.counters={}
+		self.gauges={}
+		#(name, labels) -> [count, sum, max]
+		self.timings={}
+		#name -> function returning a value or [(labels, value)], called when scraped
+		self.functions={}
+		self.types={}
+		self.start=time.time()
+		self.loop_started=None
+		self.last_loop=None
+
+	def inc(self, name, labels=None, value=1):
+		key=(name, labels_key(labels))
+		with self.lock: self.counters[key]=self.counters.get(key, 0)+value
+
+	def set(self, name, value, labels=None):
+		with self.lock: self.gauges[(name, labels_key(labels))]=value
+
+	def observe(self, name, seconds, labels=None):
+		key=(name, labels_key(labels))
+		with self.lock:
+			timing=self.timings.get(key)
+			if timing is None: self.timings[key]=[1, seconds, seconds]
+			else:
+				timing[0]+=1
+				timing[1]+=seconds
+				if seconds > timing[2]: timing[2]=seconds
+		return seconds
+
+	def function(self, name, function, kind='gauge'):
+		self.functions[name]=function
+		self.types[name]=kind
+
+	def sendto(self, sock, data, address):
+		#UDP to kplex, failures are counted instead of stopping the daemon
+		try: sock.sendto(data, address)
+		except socket.error:
+			self.inc('udp_send_failures_total')
+			return False
+		self.inc('udp_sent_total')
+		return True
+
+	#call loop_end() before the sleep of the main loop and loop_start() after it
+	def loop_start(self):
+		self.loop_started=time.time()
+
+	def loop_end(self):
+		now=time.time()
+		if self.loop_started is not None: self.observe('loop_seconds', now-self.loop_started)
+		self.last_loop=now
+
+	def render(self):
+		lines=[]
+		def add(name, kind, samples):
+			lines.append('# TYPE %s%s %s' % (PREFIX, name, kind))
+			for key, value in samples: lines.append('%s%s%s %s' % (PREFIX, name, labels_text(key), repr(float(value))))
+		def group(values):
+			result={}
+			for (name, key), value in values.iteritems(): result.setdefault(name, []).append((key, value))
+			return result
+		with self.lock:
+			counters=group(self.counters)
+			gauges=group(self.gauges)
+			timings=group(dict((i, tuple(j)) for i, j in self.timings.iteritems()))
+			#max since the last scrape
+			for i in self.timings.itervalues(): i[2]=0.0
+		for name in sorted(counters): add(name, 'counter', sorted(counters[name]))
+		for name in sorted(gauges): add(name, 'gauge', sorted(gauges[name]))
+		for name in sorted(timings):
+			samples=sorted(timings[name])
+			lines.append('# TYPE %s%s summary' % (PREFIX, name))
+			for key, value in samples:
+				lines.append('%s%s_count%s %d' % (PREFIX, name, labels_text(key), value[0]))
+				lines.append('%s%s_sum%s %s' % (PREFIX, name, labels_text(key), repr(value[1])))
+			add(name+'_max', 'gauge', [(key, value[2]) for key, value in samples])
+		for name in sorted(self.functions):
+			try: value=self.functions[name]()
+			except Exception,e:
+				print str(e)
+				continue
+			if isinstance(value, list): samples=sorted((labels_key(i), j) for i, j in value)
+			else: samples=[((), value)]
+			add(name, self.types[name], samples)
+		usage=resource.getrusage(resource.RUSAGE_SELF)
+		add('cpu_seconds_total', 'counter', [((), usage.ru_utime+usage.ru_stime)])
+		add('max_rss_bytes', 'gauge', [((), usage.ru_maxrss*1024)])
+		add('uptime_seconds', 'gauge', [((), time.time()-self.start)])
+		return '\n'.join(lines)+'\n'
+
+	def health(self, stalled=10):
+		#(ok, text). Daemons with a main loop are unhealthy when it has not run for stalled seconds.
+		if self.last_loop is None: return True, 'ok\n'
+		age=time.time()-self.last_loop
+		if age > stalled: return False, 'loop stalled %.1f s\n' % age
+		return True, 'ok\n'
+
+	def serve(self, port=None):
+		if port is None: port=METRICS_PORTS[self.daemon]
+		metrics=self
+		class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+			def do_GET(self):
+				if self.path=='/metrics':
+					status=200
+					body=metrics.render()
+					content='text/plain; version=0.0.4'
+				elif self.path=='/health':
+					ok, body=metrics.health()
+					status=200 if ok else 503
+					content='text/plain'
+				else:
+					status=404
+					body='not found\n'
+					content='text/plain'
+				self.send_response(status)
+				self.send_header('Content-Type', content)
+				self.send_header('Content-Length', str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+			def log_message(self, format, *args): pass
+		try: self.server=BaseHTTPServer.HTTPServer(('127.0.0.1', port), Handler)
+		except socket.error, e:
+			print 'metrics of '+self.daemon+' not served: '+str(e)
+			return False
+		thread=threading.Thread(target=self.server.serve_forever)
+		thread.daemon=True
+		thread.start()
+		return True
@@ -15,14 +15,142 @@
 # along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
 
 import paho.mqtt.client as paho
-import time
+import threading, Queue
+
+class TopicTrie:
+
+	#subscription topics split by levels. match() gives the values of every subscription matching a topic,
+	#with + (one level) and # (this level and all below) wildcards
+	def __init__(self):
+		self.root=({}, [])
+
+	def insert(self, topic, value):
+		node=self.root
+		for level in topic.split('/'):
+			node=node[0].setdefault(level, ({}, []))
+		node[1].append(value)
+
+	def match(self, topic):
+		result=[]
+		levels=topic.split('/')
+		nodes=[self.root]
+		for index, level in enumerate(levels):
+			next_nodes=[]
+			for node in nodes:
+				children=node[0]
+				#topics starting with $ are not matched by wildcards in the first level
+				if not (index==0 and level[:1]=='$'):
+					if '#' in children: result.extend(children['#'][1])
+					if '+' in children: next_nodes.append(children['+'])
+				if level in children: next_nodes.append(children[level])
+			nodes=next_nodes
+			if not nodes: return result
+		for node in nodes:
+			result.extend(node[1])
+			#a/# also matches a
+			if '#' in node[0]: result.extend(node[0]['#'][1])
+		return result
+
+#one connection per broker and process, shared by Mqtt (subscriptions) and Actions (publish)
+CONNECTIONS={}
+CONNECTIONS_LOCK=threading.Lock()
+
+def mqtt_connection(broker, port, user, passw):
+	key=(broker, str(port), user, passw)
+	with CONNECTIONS_LOCK:
+		if key not in CONNECTIONS: CONNECTIONS[key]=MqttConnection(broker, port, user, passw)
+		return CONNECTIONS[key]
+
+class MqttConnection:
+
+	#long lived paho client. paho reconnects in its own thread and subscriptions are renewed on every connection.
+	#publish() only queues the message, a thread per broker sends it when connected so a dead broker
+	#does not block the others. When the queue is full the oldest message is dropped.
+	def __init__(self, broker, port, user, passw, size=1000):
+		self.broker=broker
+		self.port=int(port)
+		self.connected=threading.Event()
+		self.lock=threading.Lock()
+		self.listeners=[]
+		#topic -> number of listeners subscribed
+		self.topics={}
+		self.queue=Queue.Queue(size)
+		self.published=0
+		self.dropped=0
+		self.received=0
+		self.client = paho.Client()
+		self.client.on_message = self.on_message
+		self.client.on_connect = self.on_connect
+		self.client.on_disconnect = self.on_disconnect
+		self.client.username_pw_set(user, passw)
+		self.client.reconnect_delay_set(1, 30)
+		self.client.connect_async(broker, self.port)
+		self.client.loop_start()
+		self.thread=threading.Thread(target=self.publish_loop)
+		self.thread.daemon=True
+		self.thread.start()
+
+	def on_connect(self, client, userdata, flags, rc):
+		if rc!=0: return
+		with self.lock: topics=self.topics.keys()
+		for i in topics:
+			try: client.subscribe(i, qos=0)
+			except Exception,e: print str(e)
+		self.connected.set()
+
+	def on_disconnect(self, client, userdata, rc):
+		self.connected.clear()
+
+	def on_message(self, client, userdata, msg):
+		self.received+=1
+		for i in self.listeners: i(client, userdata, msg)
+
+	def add_listener(self, listener, topics):
+		with self.lock:
+			self.listeners=self.listeners+[listener]
+			for i in topics:
+				self.topics[i]=self.topics.get(i, 0)+1
+				if self.topics[i]==1 and self.connected.is_set(): self.client.subscribe(i, qos=0)
+
+	def remove_listener(self, listener, topics):
+		with self.lock:
+			self.listeners=[i for i in self.listeners if i!=listener]
+			for i in topics:
+				if i not in self.topics: continue
+				self.topics[i]-=1
+				if self.topics[i] > 0: continue
+				del self.topics[i]
+				if self.connected.is_set(): self.client.unsubscribe(i)
+
+	def publish(self, topic, payload):
+		while True:
+			try:
+				self.queue.put_nowait((topic, payload))
+				return
+			except Queue.Full:
+				try:
+					self.queue.get_nowait()
+					self.dropped+=1
+				except Queue.Empty: pass
+
+	def publish_loop(self):
+		while True:
+			topic, payload=self.queue.get()
+			self.connected.wait()
+			try:
+				self.client.publish(topic, payload=payload)
+				self.published+=1
+			except Exception,e: print str(e)
 
 class Mqtt:
 	def __init__(self,conf,a):
 		self.a=a
-		x=conf.get('MQTT', 'topics')
-		if x: self.topics_list=eval(x)
-		else: self.topics_list=[]
+		self.topics_list=conf.get_list('MQTT', 'topics')
+		self.topics=[i[1] for i in self.topics_list]
+		#topic -> unique ids of the magnitudes
+		self.trie=TopicTrie()
+		for i in self.topics_list:
+			if a.getDataItem(i[2]): self.trie.insert(i[1], i[2])
 
 		local_broker='127.0.0.1'
 		local_port='1883'
@@ -32,42 +160,24 @@ class Mqtt:
 		self.client_local=''
 
 		if self.topics_list:
-			self.client_local = paho.Client()
-			self.client_local.on_message = self.on_message
-			self.client_local.on_connect = self.on_connect
-			self.client_local.username_pw_set(user, passw)
-			self.client_local.connect(local_broker, local_port)
-			self.client_local.loop_start()
+			self.client_local = mqtt_connection(local_broker, local_port, user, passw)
+			self.client_local.add_listener(self.on_message, self.topics)
 
 		broker=conf.get('MQTT', 'broker')
 		port=conf.get('MQTT', 'port')
 
 		if self.topics_list and broker and port :
-			self.client = paho.Client()
-			self.client.on_message = self.on_message
-			self.client.on_connect = self.on_connect
-			self.client.username_pw_set(user, passw)
 			try:
-				self.client.connect(broker, port)
-				self.client.loop_start()
+				self.client = mqtt_connection(broker, port, user, passw)
+				self.client.add_listener(self.on_message, self.topics)
 			except Exception,e: print str(e)
 
-
 	def on_message(self, client, userdata, msg):
-		for index, item in enumerate(self.a.DataList):
-			if item[0]==msg.topic:
-				self.a.DataList[index][2]=None
-				time.sleep(0.05)
-				self.a.DataList[index][2]=str(msg.payload)
-				self.a.DataList[index][4]=time.time()
-		#print(msg.topic+" "+str(msg.qos)+" "+str(msg.payload))
-
-	def on_connect(self, client, userdata, flags, rc):
-		for i in self.topics_list:
-			try:
-				client.subscribe(i[1], qos=0)
-			except Exception,e: print str(e)
+		#runs in the paho thread, updateDataList only assigns the fields of the item
+		payload=str(msg.payload)
+		for i in self.trie.match(msg.topic):
+			self.a.updateDataList(i,payload,None,None,None)
 
 	def stop(self):
-		if self.client: self.client.loop_stop()
-		if self.client_local: self.client_local.loop_stop()
\ No newline at end of file
+		if self.client: self.client.remove_listener(self.on_message, self.topics)
+		if self.client_local: self.client_local.remove_listener(self.on_message, self.topics)
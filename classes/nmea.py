@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import operator
+from pynmea2.nmea_utils import timestamp, datestamp, dm_to_sd
+
+#lean helpers to read NMEA 0183 sentences without building pynmea2 objects
+
+def nmea_checksum(data):
+	return reduce(operator.xor, bytearray(data), 0)
+
+def has_checksum(sentence):
+	return len(sentence) > 9 and sentence[-3]=='*'
+
+def check_nmea(sentence):
+	#True if the sentence has a checksum and it matches
+	if not has_checksum(sentence): return False
+	try:
+		return nmea_checksum(sentence[1:-3])==int(sentence[-2:],16)
+	except ValueError: return False
+
+def split_nmea(sentence):
+	#returns the data fields of a "$ttsss,f1,f2...*hh" sentence or None if the checksum does not match
+	if not check_nmea(sentence): return None
+	return sentence[7:-3].split(',')
+
+def nmea_float(field):
+	if field:
+		try: return float(field)
+		except ValueError: return None
+	return None
+
+def nmea_latlon(dm, hemisphere):
+	sd=dm_to_sd(dm)
+	if hemisphere=='S' or hemisphere=='W': return -sd
+	if hemisphere=='N' or hemisphere=='E': return sd
+	return 0.
+
+def nmea_date(field):
+	if field: return datestamp(field)
+	return None
+
+def nmea_time(field):
+	if field: return timestamp(field)
+	return None
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import socket, threading, time, datetime, os, subprocess, Queue
+from classes.datastream import DataStream
+from classes.nmeastream import NmeaStream
+
+#nmea_bus.py parses the 10110 feed once and sends the results to monitoring.py, calculate.py and output.py
+#through this Unix socket. One tab separated line per event:
+#U, unique id, value type, value, unit, timestamp, talker, sentence for every updated magnitude
+#S, sentence for raw sentences, only sent to clients that said "raw" when connecting
+BUS_SOCKET='/tmp/openplotter-nmea-bus'
+#lines waiting for a client before it is dropped, it reconnects and gets the last values again
+QUEUE_SIZE=2000
+SEND_TIMEOUT=10
+
+def value_kind(value):
+	#value type and text for the bus and the snapshot: n None, s string, D date, T time, f number
+	if value is None: return 'n', ''
+	if isinstance(value, str): return 's', value
+	if isinstance(value, datetime.date): return 'D', value.strftime('%Y%m%d')
+	if isinstance(value, datetime.time): return 'T', value.strftime('%H%M%S%f')
+	return 'f', repr(float(value))
+
+def encode_update(data,value,unit,timestamp,talker,nmea_type):
+	kind, value=value_kind(value)
+	return '\t'.join(('U',data,kind,value,unit or '',repr(timestamp),talker or '',nmea_type or ''))+'\n'
+
+def decode_value(kind, value):
+	if kind=='f': return float(value)
+	if kind=='s': return value
+	if kind=='D': return datetime.date(int(value[:4]),int(value[4:6]),int(value[6:8]))
+	if kind=='T': return datetime.time(int(value[:2]),int(value[2:4]),int(value[4:6]),int(value[6:]))
+	return None
+
+def start_bus(currentpath, restart=False):
+	#starts nmea_bus.py if it is not running
+	if restart: subprocess.call(['pkill', '-f', 'nmea_bus.py'])
+	elif subprocess.call(['pgrep', '-f', 'nmea_bus.py'], stdout=open(os.devnull, 'w'))==0: return
+	subprocess.Popen(['python', currentpath+'/nmea_bus.py'])
+
+class BusDataStream(DataStream):
+
+	#parses like DataStream but keeps every magnitude found, known by this process or not, and sends each update
+	#to publish(data,value,unit,timestamp,talker,nmea_type)
+	def __init__(self, publish):
+		self.publish=publish
+
+	def updateDataList(self,data,value,unit,talker,nmea_type,timestamp=None):
+		if timestamp is None: timestamp=time.time()
+		self.publish(data,value,unit,timestamp,talker,nmea_type)
+
+class BusWriter:
+
+	#one client of the bus. Lines are queued and sent by its own thread so a slow client never blocks the parser
+	def __init__(self, sock, raw, closed):
+		self.sock=sock
+		self.raw=raw
+		self.closed=closed
+		self.queue=Queue.Queue(QUEUE_SIZE)
+		self.thread=threading.Thread(target=self.run)
+		self.thread.daemon=True
+		self.thread.start()
+
+	def put(self, line):
+		#False if the client is too far behind
+		try: self.queue.put_nowait(line)
+		except Queue.Full: return False
+		return True
+
+	def run(self):
+		self.sock.settimeout(SEND_TIMEOUT)
+		while True:
+			line=self.queue.get()
+			if line is None: break
+			try: self.sock.sendall(line)
+			except socket.error: break
+		try: self.sock.close()
+		except: pass
+		self.closed(self)
+
+	def close(self):
+		#a send in progress fails at once
+		try: self.sock.shutdown(socket.SHUT_RDWR)
+		except socket.error: pass
+		try: self.queue.put_nowait(None)
+		except Queue.Full: pass
+
+class NmeaBusServer:
+
+	def __init__(self, path=BUS_SOCKET):
+		self.path=path
+		self.clients=[]
+		self.raw_clients=[]
+		self.lock=threading.Lock()
+		self.state={}
+		#clients dropped because they did not read
+		self.dropped=0
+		if os.path.exists(self.path): os.remove(self.path)
+		self.sock=socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self.sock.bind(self.path)
+		self.sock.listen(8)
+		self.thread=threading.Thread(target=self.accept_loop)
+		self.thread.daemon=True
+		self.thread.start()
+
+	def accept_loop(self):
+		while True:
+			try:
+				client, address=self.sock.accept()
+				#the subscription is read in its own thread so a silent client does not delay the others
+				thread=threading.Thread(target=self.register, args=(client,))
+				thread.daemon=True
+				thread.start()
+			except Exception,e: print str(e)
+
+	def register(self, client):
+		try:
+			client.settimeout(2)
+			mode=client.recv(16).strip()
+			writer=BusWriter(client, mode=='raw', self.closed)
+			with self.lock:
+				#the last value of every magnitude first so the new client does not wait for the next sentence
+				writer.put(''.join(self.state.values()))
+				self.clients.append(writer)
+				if writer.raw: self.raw_clients.append(writer)
+		except Exception,e:
+			print str(e)
+			try: client.close()
+			except: pass
+
+	def send(self, line, clients):
+		for client in clients[:]:
+			if client.put(line): continue
+			self.dropped+=1
+			self.remove(client)
+
+	def remove(self, client):
+		if client in self.clients: self.clients.remove(client)
+		if client in self.raw_clients: self.raw_clients.remove(client)
+		client.close()
+
+	def closed(self, client):
+		#the writer thread of a client has ended
+		with self.lock:
+			if client in self.clients: self.remove(client)
+
+	def publish(self,data,value,unit,timestamp,talker,nmea_type):
+		line=encode_update(data,value,unit,timestamp,talker,nmea_type)
+		with self.lock:
+			self.state[data]=line
+			self.send(line, self.clients)
+
+	def publish_raw(self, sentence):
+		if not self.raw_clients: return
+		with self.lock:
+			self.send('S\t'+sentence+'\n', self.raw_clients)
+
+	def close(self):
+		with self.lock:
+			for client in self.clients[:]: self.remove(client)
+		self.sock.close()
+		if os.path.exists(self.path): os.remove(self.path)
+
+class NmeaBusClient(NmeaStream):
+
+	#receives the magnitudes parsed by nmea_bus.py and writes them in the DataStream a.
+	#Iterating gives the raw sentences when raw=True.
+	def __init__(self, a, raw=False, path=BUS_SOCKET, stop_event=None):
+		NmeaStream.__init__(self, path, 0, timeout=5, reconnect=True, stop_event=stop_event)
+		self.a=a
+		self.raw=raw
+		self.path=path
+		#while paused updates are read but not applied
+		self.pause=0
+
+	def connect(self):
+		self.close()
+		try:
+			self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+			self.sock.settimeout(self.timeout)
+			self.sock.connect(self.path)
+			if self.raw: self.sock.sendall('raw\n')
+			else: self.sock.sendall('data\n')
+		except socket.error, error_msg:
+			self.error=str(error_msg)
+			self.close()
+			return False
+		self.error=''
+		self.connected=True
+		self.backoff=self.backoff_min
+		return True
+
+	def feed(self, data):
+		self.bytes+=len(data)
+		lines=(self.carry+data).split('\n')
+		self.carry=lines.pop()
+		sentences=[]
+		for i in lines:
+			event=i.split('\t')
+			try:
+				if event[0]=='U':
+					if self.pause: continue
+					self.a.updateDataList(event[1],decode_value(event[2],event[3]),event[4],event[6],event[7],float(event[5]))
+				elif event[0]=='S': sentences.append(event[1])
+			#magnitudes not in this DataStream are ignored
+			except KeyError: pass
+			except (ValueError, IndexError): self.dropped+=1
+		self.sentences+=len(sentences)
+		return sentences
+
+	def run(self):
+		for i in self: pass
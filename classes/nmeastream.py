@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import socket, time
+from classes.nmea import has_checksum, check_nmea
+
+class NmeaStream:
+
+	#reads the kplex TCP feed and gives complete sentences. Sentences split between two recv() are joined
+	#using a carry-over buffer and connections are retried with an increasing delay.
+	def __init__(self, host='localhost', port=10110, timeout=5, reconnect=True, stop_event=None):
+		self.host=host
+		self.port=port
+		self.timeout=timeout
+		self.reconnect=reconnect
+		self.stop_event=stop_event
+		self.backoff_min=0.5
+		self.backoff_max=16
+		self.backoff=self.backoff_min
+		self.max_line=4096
+		self.sock=''
+		self.carry=''
+		self.connected=False
+		#last socket error, empty when working
+		self.error=''
+		#counters
+		self.bytes=0
+		self.sentences=0
+		self.checksum_errors=0
+		self.dropped=0
+		self.reconnects=0
+
+	def stopped(self):
+		return self.stop_event and self.stop_event.is_set()
+
+	def connect(self):
+		self.close()
+		try:
+			self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+			self.sock.settimeout(self.timeout)
+			self.sock.connect((self.host, self.port))
+		except socket.error, error_msg:
+			self.error=str(error_msg[0])
+			print 'Failed to connect with '+self.host+':'+str(self.port)+'. Error: '+self.error
+			self.close()
+			return False
+		self.error=''
+		self.connected=True
+		self.backoff=self.backoff_min
+		return True
+
+	def close(self):
+		if self.sock:
+			try: self.sock.close()
+			except: pass
+		self.sock=''
+		self.connected=False
+		self.carry=''
+
+	def wait(self):
+		#sleeps the current backoff in short steps so stop_event is honoured
+		end=time.time()+self.backoff
+		self.backoff=min(self.backoff*2, self.backoff_max)
+		while time.time() < end:
+			if self.stopped(): return
+			time.sleep(0.1)
+
+	def feed(self, data):
+		#returns the complete sentences in data and keeps the unfinished tail for the next call
+		self.bytes+=len(data)
+		lines=(self.carry+data).split('\n')
+		self.carry=lines.pop()
+		if len(self.carry) > self.max_line:
+			self.carry=''
+			self.dropped+=1
+		sentences=[]
+		for i in lines:
+			i=i.strip()
+			if not i: continue
+			if has_checksum(i) and not check_nmea(i):
+				self.checksum_errors+=1
+				continue
+			sentences.append(i)
+		self.sentences+=len(sentences)
+		return sentences
+
+	def read(self):
+		#one recv(). Returns a list of sentences, None when the connection is lost. The list is empty on timeout,
+		#error is then 'timed out', and also when the data had no complete sentence. Without reconnect a timeout
+		#also ends the stream.
+		try:
+			data=self.sock.recv(4096)
+		except socket.timeout:
+			self.error='timed out'
+			if self.reconnect: return []
+			self.close()
+			return None
+		except socket.error, error_msg:
+			self.error=str(error_msg[0])
+			self.close()
+			return None
+		if not data:
+			self.error='connection closed'
+			self.close()
+			return None
+		self.error=''
+		return self.feed(data)
+
+	def __iter__(self):
+		while not self.stopped():
+			if not self.sock:
+				if self.connect(): continue
+				if not self.reconnect: return
+				self.wait()
+				self.reconnects+=1
+				continue
+			sentences=self.read()
+			if sentences is None:
+				if not self.reconnect: return
+				self.reconnects+=1
+				continue
+			for i in sentences:
+				yield i
+		self.close()
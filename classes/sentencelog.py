@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import threading, collections
+
+def filter_sentences(sentences, talker='', nmea_type=''):
+	#sentences from the talker (GP, AI...) and of the type (RMC, VDM...), empty for all
+	if talker: sentences=[i for i in sentences if i[1:3]==talker]
+	if nmea_type: sentences=[i for i in sentences if i[3:6]==nmea_type]
+	return sentences
+
+class SentenceLog:
+
+	#the last capacity sentences received, older ones are forgotten
+	def __init__(self, capacity=1000):
+		self.lock=threading.Lock()
+		self.sentences=collections.deque(maxlen=capacity)
+		#sentences appended since the start, tells readers if there is something new
+		self.total=0
+
+	def append(self, sentences):
+		with self.lock:
+			self.sentences.extend(sentences)
+			self.total+=len(sentences)
+
+	def clear(self):
+		with self.lock:
+			self.sentences.clear()
+			self.total+=1
+
+	def lines(self, talker='', nmea_type=''):
+		with self.lock: sentences=list(self.sentences)
+		return filter_sentences(sentences, talker, nmea_type)
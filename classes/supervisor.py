@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import subprocess, socket, time, os
+
+def port_ready(port, host='127.0.0.1'):
+	#probe: True when something listens on the TCP port
+	def probe():
+		sock=socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		sock.settimeout(0.2)
+		try:
+			sock.connect((host, port))
+			return True
+		except socket.error: return False
+		finally: sock.close()
+	return probe
+
+def unix_ready(path):
+	#probe: True when the Unix socket accepts connections
+	def probe():
+		if not os.path.exists(path): return False
+		sock=socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		sock.settimeout(0.2)
+		try:
+			sock.connect(path)
+			return True
+		except socket.error: return False
+		finally: sock.close()
+	return probe
+
+class NmeaProbe:
+
+	#probe: True when the first NMEA sentence arrives on the TCP port
+	def __init__(self, port=10110, host='127.0.0.1'):
+		self.address=(host, port)
+		self.sock=''
+
+	def __call__(self):
+		try:
+			if not self.sock:
+				self.sock=socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+				self.sock.settimeout(0.2)
+				self.sock.connect(self.address)
+			data=self.sock.recv(1024)
+		except socket.timeout: return False
+		except socket.error:
+			self.close()
+			return False
+		if not data:
+			self.close()
+			return False
+		if '$' in data or '!' in data:
+			self.close()
+			return True
+		return False
+
+	def close(self):
+		if self.sock:
+			try: self.sock.close()
+			except: pass
+		self.sock=''
+
+class Service:
+
+	#start() returns the Popen (or a list of Popen for pipelines), None for probes without a process.
+	#enabled() is checked again when the service dies and before every restart so services turned off in
+	#openplotter.py or by an action stay off, only crashed ones are restarted.
+	#match is the pgrep -f pattern of the service, a copy started by openplotter.py is not started again.
+	#After timeout seconds without passing the ready probe the services requiring it are started anyway.
+	def __init__(self, name, start, requires=(), ready=None, kill=(), enabled=None, once=False, match=None, restart=True, timeout=30):
+		self.name=name
+		self.start_function=start
+		self.requires=requires
+		self.ready_probe=ready
+		self.kill=kill
+		self.enabled=enabled
+		#one shot commands are ready when they finish
+		self.once=once
+		self.match=match
+		self.restart=restart
+		self.timeout=timeout
+		self.processes=[]
+		self.started=None
+		self.ready=None
+		self.restarts=0
+		self.backoff=1
+		self.next_start=0
+		self.done=False
+
+	def is_enabled(self):
+		if self.enabled is None: return True
+		try: return self.enabled()
+		except Exception,e:
+			print str(e)
+			return False
+
+	def stop_old(self):
+		#copies left from a previous session
+		for i in self.kill: subprocess.call(i)
+
+	def start(self, now):
+		self.stop_old()
+		self.processes=[]
+		if self.start_function:
+			try: result=self.start_function()
+			except Exception,e:
+				print self.name+': '+str(e)
+				result=None
+			if isinstance(result, list): self.processes=result
+			elif result: self.processes=[result]
+		if self.started is None: self.started=now
+		self.last_start=now
+
+	def alive(self):
+		for i in self.processes:
+			if i.poll() is None: return True
+		return False
+
+	def running_elsewhere(self):
+		if not self.match: return False
+		return subprocess.call(['pgrep', '-f', self.match], stdout=open(os.devnull, 'w'))==0
+
+class Supervisor:
+
+	#starts every service whose requirements are ready, all in the same pass, and restarts the ones that die
+	def __init__(self, interval=0.1, backoff_max=60, stable=60):
+		self.services=[]
+		self.names={}
+		self.interval=interval
+		self.backoff_max=backoff_max
+		#seconds running before the restart delay goes back to 1 s
+		self.stable=stable
+		self.start_time=time.time()
+
+	def add(self, service):
+		self.services.append(service)
+		self.names[service.name]=service
+		return service
+
+	def is_ready(self, name):
+		service=self.names.get(name)
+		#services not added or disabled do not block the ones that require them
+		if not service or service.done: return True
+		return service.ready is not None
+
+	def report(self, service, now):
+		print '%s ready in %.1f s (%.1f s since boot)' % (service.name, now-service.started, now-self.start_time)
+
+	def step(self, now):
+		for service in self.services:
+			if service.done: continue
+			if service.started is None:
+				if not all(self.is_ready(i) for i in service.requires): continue
+				if not service.is_enabled():
+					service.stop_old()
+					service.done=True
+					continue
+				service.start(now)
+			if service.ready is None:
+				if service.once:
+					if service.alive(): continue
+					service.done=True
+				elif service.ready_probe:
+					if not service.ready_probe():
+						if service.timeout is None or now-service.started < service.timeout: continue
+						print '%s not ready after %d s, starting the services requiring it' % (service.name, service.timeout)
+						service.ready=now
+						continue
+				elif service.processes and not service.alive(): continue
+				service.ready=now
+				self.report(service, now)
+				if service.once: continue
+			if service.once or not service.restart or not service.processes: continue
+			if service.alive():
+				if now-service.last_start > self.stable: service.backoff=1
+				continue
+			#died. Stopped on purpose if it has been disabled (actions "stop NMEA multiplexer"...)
+			if not service.is_enabled():
+				print '%s stopped and disabled, not restarted' % service.name
+				service.processes=[]
+				continue
+			if service.next_start==0:
+				service.next_start=now+service.backoff
+				service.backoff=min(service.backoff*2, self.backoff_max)
+				print '%s stopped, restarting in %d s' % (service.name, service.next_start-now)
+				continue
+			if now < service.next_start: continue
+			service.next_start=0
+			if not service.is_enabled() or service.running_elsewhere():
+				service.processes=[]
+				continue
+			service.restarts+=1
+			service.start(now)
+
+	def pending(self):
+		return [i.name for i in self.services if not i.done and i.ready is None]
+
+	def run(self, forever=True):
+		while True:
+			self.step(time.time())
+			if not forever and not self.pending(): return
+			time.sleep(self.interval)
+
+	def ready_times(self):
+		#{name: seconds from start to ready}
+		return dict((i.name, i.ready-i.started) for i in self.services if i.ready is not None)
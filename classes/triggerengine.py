@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import time, re, heapq, threading
+
+#operators 2 to 8 of DataStream.operators_list. 0 and 1 (present/not present) depend on time and are handled with timers
+def op_equal(value, data_value, data_string):
+	#equal (number) or equal (string) when the value field is not a number
+	if data_value: return float(value) == data_value
+	return value == data_string
+
+OPERATORS={
+	2: op_equal,
+	3: lambda value, data_value, data_string: float(value) < data_value,
+	4: lambda value, data_value, data_string: float(value) <= data_value,
+	5: lambda value, data_value, data_string: float(value) > data_value,
+	6: lambda value, data_value, data_string: float(value) >= data_value,
+}
+
+class Trigger(object):
+	#a monitoring.py trigger compiled once: magnitude, operator function and threshold
+	__slots__=('index','item','operator','compare','text','data_value','variables','due')
+
+	def __init__(self, index, item, operator, text):
+		self.index=index
+		self.item=item
+		self.operator=operator
+		self.compare=OPERATORS.get(operator)
+		self.text=str(text)
+		#[short] names in the value field are replaced by the current value of that magnitude
+		self.variables=re.findall(r'\[(.*?)\]',self.text)
+		self.data_value=''
+		if not self.variables: self.data_value=parse_value(self.text)
+		self.due=None
+
+def parse_value(data):
+	try: return float(data)
+	except: return ''
+
+class TriggerEngine:
+
+	#evaluates a trigger only when its magnitude (or a magnitude used in its value field) is updated,
+	#or when its timer expires for "was present / was not present in the last (sec.)".
+	#Repeating actions of true triggers are kept in a second heap and fired when due.
+	def __init__(self, a, triggers, fire):
+		self.a=a
+		#monitoring.py list of triggers: 0 enabled, 1 unique id, 2 operator, 3 value, 4 actions, 5 state
+		#actions: 0 action, 1 data, 2 repeat interval (sec.), 3 repeat unit (0 no repeat), 4 last run
+		self.triggers=triggers
+		self.fire=fire
+		self.start=time.time()
+		self.pending=set()
+		self.lock=threading.Lock()
+		self.timers=[]
+		self.repeats=[]
+		#(trigger, action) -> due time of the repeat in the heap
+		self.repeat_due={}
+		self.dirty=True
+		self.compiled=[]
+		self.always=[]
+		self.subscribers={}
+		for index, trigger in enumerate(triggers):
+			if trigger[1]==-1:
+				self.always.append(index)
+				continue
+			item=a.getDataItem(trigger[1])
+			if not item: continue
+			t=Trigger(index, item, trigger[2], trigger[3])
+			self.compiled.append(t)
+			self.subscribe(item.uid, t)
+			for short in t.variables:
+				variable=a.ShortItems.get(short)
+				if variable: self.subscribe(variable.uid, t)
+		a.listeners.append(self.notify)
+
+	def close(self):
+		if self.notify in self.a.listeners: self.a.listeners.remove(self.notify)
+
+	def subscribe(self, data, t):
+		subscribers=self.subscribers.setdefault(data, [])
+		if t not in subscribers: subscribers.append(t)
+
+	def notify(self, data):
+		#can be called from any thread, updates are evaluated in the next tick
+		if data in self.subscribers:
+			with self.lock: self.pending.add(data)
+
+	def refresh(self):
+		#evaluate all triggers in the next tick, used when triggers are enabled or disabled.
+		#Last runs are kept so repeating actions go on with their current period.
+		self.dirty=True
+
+	def schedule(self, t, due):
+		if t.due is None or due < t.due:
+			t.due=due
+			heapq.heappush(self.timers, (due, t.index, t))
+
+	def schedule_repeats(self, index):
+		for action_index, action in enumerate(self.triggers[index][4]):
+			if action[3]==0 or action[4]=='': continue
+			due=action[4]+action[2]
+			key=(index, action_index)
+			if self.repeat_due.get(key)==due: continue
+			self.repeat_due[key]=due
+			heapq.heappush(self.repeats, (due, index, action_index))
+
+	def next_due(self):
+		#time of the next timer or repeating action, None if there is nothing scheduled
+		due=[]
+		if self.timers: due.append(self.timers[0][0])
+		if self.repeats: due.append(self.repeats[0][0])
+		if due: return min(due)
+		return None
+
+	def scheduled(self):
+		#[(due time, trigger, action)] of the repeating actions waiting to run
+		return sorted((due, key[0], key[1]) for key, due in self.repeat_due.iteritems())
+
+	def tick(self, now=None):
+		if now is None: now=time.time()
+		if self.dirty:
+			self.dirty=False
+			for t in self.compiled: self.evaluate(t, now)
+			for index in self.always:
+				if self.triggers[index][0]==1: self.set_state(index, True)
+		else:
+			with self.lock:
+				pending=self.pending
+				self.pending=set()
+			updated={}
+			for data in pending:
+				for t in self.subscribers[data]: updated[t.index]=t
+			#same order as the list of triggers
+			for index in sorted(updated): self.evaluate(updated[index], now)
+		expired=[]
+		while self.timers and self.timers[0][0] <= now:
+			due, index, t=heapq.heappop(self.timers)
+			#timers replaced by an earlier one are left in the heap and skipped here
+			if t.due!=due: continue
+			t.due=None
+			expired.append(t)
+		#a timer rescheduled for this same instant waits for the next tick
+		for t in expired: self.evaluate(t, now)
+		#start_actions repeats an action when more than its interval has passed
+		expired=set()
+		while self.repeats and self.repeats[0][0] <= now:
+			due, index, action_index=heapq.heappop(self.repeats)
+			key=(index, action_index)
+			if self.repeat_due.get(key)!=due: continue
+			del self.repeat_due[key]
+			expired.add(index)
+		for index in sorted(expired):
+			if self.triggers[index][0]==1 and self.triggers[index][5]:
+				self.fire(index)
+				self.schedule_repeats(index)
+
+	def evaluate(self, t, now):
+		if self.triggers[t.index][0]!=1: return
+		try: state=self.condition(t, now)
+		except: return
+		if state is not None: self.set_state(t.index, state)
+
+	def set_state(self, index, state):
+		if state:
+			self.fire(index)
+			self.triggers[index][5]=True
+			self.schedule_repeats(index)
+		else:
+			#repeats left in the heap are dropped when they expire
+			self.triggers[index][5]=False
+			for action_index in range(len(self.triggers[index][4])): self.repeat_due.pop((index, action_index), None)
+	def condition(self, t, now):
+		#True or False, None when the state must not change
+		value=t.item.value
+		timestamp=t.item.timestamp
+		operator=t.operator
+		if t.variables:
+			data=self.a.getVariablesValue(t.text)
+			data_value=parse_value(data)
+			data_string=data
+		else:
+			data_value=t.data_value
+			data_string=t.text
+		#not present for
+		if operator==0:
+			if timestamp: since=timestamp
+			else: since=self.start
+			if now-since > data_value: return True
+			self.schedule(t, since+data_value)
+			return False
+		#present in the last
+		if operator==1:
+			if not timestamp: return None
+			if now-timestamp < data_value:
+				self.schedule(t, timestamp+data_value)
+				return True
+			return False
+		#switch on / off
+		if operator==7: return value==1
+		if operator==8: return value==0
+		if not timestamp: return None
+		return t.compare(value, data_value, data_string)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import os, time, calendar
+
+#files in the weather log directory, times are UTC:
+#raw-YYYYMMDD.csv     one file a day, rows: time, pressure, temperature, humidity
+#hourly-YYYYMM.csv    one file a month, rows: start of the hour, samples, min, max and mean of every magnitude
+#daily.csv            rows: start of the day, samples, min, max and mean of every magnitude
+#kind: (file prefix, date in the name, fields, longest time in a file)
+KINDS={
+	'raw': ('raw-', '%Y%m%d', 4, 86400),
+	'hourly': ('hourly-', '%Y%m', 11, 31*86400),
+	'daily': ('daily', '', 11, 0),
+}
+
+def read_rows(path, fields):
+	#a line cut by a power failure is not complete and is skipped
+	rows=[]
+	try: data=open(path).read()
+	except IOError: return rows
+	for line in data.split('\n')[:-1]:
+		try: row=[float(i) for i in line.split(',')]
+		except ValueError: continue
+		if len(row)==fields: rows.append(row)
+	return rows
+
+def summary(start, rows):
+	#[start, samples, pressure min, max, mean, temperature min, max, mean, humidity min, max, mean]
+	result=[start, len(rows)]
+	for i in (1, 2, 3):
+		values=[row[i] for row in rows]
+		result+=[min(values), max(values), sum(values)/len(values)]
+	return result
+
+def hour_of(t):
+	return int(t//3600)*3600
+
+def day_of(t):
+	return int(t//86400)*86400
+
+class WeatherLog:
+
+	#append only store of the weather samples. Every row is appended and synced on its own so a power failure
+	#loses one sample at most, files are never rewritten. Hourly and daily summaries are appended when the hour
+	#or the day ends. Raw files are deleted after days and hourly files after hourly_days, daily ones are kept.
+	def __init__(self, path, days=30, hourly_days=365):
+		self.path=path
+		self.days=days
+		self.hourly_days=max(days, hourly_days)
+		#raw rows of the current day
+		self.rows=[]
+		#start of the last hour and day summarized
+		self.last_hour=-1
+		self.last_day=-1
+		if not os.path.isdir(path): os.makedirs(path)
+
+	def file(self, kind, t):
+		prefix, date, fields, span=KINDS[kind]
+		return os.path.join(self.path, prefix+time.strftime(date, time.gmtime(t))+'.csv')
+
+	def files(self, kind):
+		#[(path, start of the file)] sorted by time
+		prefix, date, fields, span=KINDS[kind]
+		result=[]
+		for name in os.listdir(self.path):
+			if not name.startswith(prefix) or not name.endswith('.csv'): continue
+			if not date: start=0
+			else:
+				try: start=calendar.timegm(time.strptime(name[len(prefix):-4], date))
+				except ValueError: continue
+			result.append((os.path.join(self.path, name), start))
+		result.sort(key=lambda i: i[1])
+		return result
+
+	def append(self, kind, row):
+		line=','.join(str(i) for i in row)+'\n'
+		fd=os.open(self.file(kind, row[0]), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0644)
+		try:
+			os.write(fd, line)
+			os.fsync(fd)
+		finally: os.close(fd)
+
+	def load(self, old_csv=None):
+		#rows written by older versions in a single CSV are imported once
+		if old_csv and not self.files('raw'):
+			for row in read_rows(old_csv, 4): self.append('raw', row)
+		self.catch_up(time.time())
+		self.prune(time.time())
+
+	def last(self, kind):
+		files=self.files(kind)
+		if not files: return None
+		rows=read_rows(files[-1][0], KINDS[kind][2])
+		if not rows: return None
+		return rows[-1]
+
+	def repair(self):
+		#ends a line cut by a power failure so the next row starts in a new line
+		for kind in KINDS:
+			files=self.files(kind)
+			if not files: continue
+			path=files[-1][0]
+			f=open(path, 'rb+')
+			try:
+				f.seek(0, 2)
+				if f.tell()==0: continue
+				f.seek(-1, 2)
+				if f.read(1)!='\n':
+					f.write('\n')
+					f.flush()
+					os.fsync(f.fileno())
+			finally: f.close()
+
+	def catch_up(self, now):
+		#summaries of hours and days ended while i2c.py was not running
+		self.repair()
+		last=self.last('hourly')
+		if last: self.last_hour=last[0]
+		last=self.last('daily')
+		if last: self.last_day=last[0]
+		hour_now=hour_of(now)
+		day_now=day_of(now)
+		self.rows=[]
+		for path, start in self.files('raw'):
+			if start+86400 <= min(self.last_hour, self.last_day): continue
+			rows=read_rows(path, 4)
+			hours={}
+			for row in rows: hours.setdefault(hour_of(row[0]), []).append(row)
+			for hour in sorted(hours):
+				if hour < hour_now: self.summarize('hourly', hour, hours[hour])
+			days={}
+			for row in rows: days.setdefault(day_of(row[0]), []).append(row)
+			for day in sorted(days):
+				if day < day_now: self.summarize('daily', day, days[day])
+			if day_now in days: self.rows=days[day_now]
+
+	def summarize(self, kind, start, rows):
+		#every hour and day is summarized once
+		if kind=='hourly':
+			if start <= self.last_hour: return
+			self.last_hour=start
+		else:
+			if start <= self.last_day: return
+			self.last_day=start
+		self.append(kind, summary(start, rows))
+
+	def add(self, row):
+		if self.rows:
+			last=self.rows[-1][0]
+			if hour_of(last)!=hour_of(row[0]):
+				hour=hour_of(last)
+				self.summarize('hourly', hour, [i for i in self.rows if i[0] >= hour])
+			if day_of(last)!=day_of(row[0]):
+				self.summarize('daily', day_of(last), self.rows)
+				self.rows=[]
+				self.prune(row[0])
+		self.append('raw', row)
+		self.rows.append(row)
+
+	def last_time(self):
+		if self.rows: return self.rows[-1][0]
+		last=self.last('raw')
+		if last: return last[0]
+		return 0
+
+	def prune(self, now):
+		for kind, days in (('raw', self.days), ('hourly', self.hourly_days)):
+			span=KINDS[kind][3]
+			for path, start in self.files(kind):
+				#the end of the file is what has to be older than days
+				if start+span < now-days*86400:
+					try: os.remove(path)
+					except OSError, e: print str(e)
+
+	def read(self, kind='raw', start=None, end=None):
+		#rows of kind between start and end, sorted by time
+		rows=[]
+		span=KINDS[kind][3]
+		for path, file_start in self.files(kind):
+			if end is not None and file_start > end: continue
+			if start is not None and span and file_start+span < start: continue
+			rows+=read_rows(path, KINDS[kind][2])
+		if start is not None: rows=[i for i in rows if i[0] >= start]
+		if end is not None: rows=[i for i in rows if i[0] <= end]
+		rows.sort(key=lambda i: i[0])
+		return rows
+
+	def clear(self):
+		for kind in KINDS:
+			for path, start in self.files(kind): os.remove(path)
+		self.rows=[]
+		self.last_hour=-1
+		self.last_day=-1
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import numpy as np
+from classes.weatherlog import KINDS, read_rows
+
+def read_array(path, fields):
+	#the whole file parsed by numpy in one pass, line by line only if a line is damaged
+	try: data=open(path).read()
+	except IOError: return np.zeros((0, fields))
+	lines=data.count('\n')
+	array=np.fromstring(data.replace('\n', ','), sep=',')
+	if array.size!=lines*fields or not data.endswith('\n'):
+		return np.array(read_rows(path, fields)).reshape(-1, fields)
+	return array.reshape(-1, fields)
+
+def load_series(log):
+	#(times, values) of the whole log, values columns: pressure, temperature, humidity.
+	#Hours older than the raw files come from the hourly summaries, their min at the start and their max in the middle.
+	raw=[read_array(path, 4) for path, start in log.files('raw')]
+	raw=[i for i in raw if len(i)]
+	if raw: raw=np.concatenate(raw)
+	else: raw=np.zeros((0, 4))
+	first=raw[0, 0] if len(raw) else np.inf
+	hourly=[read_array(path, KINDS['hourly'][2]) for path, start in log.files('hourly')]
+	hourly=[i for i in hourly if len(i)]
+	parts=[]
+	if hourly:
+		hourly=np.concatenate(hourly)
+		hourly=hourly[hourly[:, 0]+3600 <= first]
+		if len(hourly):
+			minimum=np.column_stack((hourly[:, 0], hourly[:, 2], hourly[:, 5], hourly[:, 8]))
+			maximum=np.column_stack((hourly[:, 0]+1800, hourly[:, 3], hourly[:, 6], hourly[:, 9]))
+			parts.append(np.vstack((minimum, maximum)))
+	parts.append(raw)
+	series=np.vstack(parts)
+	series=series[np.argsort(series[:, 0], kind='mergesort')]
+	return series[:, 0], series[:, 1:]
+
+def envelope(times, values, start, end, width):
+	#points between start and end reduced to the min and max of every pixel column, peaks are never lost.
+	#The points just out of the range are kept so the lines reach the borders.
+	first, last=np.searchsorted(times, [start, end])
+	first=max(first-1, 0)
+	last=min(last+1, len(times))
+	times=times[first:last]
+	values=values[first:last]
+	if len(times) <= 2*width: return times, values
+	span=times[-1]-times[0]
+	#all the points in the same second are a single column
+	if span > 0: column=((times-times[0])*(width/span)).astype(int)
+	else: column=np.zeros(len(times), int)
+	order=np.lexsort((values, column))
+	column=column[order]
+	change=column[1:]!=column[:-1]
+	minimum=order[np.concatenate(([True], change))]
+	maximum=order[np.concatenate((change, [True]))]
+	keep=np.union1d(minimum, maximum)
+	return times[keep], values[keep]
@@ -16,9 +16,10 @@
 # along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
 
 import sys, subprocess, wx
-from classes.conf import Conf
+from classes.conf import Conf, reload_daemon
 from classes.paths import Paths
 from classes.language import Language
+from classes.nmeabus import start_bus
 
 action=sys.argv[1]
 
@@ -32,11 +33,7 @@ conf=Conf()
 
 Language(conf.get('GENERAL','lang'))
 
-triggers=[]
-data=conf.get('ACTIONS', 'triggers')
-try:
-	triggers=eval(data)
-except:triggers=[]
+triggers=conf.get_list('ACTIONS', 'triggers')
 
 #stop all
 if action=='0':
@@ -49,7 +46,7 @@ if action=='0':
 		if start_all==True: triggers[i][0]=1
 		else: triggers[i][0]=0
 		i=i+1
-	conf.set('ACTIONS', 'triggers', str(triggers))
+	conf.set_list('ACTIONS', 'triggers', triggers)
 	subprocess.Popen(['pkill', '-f', 'message.py'])
 	subprocess.Popen(['pkill', '-9', 'mpg123'])
 
@@ -59,10 +56,10 @@ if action=='1':
 	for ii in triggers:
 		triggers[i][0]=1
 		i=i+1
-	conf.set('ACTIONS', 'triggers', str(triggers))
+	conf.set_list('ACTIONS', 'triggers', triggers)
 
-subprocess.call(['pkill', '-f', 'monitoring.py'])
-subprocess.Popen(['python',currentpath+'/monitoring.py'])
+start_bus(currentpath)
+reload_daemon('monitoring.py', currentpath)
 
 app = wx.App()
 
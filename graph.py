@@ -17,35 +17,22 @@
 
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
-import os, sys, datetime, csv
+import os, sys, time
+import numpy as np
+from dateutil import tz
 from matplotlib.widgets import Cursor
+from classes.weatherlog import WeatherLog
+from classes.weatherseries import load_series, envelope
 
 pathname = os.path.dirname(sys.argv[0])
 currentpath = os.path.abspath(pathname)
 
-ifile  = open(currentpath+'/weather_log.csv', "r")
-reader = csv.reader(ifile)
-log_list = []
-for row in reader:
-	log_list.append(row)
-ifile.close()
+#values columns: pressure, temperature, humidity
+times, values = load_series(WeatherLog(currentpath+'/weather_log'))
 
-dates=[]
-pressure=[]
-temperature=[]
-humidity=[]
-
-for i in range(0,len(log_list)):
-	dates.append(datetime.datetime.fromtimestamp(float(log_list[i][0])))
-	pressure.append(round(float(log_list[i][1]),1))
-	temperature.append(round(float(log_list[i][2]),1))
-	humidity.append(round(float(log_list[i][3]),1))
-
-if len(dates)==0:
-        dates.append(datetime.datetime.now())
-        pressure.append(0)
-        temperature.append(0)
-        humidity.append(0)
+if len(times)==0:
+	times=np.array([time.time()])
+	values=np.zeros((1, 3))
 
 fig=plt.figure()
 plt.rc("font", size=10)
@@ -54,22 +41,42 @@ ax1 = fig.add_subplot(311)
 ax2 = fig.add_subplot(312, sharex=ax1)
 ax3 = fig.add_subplot(313, sharex=ax1)
 
-ax1.plot(dates,temperature,'ro-')
-ax1.xaxis.set_major_formatter(mdates.DateFormatter('%d-%m-%y %H:%M'))
-ax1.set_title('Temperature (Cel)')
-ax1.grid(True)
+#(axis, values column, color, title)
+graphs=[(ax1, 1, 'r', 'Temperature (Cel)'), (ax2, 0, 'g', 'Pressure (hPa)'), (ax3, 2, 'b', 'Humidity (%)')]
+lines=[]
+for ax, column, color, title in graphs:
+	lines.append(ax.plot([], [], color+'-', marker='o')[0])
+	ax.xaxis.set_major_formatter(mdates.DateFormatter('%d-%m-%y %H:%M', tz=tz.tzlocal()))
+	ax.set_title(title)
+	ax.grid(True)
+
+def draw(start, end):
+	#only the points of the time range shown, reduced to the min and max of every pixel column
+	for (ax, column, color, title), line in zip(graphs, lines):
+		width=max(int(ax.get_window_extent().width), 1)
+		x, y=envelope(times, values[:, column], start, end, width)
+		line.set_data(mdates.epoch2num(x), y)
+		#markers when there is room for them
+		line.set_marker('o' if len(x) < width/8 else '')
+		ax.relim()
+		ax.autoscale_view(scalex=False)
 
-ax2.plot(dates,pressure,'go-')
-ax2.xaxis.set_major_formatter(mdates.DateFormatter('%d-%m-%y %H:%M'))
-ax2.set_title('Pressure (hPa)')
-ax2.grid(True)
+def on_xlim(ax):
+	#zoom and pan
+	start, end=ax.get_xlim()
+	draw(mdates.num2epoch(start), mdates.num2epoch(end))
+	fig.canvas.draw_idle()
 
-ax3.plot(dates,humidity,'bo-')
-ax3.xaxis.set_major_formatter(mdates.DateFormatter('%d-%m-%y %H:%M'))
-ax3.set_title('Humidity (%)')
-ax3.grid(True)
+start=times[0]
+end=times[-1]
+if end-start < 3600:
+	start-=1800
+	end+=1800
 
 plt.tight_layout()
+ax1.set_xlim(mdates.epoch2num(start), mdates.epoch2num(end))
+draw(start, end)
+ax1.callbacks.connect('xlim_changed', on_xlim)
 cursor = Cursor(ax1, useblit=True, color='gray', linewidth=1 )
 cursor2 = Cursor(ax2, useblit=True, color='gray', linewidth=1 )
 cursor3 = Cursor(ax3, useblit=True, color='gray', linewidth=1 )
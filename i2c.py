@@ -15,73 +15,84 @@
 # You should have received a copy of the GNU General Public License
 # along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
 
-import socket, time, pynmea2, RTIMU, math, csv
+import signal
+#first of all, a SIGHUP from reload_daemon() before conf.watch() must not kill the daemon
+signal.signal(signal.SIGHUP, lambda signum, frame: None)
+
+import socket, time, pynmea2, RTIMU, math
 from classes.paths import Paths
-from classes.conf import Conf
+from classes.conf import Conf, changed_sections
+from classes.metrics import Metrics
+from classes.weatherlog import WeatherLog
 
 paths=Paths()
 currentpath=paths.currentpath
 
 conf=Conf()
+conf.watch()
 
 sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
-nmea_hdg_b = conf.get('STARTUP', 'nmea_hdg')=='1'
-nmea_heel_b = conf.get('STARTUP', 'nmea_heel')=='1'
-nmea_pitch_b = conf.get('STARTUP', 'nmea_pitch')=='1'
-poll_interval = 1
+metrics=Metrics('i2c')
+metrics.serve()
 
-imu_b = False
-pressure_val_b = False
-humidity_val_b = False
+imu=None
+pressure_val=None
+humidity_val=None
+poll_interval = 1
 log_list_b = False
 
-nmea_press_b = conf.get('STARTUP', 'nmea_press')=='1'
-nmea_temp_p_b = conf.get('STARTUP', 'nmea_temp_p')=='1'
-nmea_hum_b = conf.get('STARTUP', 'nmea_hum')=='1'
-nmea_temp_h_b = conf.get('STARTUP', 'nmea_temp_h')=='1'
-press_temp_log_b = conf.get('STARTUP', 'press_temp_log')=='1'
-
-nmea_rate_sen = float(conf.get('STARTUP', 'nmea_rate_sen'))
-
-if nmea_hdg_b or nmea_heel_b or nmea_pitch_b:
-	SETTINGS_FILE = "RTIMULib"
-	s = RTIMU.Settings(SETTINGS_FILE)
-	imu = RTIMU.RTIMU(s)
-	imu.IMUInit()
-	imu.setSlerpPower(0.02)
-	imu.setGyroEnable(True)
-	imu.setAccelEnable(True)
-	imu.setCompassEnable(True)
-	poll_interval = imu.IMUGetPollInterval()
-	imu_b = True
-	
-
-
-if nmea_press_b or nmea_temp_p_b:
-	SETTINGS_FILE2 = "RTIMULib2"
-	s2 = RTIMU.Settings(SETTINGS_FILE2)
-	pressure_val = RTIMU.RTPressure(s2)
-	pressure_val.pressureInit()
-	pressure_val_b = True
-
-if nmea_hum_b or nmea_temp_h_b:
-	SETTINGS_FILE3 = "RTIMULib3"
-	s3 = RTIMU.Settings(SETTINGS_FILE3)
-	humidity_val = RTIMU.RTHumidity(s3)
-	humidity_val.humidityInit()
-	humidity_val_b = True
-
-if press_temp_log_b:
-	ifile  = open(currentpath+'/weather_log.csv', "r")
-	reader = csv.reader(ifile)
-	log_list = []
-	for row in reader:
-		log_list.append(row)
-	ifile.close()
-	if log_list: last_log=float(log_list[len(log_list)-1][0])
-	else: last_log=0
-	log_list_b = True
+def read_conf():
+	#also called when openplotter.conf changes, sensors already initialized are not initialized again
+	global nmea_hdg_b, nmea_heel_b, nmea_pitch_b, nmea_press_b, nmea_temp_p_b, nmea_hum_b, nmea_temp_h_b, press_temp_log_b, nmea_rate_sen
+	global imu, imu_b, poll_interval, pressure_val, pressure_val_b, humidity_val, humidity_val_b, weather_log, last_log, log_list_b
+	nmea_hdg_b = conf.get('STARTUP', 'nmea_hdg')=='1'
+	nmea_heel_b = conf.get('STARTUP', 'nmea_heel')=='1'
+	nmea_pitch_b = conf.get('STARTUP', 'nmea_pitch')=='1'
+
+	nmea_press_b = conf.get('STARTUP', 'nmea_press')=='1'
+	nmea_temp_p_b = conf.get('STARTUP', 'nmea_temp_p')=='1'
+	nmea_hum_b = conf.get('STARTUP', 'nmea_hum')=='1'
+	nmea_temp_h_b = conf.get('STARTUP', 'nmea_temp_h')=='1'
+	press_temp_log_b = conf.get('STARTUP', 'press_temp_log')=='1'
+
+	nmea_rate_sen = float(conf.get('STARTUP', 'nmea_rate_sen'))
+
+	imu_b = nmea_hdg_b or nmea_heel_b or nmea_pitch_b
+	if imu_b and not imu:
+		SETTINGS_FILE = "RTIMULib"
+		s = RTIMU.Settings(SETTINGS_FILE)
+		imu = RTIMU.RTIMU(s)
+		imu.IMUInit()
+		imu.setSlerpPower(0.02)
+		imu.setGyroEnable(True)
+		imu.setAccelEnable(True)
+		imu.setCompassEnable(True)
+		poll_interval = imu.IMUGetPollInterval()
+
+	pressure_val_b = nmea_press_b or nmea_temp_p_b
+	if pressure_val_b and not pressure_val:
+		SETTINGS_FILE2 = "RTIMULib2"
+		s2 = RTIMU.Settings(SETTINGS_FILE2)
+		pressure_val = RTIMU.RTPressure(s2)
+		pressure_val.pressureInit()
+
+	humidity_val_b = nmea_hum_b or nmea_temp_h_b
+	if humidity_val_b and not humidity_val:
+		SETTINGS_FILE3 = "RTIMULib3"
+		s3 = RTIMU.Settings(SETTINGS_FILE3)
+		humidity_val = RTIMU.RTHumidity(s3)
+		humidity_val.humidityInit()
+
+	if press_temp_log_b and not log_list_b:
+		try: days=int(conf.get('STARTUP', 'weather_log_days'))
+		except: days=30
+		weather_log=WeatherLog(currentpath+'/weather_log', days)
+		weather_log.load(currentpath+'/weather_log.csv')
+		last_log=weather_log.last_time()
+	log_list_b = press_temp_log_b
+
+read_conf()
 
 heading_m=''
 heel=''
@@ -94,11 +105,17 @@ temperature_h=''
 tick=time.time()
 
 while True:
+	metrics.loop_end()
 	tick2=time.time()
 	time.sleep(poll_interval*1.0/1000.0)
+	metrics.loop_start()
+	if 'STARTUP' in changed_sections(conf.check()): read_conf()
 	# read IMU
 	if imu_b:
-		if imu.IMURead():
+		start=time.time()
+		read=imu.IMURead()
+		metrics.observe('sensor_read_seconds', time.time()-start, {'sensor': 'imu'})
+		if read:
 			data = imu.getIMUData()
 			fusionPose = data["fusionPose"]
 			heading_m0=math.degrees(fusionPose[2])
@@ -111,7 +128,9 @@ while True:
 
 	# read Pressure
 	if pressure_val_b:
+		start=time.time()
 		read=pressure_val.pressureRead()
+		metrics.observe('sensor_read_seconds', time.time()-start, {'sensor': 'pressure'})
 		if read:
 			if (read[0]):
 				pressure=read[1]
@@ -121,7 +140,9 @@ while True:
 	# read humidity
 	if humidity_val_b:
 
+		start=time.time()
 		read=humidity_val.humidityRead()
+		metrics.observe('sensor_read_seconds', time.time()-start, {'sensor': 'humidity'})
 		if read:
 			if (read[0]):
 				humidity=read[1]
@@ -136,7 +157,7 @@ while True:
 			hdg = pynmea2.HDG('OS', 'HDG', (str(heading_m),'','','',''))
 			hdg1=str(hdg)
 			hdg2=hdg1+"\r\n"
-			sock.sendto(hdg2, ('127.0.0.1', 10110))
+			metrics.sendto(sock, hdg2, ('127.0.0.1', 10110))
 			heading_m=''
 		# XDR
 		list_tmp1=[]
@@ -182,12 +203,12 @@ while True:
 			xdr = pynmea2.XDR('OS', 'XDR', (list_tmp1))
 			xdr1=str(xdr)
 			xdr2=xdr1+"\r\n"
-			sock.sendto(xdr2, ('127.0.0.1', 10110))
+			metrics.sendto(sock, xdr2, ('127.0.0.1', 10110))
 		if list_tmp2:
 			xdr = pynmea2.XDR('OS', 'XDR', (list_tmp2))
 			xdr1=str(xdr)
 			xdr2=xdr1+"\r\n"
-			sock.sendto(xdr2, ('127.0.0.1', 10110))			
+			metrics.sendto(sock, xdr2, ('127.0.0.1', 10110))			
 			heel=''
 			pitch=''
 
@@ -206,20 +227,7 @@ while True:
 					if pressure: press2=pressure
 					if temperature: temp2=temperature
 					if humidity: hum2=humidity
-					new_row=[tick,press2,temp2,hum2]
-					if len(log_list) < 288:
-						log_list.append(new_row)
-						ofile = open(currentpath+'/weather_log.csv', "a")
-						writer = csv.writer(ofile)
-						writer.writerow(new_row)
-					if len(log_list) >= 288:
-						del log_list[0]
-						log_list.append(new_row)
-						ofile = open(currentpath+'/weather_log.csv', "w")
-						writer = csv.writer(ofile)
-						for row in log_list:
-							writer.writerow(row)
-					ofile.close()
+					weather_log.add([tick,press2,temp2,hum2])
 		except Exception,e: print str(e)
 		
 		temperature_p=''
@@ -14,55 +14,61 @@
 # You should have received a copy of the GNU General Public License
 # along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
 
-import time, socket, threading, copy
+import signal
+#first of all, a SIGHUP from reload_daemon() before conf.watch() must not kill the daemon
+signal.signal(signal.SIGHUP, lambda signum, frame: None)
+
+import time, socket, copy
 from classes.datastream import DataStream
-from classes.conf import Conf
+from classes.datasnapshot import DataSnapshot
+from classes.conf import Conf, changed_sections
 from classes.language import Language
 from classes.actions import Actions
-from classes.mqtt import Mqtt
+from classes.mqtt import Mqtt, CONNECTIONS
+from classes.triggerengine import TriggerEngine
+from classes.actionexecutor import ActionExecutor
+from classes.metrics import Metrics
 
 def read_triggers():
-	global triggers
-	data=conf.get('ACTIONS', 'triggers')
-	try:
-		temp_list=eval(data)
-	except:temp_list=[]
+	global triggers, trigger_keys
+	#triggers not changed since the last read keep their state and last runs
+	old=dict(zip(trigger_keys, triggers))
+	triggers=[]
+	trigger_keys=[]
+	temp_list=conf.get_list('ACTIONS', 'triggers')
 	for ii in temp_list:
-		if ii[1]==-1 or a.getDataListIndex(ii[1]):
+		if ii[1]==-1 or a.getDataItem(ii[1]):
+			key=repr(ii)
 			ii.append(False)# 5 state
 			for iii in ii[4]:
 				if iii[3]==2: iii[2]=iii[2]*60
 				if iii[3]==3: iii[2]=(iii[2]*60)*60
 				if iii[3]==4: iii[2]=((iii[2]*24)*60)*60
 				iii.append('')# 4 last run
+			if key in old:
+				ii[5]=old[key][5]
+				for index,iii in enumerate(ii[4]): iii[4]=old[key][4][index][4]
 			triggers.append(ii)
+			trigger_keys.append(key)
 
 def start_actions(trigger):
 	global triggers
+	run=[]
 	for index,i in enumerate(triggers[trigger][4]):
 		now=time.time()
 		if triggers[trigger][5]==False:
 			triggers[trigger][4][index][4]=now
-			re=''
-			try:
-				re=actions.run_action(i[0],i[1],conf,a)
-			except Exception,e: print str(e)
-			if re=='read':
-				startall()
+			run.append((i[0],i[1]))
 		else:
 			if i[3]==0: pass
 			else:
 				if now-i[4] > i[2]:
 					triggers[trigger][4][index][4]=now
-					re=''
-					try:
-						re=actions.run_action(i[0],i[1],conf,a)
-					except Exception,e: print str(e)
-					if re=='read':
-						startall()
+					run.append((i[0],i[1]))
+	if run: executor.run(run, trigger_keys[trigger])
 
 def startall():
-	global triggers
+	global triggers, trigger_keys
 	new_list = copy.deepcopy(triggers)
 	i=0
 	for ii in triggers:
@@ -74,177 +80,86 @@ def startall():
 			del new_list[i][4][ib][4]
 			ib=ib+1
 		i=i+1
-	conf.set('ACTIONS', 'triggers', str(new_list))
+	conf.set_list('ACTIONS', 'triggers', new_list)
+	trigger_keys=[repr(i) for i in new_list]
 	del new_list
-
-#thread1
-def parse_nmea():
-	global sock_in
-	global error
-	while True:
-		if not sock_in: connect()
-		else:
-			frase_nmea =''
-			try:
-				frase_nmea = sock_in.recv(1024)
-			except socket.error, error_msg:
-				error= _('Failed to connect with localhost:10110. Error: ')+ str(error_msg[0])
-				print error
-			else:
-				if frase_nmea: 
-					a.parse_nmea(frase_nmea)
-					error=0
-				else:
-					sock_in=''
-
-def connect():
-	global sock_in
-	global error
-	try:
-		sock_in = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		sock_in.settimeout(5)
-		sock_in.connect(('localhost', 10110))
-	except socket.error, error_msg:
-		error= _('Failed to connect with localhost:10110. Error: ')+ str(error_msg[0])
-		print error
-		sock_in=''
-		time.sleep(7)
-	else: error=0
-#end thread1
+	engine.refresh()
+
+def action_metric(index):
+	#one field of ActionExecutor.latency() by action
+	return lambda: [({'action': option}, stat[index]) for option, stat in executor.latency().iteritems()]
+
+def mqtt_metric(field):
+	return lambda: [({'broker': '%s:%d' % (i.broker, i.port)}, field(i)) for i in CONNECTIONS.values()]
+
+def reload_conf(changed):
+	#openplotter.conf changed by openplotter.py or ctrl_actions.py
+	global a, actions, mqtt, engine
+	sections=changed_sections(changed)
+	if sections & set(['INPUTS','OUTPUTS','1W','MQTT']):
+		mqtt.stop()
+		a=DataStream(conf)
+		snapshot.seen={}
+		actions=Actions(conf)
+		executor.actions=actions
+		executor.a=a
+		mqtt=Mqtt(conf,a)
+	elif 'ACTIONS' not in sections: return
+	engine.close()
+	read_triggers()
+	engine=TriggerEngine(a, triggers, start_actions)
 
 # no loop
 conf=Conf()
+conf.watch()
 
 Language(conf.get('GENERAL','lang'))
 
 global triggers
 triggers=[]
-global sock_in
-global error
-sock_in=''
-error=0
+trigger_keys=[]
 a=DataStream(conf)
+snapshot=DataSnapshot()
 actions=Actions(conf)
-nodata=''
+executor=ActionExecutor(actions, conf, a, startall)
 
 sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
 read_triggers()
-
-thread1=threading.Thread(target=parse_nmea)	
-if not thread1.isAlive(): thread1.start()
+engine=TriggerEngine(a, triggers, start_actions)
 
 mqtt=Mqtt(conf,a)
 
+metrics=Metrics('monitoring')
+metrics.function('triggers', lambda: len(triggers))
+metrics.function('action_queue_depth', executor.queue_depth)
+metrics.function('action_runs_total', action_metric(0), 'counter')
+metrics.function('action_seconds_average', action_metric(1))
+metrics.function('action_seconds_max', action_metric(2))
+metrics.function('action_queue_seconds_max', action_metric(3))
+metrics.function('actions_skipped_total', action_metric(4), 'counter')
+metrics.function('actions_dropped_total', action_metric(5), 'counter')
+metrics.function('mqtt_connected', mqtt_metric(lambda i: int(i.connected.is_set())))
+metrics.function('mqtt_received_total', mqtt_metric(lambda i: i.received), 'counter')
+metrics.function('mqtt_published_total', mqtt_metric(lambda i: i.published), 'counter')
+metrics.function('mqtt_dropped_total', mqtt_metric(lambda i: i.dropped), 'counter')
+metrics.function('mqtt_queue_depth', mqtt_metric(lambda i: i.queue.qsize()))
+metrics.serve()
+
 #end no loop
 
 # loop
 while True:
+	metrics.loop_end()
 	time.sleep(0.01)
+	metrics.loop_start()
+	changed=conf.check()
+	if changed: reload_conf(changed)
+	snapshot.update(a)
 	a.checkinputs()
 	a.checkoutputs()
 	#actions
-	for index,item in enumerate(triggers):
-		if item[0]==1:
-			if item[1]==-1:
-				operator=''
-				start_actions(index)
-				triggers[index][5]=True
-			else:
-				trigger=a.getDataListIndex(item[1])
-				trigger_value=a.DataList[trigger][2]
-				now = time.time()
-				trigger_value_timestamp=a.DataList[trigger][4]
-				operator=item[2]
-				data=a.getVariablesValue(item[3])
-				try:
-					data_value=float(data)
-				except: data_value=''
-				data_string=str(data)
-			try:	
-				#not present for
-				if operator==0:
-					if trigger_value_timestamp:
-						if now-trigger_value_timestamp > data_value: 
-							start_actions(index)
-							triggers[index][5]=True
-						else: 
-							triggers[index][5]=False
-						nodata=''
-					else: 
-						if not nodata: nodata=now
-						if now-nodata > data_value: 
-							start_actions(index)
-							triggers[index][5]=True
-						else: 
-							triggers[index][5]=False
-				#present in the last
-				if operator==1: 
-					if trigger_value_timestamp:
-						if now-trigger_value_timestamp < data_value:
-							start_actions(index)
-							triggers[index][5]=True
-						else: 
-							triggers[index][5]=False
-				if operator==2 or operator==3 or operator==4 or operator==5 or operator==6:
-					if trigger_value_timestamp:
-						#equal (number)
-						if operator==2 and data_value:
-							if float(trigger_value) == data_value: 
-								start_actions(index)
-								triggers[index][5]=True
-							else: 
-								triggers[index][5]=False
-						#equal (string)
-						if operator==2 and not data_value:
-							if trigger_value == data_string:
-								start_actions(index)
-								triggers[index][5]=True
-							else: 
-								triggers[index][5]=False
-						#less than
-						if operator==3:
-							if float(trigger_value) < data_value: 
-								start_actions(index)
-								triggers[index][5]=True
-							else: 
-								triggers[index][5]=False
-						#less than or equal to
-						if operator==4:
-							if float(trigger_value) <= data_value: 
-								start_actions(index)
-								triggers[index][5]=True
-							else: 
-								triggers[index][5]=False
-						#greater than
-						if operator==5:
-							if float(trigger_value) > data_value:
-								start_actions(index)
-								triggers[index][5]=True
-							else: 
-								triggers[index][5]=False
-						#greater than or equal to
-						if operator==6:
-							if float(trigger_value) >= data_value: 
-								start_actions(index)
-								triggers[index][5]=True
-							else: 
-								triggers[index][5]=False
-				#switch on
-				if operator==7:
-					if trigger_value==1: 
-						start_actions(index)
-						triggers[index][5]=True
-					else: 
-						triggers[index][5]=False
-
-				#switch off
-				if operator==8:
-					if trigger_value==0: 
-						start_actions(index)
-						triggers[index][5]=True
-					else: 
-						triggers[index][5]=False
-
-			#except Exception,e: print str(e)
-			except: pass
+	now=time.time()
+	engine.tick(now)
+	metrics.observe('trigger_tick_seconds', time.time()-now)
+	executor.tick(now)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+
+from classes.nmeastream import NmeaStream
+from classes.nmeabus import NmeaBusServer, BusDataStream
+from classes.datasnapshot import DataSnapshot
+from classes.metrics import Metrics
+
+# owns the only connection to localhost:10110, parses every sentence once and
+# sends the results to monitoring.py, calculate.py and output.py (see classes/nmeabus.py)
+# and writes them to the shared memory snapshot (see classes/datasnapshot.py)
+
+def publish(data,value,unit,timestamp,talker,nmea_type):
+	snapshot.write(data,value,unit,timestamp,talker,nmea_type)
+	server.publish(data,value,unit,timestamp,talker,nmea_type)
+
+server=NmeaBusServer()
+snapshot=DataSnapshot(writer=True)
+a=BusDataStream(publish)
+nmea_stream=NmeaStream()
+
+metrics=Metrics('nmea_bus')
+a.sentences={}
+metrics.function('sentences_total', lambda: [({'type': i}, j) for i, j in a.sentences.items()], 'counter')
+metrics.function('parse_errors_total', lambda: a.parse_errors, 'counter')
+metrics.function('bus_clients', lambda: len(server.clients))
+metrics.function('bus_clients_dropped_total', lambda: server.dropped, 'counter')
+metrics.function('snapshot_dropped_total', lambda: snapshot.dropped, 'counter')
+metrics.function('snapshot_truncated_total', lambda: snapshot.truncated, 'counter')
+metrics.function('input_bytes_total', lambda: nmea_stream.bytes, 'counter')
+metrics.function('input_checksum_errors_total', lambda: nmea_stream.checksum_errors, 'counter')
+metrics.function('input_reconnects_total', lambda: nmea_stream.reconnects, 'counter')
+metrics.serve()
+
+try:
+	for sentence in nmea_stream:
+		a.parse_nmea(sentence)
+		server.publish_raw(sentence)
+finally:
+	server.close()
@@ -15,13 +15,13 @@
 # You should have received a copy of the GNU General Public License
 # along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
 
-import wx, sys, os, subprocess, webbrowser, re, json, pyudev, time, ConfigParser
+import wx, sys, os, subprocess, webbrowser, re, json, pyudev, time, ConfigParser, threading
 import wx.lib.scrolledpanel as scrolled
 from wx.lib.mixins.listctrl import CheckListCtrlMixin, ListCtrlAutoWidthMixin
 from classes.datastream import DataStream
 from classes.actions import Actions
 from classes.paths import Paths
-from classes.conf import Conf
+from classes.conf import Conf, reload_daemon
 from classes.language import Language
 from classes.add_trigger import addTrigger
 from classes.add_action import addAction
@@ -30,6 +30,8 @@ from classes.add_switch import addSwitch
 from classes.add_output import addOutput
 from classes.add_USBinst import addUSBinst
 from classes.add_topic import addTopic
+from classes.nmeabus import start_bus
+from classes.weatherlog import WeatherLog
 
 paths=Paths()
 home=paths.home
@@ -306,6 +308,12 @@ class MainFrame(wx.Frame):
 		self.Bind(wx.EVT_BUTTON, self.vhf_Tx, self.button_vhf_Tx)
 		self.Tx_exp_label=wx.StaticText(self.page4, label=_('Experimental'), pos=(540, 263))
 
+		wx.StaticBox(self.page4, label=_(' AIS channels analysis '), size=(400, 130), pos=(10, 185))
+
+		self.button_analyze =wx.Button(self.page4, label=_('Analyze'), pos=(20, 210))
+		self.Bind(wx.EVT_BUTTON, self.analyze_channels, self.button_analyze)
+		self.analyze_label=wx.StaticText(self.page4, label=_('Noise, SNR and offset of both channels.\nReception is paused for 10 seconds.'), pos=(20, 255))
+
 ###########################page4
 ########page5###################
 		wx.StaticBox(self.page5, label=_(' Inputs '), size=(670, 130), pos=(10, 10))
@@ -1137,13 +1145,14 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 		if wpa=='WPA':wpa='1'
 		if wpa=='WPA2':wpa='2'
 		if wpa==_('Both'):wpa='3'
-		self.conf.set('WIFI', 'device', wlan)
-		self.conf.set('WIFI', 'password', passw)
-		self.conf.set('WIFI', 'ssid', ssid)
-		self.conf.set('WIFI', 'share', share)
-		self.conf.set('WIFI', 'channel', channel)
-		self.conf.set('WIFI', 'hw_mode', mode)
-		self.conf.set('WIFI', 'wpa', wpa)
+		with self.conf.batch():
+			self.conf.set('WIFI', 'device', wlan)
+			self.conf.set('WIFI', 'password', passw)
+			self.conf.set('WIFI', 'ssid', ssid)
+			self.conf.set('WIFI', 'share', share)
+			self.conf.set('WIFI', 'channel', channel)
+			self.conf.set('WIFI', 'hw_mode', mode)
+			self.conf.set('WIFI', 'wpa', wpa)
 		self.passw.SetValue('**********')
 		if isChecked:
 			self.enable_disable_wifi(1)
@@ -1323,9 +1332,10 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 		gain=self.gain.GetValue()
 		ppm=self.ppm.GetValue()
 		band=self.band.GetValue()
-		self.conf.set('AIS-SDR', 'gain', gain)
-		self.conf.set('AIS-SDR', 'ppm', ppm)
-		self.conf.set('AIS-SDR', 'band', band)
+		with self.conf.batch():
+			self.conf.set('AIS-SDR', 'gain', gain)
+			self.conf.set('AIS-SDR', 'ppm', ppm)
+			self.conf.set('AIS-SDR', 'band', band)
 		subprocess.Popen(['python',currentpath+'/fine_cal.py', 'b'])
 
 	def check_channel(self, event):
@@ -1334,11 +1344,52 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 		gain=self.gain.GetValue()
 		ppm=self.ppm.GetValue()
 		channel=self.channel.GetValue()
-		self.conf.set('AIS-SDR', 'gain', gain)
-		self.conf.set('AIS-SDR', 'ppm', ppm)
-		self.conf.set('AIS-SDR', 'gsm_channel', channel)
+		with self.conf.batch():
+			self.conf.set('AIS-SDR', 'gain', gain)
+			self.conf.set('AIS-SDR', 'ppm', ppm)
+			self.conf.set('AIS-SDR', 'gsm_channel', channel)
 		if channel: subprocess.Popen(['python',currentpath+'/fine_cal.py', 'c'])
 
+	def analyze_channels(self, event):
+		gain='25'
+		if self.gain.GetValue(): gain=self.gain.GetValue().replace(',', '.')
+		ppm='0'
+		if self.ppm.GetValue(): ppm=self.ppm.GetValue().replace(',', '.')
+		#reception is paused, disabled first so startup.py does not restart it while the dongle is in use
+		self.analysis_resume=self.ais_sdr_enable.GetValue()
+		self.conf.set('AIS-SDR', 'enable', '0')
+		self.kill_sdr()
+		self.button_analyze.Disable()
+		self.SetStatusText(_('SDR-AIS reception paused, analyzing AIS channels...'))
+		thread=threading.Thread(target=self.run_analysis, args=(gain, ppm))
+		thread.daemon=True
+		thread.start()
+
+	def run_analysis(self, gain, ppm):
+		try: output=subprocess.check_output(['python', currentpath+'/waterfall.py', 'analyze', gain, ppm], stderr=subprocess.STDOUT)
+		except subprocess.CalledProcessError, e: output=e.output
+		except Exception, e: output=str(e)
+		wx.CallAfter(self.analysis_done, output)
+
+	def analysis_done(self, output):
+		self.button_analyze.Enable()
+		recommended=re.search(r'recommended gain ([0-9.]+) \(now [^)]*\), ppm (-?[0-9]+)', output)
+		if not recommended: self.ShowMessage(output)
+		else:
+			dlg=wx.MessageDialog(self, output+'\n\n'+_('Use the recommended gain and ppm?'), _('AIS channels analysis'), wx.YES_NO | wx.ICON_QUESTION)
+			if dlg.ShowModal()==wx.ID_YES:
+				self.gain.SetValue(recommended.group(1))
+				self.ppm.SetValue(recommended.group(2))
+				with self.conf.batch():
+					self.conf.set('AIS-SDR', 'gain', recommended.group(1))
+					self.conf.set('AIS-SDR', 'ppm', recommended.group(2))
+			dlg.Destroy()
+		#reception resumed with the values in the tab
+		if self.analysis_resume:
+			self.ais_sdr_enable.SetValue(True)
+			self.OnOffAIS(None)
+		else: self.SetStatusText(_('AIS channels analysis finished'))
+
 	def vhf_Rx(self, event):
 		self.kill_sdr()
 		self.enable_sdr_controls()
@@ -1356,6 +1407,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 
 	def show_output_window(self,event):
 		close=subprocess.call(['pkill', '-f', 'output.py'])
+		start_bus(currentpath)
 		show_output=subprocess.Popen(['python',currentpath+'/output.py'])
 
 	def restart_multiplex(self,event):
@@ -1644,9 +1696,9 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 
 	def start_sensors(self):
 		subprocess.call(['pkill', 'RTIMULibDemoGL'])
-		subprocess.call(['pkill', '-f', 'i2c.py'])
 		if self.heading.GetValue() or self.heel.GetValue() or self.pitch.GetValue() or self.press.GetValue() or self.temp_p.GetValue() or self.hum.GetValue() or self.temp_h.GetValue():
-			subprocess.Popen(['python', currentpath+'/i2c.py'], cwd=currentpath+'/imu')
+			reload_daemon('i2c.py', currentpath, cwd=currentpath+'/imu')
+		else: subprocess.call(['pkill', '-f', 'i2c.py'])
 
 	def ok_rate(self, e):
 		rate=self.rate.GetValue()
@@ -1682,9 +1734,10 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 		self.heading.SetValue(False)
 		self.heel.SetValue(False)
 		self.pitch.SetValue(False)
-		self.conf.set('STARTUP', 'nmea_hdg', '0')
-		self.conf.set('STARTUP', 'nmea_heel', '0')
-		self.conf.set('STARTUP', 'nmea_pitch', '0')
+		with self.conf.batch():
+			self.conf.set('STARTUP', 'nmea_hdg', '0')
+			self.conf.set('STARTUP', 'nmea_heel', '0')
+			self.conf.set('STARTUP', 'nmea_pitch', '0')
 		self.start_sensors()
 		msg=_('Heading, heel and pitch disabled.\nClose and open OpenPlotter again to autodetect.')
 		self.ShowMessage(msg)
@@ -1702,10 +1755,11 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 		self.temp_p.SetValue(False)
 		self.hum.SetValue(False)
 		self.temp_h.SetValue(False)
-		self.conf.set('STARTUP', 'nmea_press', '0')
-		self.conf.set('STARTUP', 'nmea_temp_p', '0')
-		self.conf.set('STARTUP', 'nmea_hum', '0')
-		self.conf.set('STARTUP', 'nmea_temp_h', '0')
+		with self.conf.batch():
+			self.conf.set('STARTUP', 'nmea_press', '0')
+			self.conf.set('STARTUP', 'nmea_temp_p', '0')
+			self.conf.set('STARTUP', 'nmea_hum', '0')
+			self.conf.set('STARTUP', 'nmea_temp_h', '0')
 		self.start_sensors()
 		msg=_('Temperature, humidity and pressure disabled.\nClose and open OpenPlotter again to autodetect.')
 		self.ShowMessage(msg)
@@ -1718,13 +1772,14 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 		self.temp_p.SetValue(False)
 		self.hum.SetValue(False)
 		self.temp_h.SetValue(False)
-		self.conf.set('STARTUP', 'nmea_hdg', '0')
-		self.conf.set('STARTUP', 'nmea_heel', '0')
-		self.conf.set('STARTUP', 'nmea_pitch', '0')
-		self.conf.set('STARTUP', 'nmea_press', '0')
-		self.conf.set('STARTUP', 'nmea_temp_p', '0')
-		self.conf.set('STARTUP', 'nmea_hum', '0')
-		self.conf.set('STARTUP', 'nmea_temp_h', '0')
+		with self.conf.batch():
+			self.conf.set('STARTUP', 'nmea_hdg', '0')
+			self.conf.set('STARTUP', 'nmea_heel', '0')
+			self.conf.set('STARTUP', 'nmea_pitch', '0')
+			self.conf.set('STARTUP', 'nmea_press', '0')
+			self.conf.set('STARTUP', 'nmea_temp_p', '0')
+			self.conf.set('STARTUP', 'nmea_hum', '0')
+			self.conf.set('STARTUP', 'nmea_temp_h', '0')
 		self.start_sensors()
 		subprocess.Popen('RTIMULibDemoGL', cwd=currentpath+'/imu')
 		msg=_('Heading, heel, pitch, temperature, humidity and pressure disabled.\nAfter calibrating, enable them again.')
@@ -1773,9 +1828,10 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 		subprocess.Popen(['python', currentpath+'/graph.py'])
 
 	def	reset_graph(self, e):
-		data=''
+		#i2c.py keeps the rows of the current day in memory and appends to the log, it is stopped before clearing
+		subprocess.call(['pkill', '-f', 'i2c.py'])
+		WeatherLog(currentpath+'/weather_log').clear()
 		file = open(currentpath+'/weather_log.csv', 'w')
-		file.write(data)
 		file.close()
 		self.start_sensors()
 		self.ShowMessage(_('Weather log restarted'))
@@ -1783,9 +1839,10 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 ###################################### Calculate
 
 	def start_calculate(self):
-		subprocess.call(['pkill', '-f', 'calculate.py'])
 		if self.mag_var.GetValue() or self.heading_t.GetValue() or self.rot.GetValue() or self.TW_STW.GetValue() or self.TW_SOG.GetValue():
-			subprocess.Popen(['python', currentpath+'/calculate.py'])
+			start_bus(currentpath)
+			reload_daemon('calculate.py', currentpath)
+		else: subprocess.call(['pkill', '-f', 'calculate.py'])
 
 	def ok_rate2(self, e):
 		rate=self.rate2.GetValue()
@@ -1834,10 +1891,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 	def read_switches(self):
 		self.switches=[]
 		self.list_switches.DeleteAllItems()
-		data=self.conf.get('INPUTS', 'switches')
-		try:
-			temp_list=eval(data)
-		except:temp_list=[]
+		temp_list=self.conf.get_list('INPUTS', 'switches')
 		for ii in temp_list:
 			self.switches.append(ii)
 			self.list_switches.Append([ii[1].decode('utf8'),ii[2].decode('utf8'),str(ii[3]),ii[4]])
@@ -1923,10 +1977,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 		if selected_switch==-1: 
 			self.ShowMessage(_('Select a switch to delete.'))
 			return
-		data=self.conf.get('ACTIONS', 'triggers')
-		try:
-			temp_list=eval(data)
-		except:temp_list=[]
+		temp_list=self.conf.get_list('ACTIONS', 'triggers')
 		for i in temp_list:
 			if i[1]==self.switches[selected_switch][5]:
 				self.read_triggers()
@@ -1937,10 +1988,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 
 	def apply_changes_switches(self, e):	
 		gpio_out=[]
-		data=self.conf.get('OUTPUTS', 'outputs')
-		try:
-			temp_list=eval(data)
-		except:temp_list=[]
+		temp_list=self.conf.get_list('OUTPUTS', 'outputs')
 		for i in temp_list:
 			gpio_out.append(i[3])
 		for i in self.switches:
@@ -1952,7 +2000,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 			index=self.switches.index(i)
 			if self.list_switches.IsChecked(index): self.switches[index][0]='1'
 			else: self.switches[index][0]='0'
-		self.conf.set('INPUTS', 'switches', str(self.switches))
+		self.conf.set_list('INPUTS', 'switches', self.switches)
 		self.start_monitoring()
 		self.SetStatusText(_('Switches changes applied and restarted'))
 
@@ -1965,10 +2013,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 	def read_outputs(self):
 		self.outputs=[]
 		self.list_outputs.DeleteAllItems()
-		data=self.conf.get('OUTPUTS', 'outputs')
-		try:
-			temp_list=eval(data)
-		except:temp_list=[]
+		temp_list=self.conf.get_list('OUTPUTS', 'outputs')
 		for ii in temp_list:
 			self.outputs.append(ii)
 			self.list_outputs.Append([ii[1].decode('utf8'),ii[2].decode('utf8'),str(ii[3])])
@@ -2046,10 +2091,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 		if selected_output==-1: 
 			self.ShowMessage(_('Select an output to delete.'))
 			return
-		data=self.conf.get('ACTIONS', 'triggers')
-		try:
-			temp_list=eval(data)
-		except:temp_list=[]
+		temp_list=self.conf.get_list('ACTIONS', 'triggers')
 		dontdelete=0
 		for i in temp_list:
 			if i[1]==self.outputs[selected_output][4]: dontdelete=1
@@ -2064,10 +2106,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 
 	def apply_changes_outputs(self, e):
 		gpio_sw=[]
-		data=self.conf.get('INPUTS', 'switches')
-		try:
-			temp_list=eval(data)
-		except:temp_list=[]
+		temp_list=self.conf.get_list('INPUTS', 'switches')
 		for i in temp_list:
 			gpio_sw.append(i[3])
 		for i in self.outputs:
@@ -2079,7 +2118,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 			index=self.outputs.index(i)
 			if self.list_outputs.IsChecked(index): self.outputs[index][0]='1'
 			else: self.outputs[index][0]='0'
-		self.conf.set('OUTPUTS', 'outputs', str(self.outputs))
+		self.conf.set_list('OUTPUTS', 'outputs', self.outputs)
 		self.start_monitoring()
 		self.SetStatusText(_('Output changes applied and restarted'))
 
@@ -2091,38 +2130,39 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 
 	def start_monitoring(self):
 		self.ShowMessage(_('Actions will be restarted.'))
-		subprocess.call(['pkill', '-f', 'monitoring.py'])
-		subprocess.Popen(['python',currentpath+'/monitoring.py'])
+		start_bus(currentpath)
+		reload_daemon('monitoring.py', currentpath)
 
 	def on_twitter_enable(self,e):
 		if not self.apiKey.GetValue() or not self.apiSecret.GetValue() or not self.accessToken.GetValue() or not self.accessTokenSecret.GetValue():
 			self.twitter_enable.SetValue(False)
 			self.ShowMessage(_('Enter valid Twitter apiKey, apiSecret, accessToken and accessTokenSecret.'))
 			return
-		if self.twitter_enable.GetValue():
-			self.apiKey.Disable()
-			self.apiSecret.Disable()
-			self.accessToken.Disable()
-			self.accessTokenSecret.Disable()
-			self.conf.set('TWITTER', 'enable', '1')
-			if not '*****' in self.apiKey.GetValue(): 
-				self.conf.set('TWITTER', 'apiKey', self.apiKey.GetValue())
-				self.apiKey.SetValue('********************')
-			if not '*****' in self.apiSecret.GetValue(): 
-				self.conf.set('TWITTER', 'apiSecret', self.apiSecret.GetValue())
-				self.apiSecret.SetValue('********************')
-			if not '*****' in self.accessToken.GetValue(): 
-				self.conf.set('TWITTER', 'accessToken', self.accessToken.GetValue())
-				self.accessToken.SetValue('********************')
-			if not '*****' in self.accessTokenSecret.GetValue(): 
-				self.conf.set('TWITTER', 'accessTokenSecret', self.accessTokenSecret.GetValue())
-				self.accessTokenSecret.SetValue('********************')
-		else:
-			self.conf.set('TWITTER', 'enable', '0')
-			self.apiKey.Enable()
-			self.apiSecret.Enable()
-			self.accessToken.Enable()
-			self.accessTokenSecret.Enable()
+		with self.conf.batch():
+			if self.twitter_enable.GetValue():
+				self.apiKey.Disable()
+				self.apiSecret.Disable()
+				self.accessToken.Disable()
+				self.accessTokenSecret.Disable()
+				self.conf.set('TWITTER', 'enable', '1')
+				if not '*****' in self.apiKey.GetValue(): 
+					self.conf.set('TWITTER', 'apiKey', self.apiKey.GetValue())
+					self.apiKey.SetValue('********************')
+				if not '*****' in self.apiSecret.GetValue(): 
+					self.conf.set('TWITTER', 'apiSecret', self.apiSecret.GetValue())
+					self.apiSecret.SetValue('********************')
+				if not '*****' in self.accessToken.GetValue(): 
+					self.conf.set('TWITTER', 'accessToken', self.accessToken.GetValue())
+					self.accessToken.SetValue('********************')
+				if not '*****' in self.accessTokenSecret.GetValue(): 
+					self.conf.set('TWITTER', 'accessTokenSecret', self.accessTokenSecret.GetValue())
+					self.accessTokenSecret.SetValue('********************')
+			else:
+				self.conf.set('TWITTER', 'enable', '0')
+				self.apiKey.Enable()
+				self.apiSecret.Enable()
+				self.accessToken.Enable()
+				self.accessTokenSecret.Enable()
 		self.start_monitoring()
 
 	def on_gmail_enable(self,e):
@@ -2130,21 +2170,22 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 			self.gmail_enable.SetValue(False)
 			self.ShowMessage(_('Enter valid Gmail account, Gmail password and Recipient.'))
 			return
-		if self.gmail_enable.GetValue():
-			self.Gmail_account.Disable()
-			self.Gmail_password.Disable()
-			self.Recipient.Disable()
-			self.conf.set('GMAIL', 'enable', '1')
-			self.conf.set('GMAIL', 'gmail', self.Gmail_account.GetValue())
-			if not '*****' in self.Gmail_password.GetValue(): 
-				self.conf.set('GMAIL', 'password', self.Gmail_password.GetValue())
-				self.Gmail_password.SetValue('********************')
-			self.conf.set('GMAIL', 'recipient', self.Recipient.GetValue())
-		else:
-			self.conf.set('GMAIL', 'enable', '0')
-			self.Gmail_account.Enable()
-			self.Gmail_password.Enable()
-			self.Recipient.Enable()
+		with self.conf.batch():
+			if self.gmail_enable.GetValue():
+				self.Gmail_account.Disable()
+				self.Gmail_password.Disable()
+				self.Recipient.Disable()
+				self.conf.set('GMAIL', 'enable', '1')
+				self.conf.set('GMAIL', 'gmail', self.Gmail_account.GetValue())
+				if not '*****' in self.Gmail_password.GetValue(): 
+					self.conf.set('GMAIL', 'password', self.Gmail_password.GetValue())
+					self.Gmail_password.SetValue('********************')
+				self.conf.set('GMAIL', 'recipient', self.Recipient.GetValue())
+			else:
+				self.conf.set('GMAIL', 'enable', '0')
+				self.Gmail_account.Enable()
+				self.Gmail_password.Enable()
+				self.Recipient.Enable()
 		self.start_monitoring()
 
 ####################### Actions
@@ -2152,14 +2193,14 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 	def read_triggers(self):
 		self.a=DataStream(self.conf)
 		self.triggers=[]
+		#position of every trigger in the stored list, None for new ones
+		self.trigger_indexes=[]
 		self.list_triggers.DeleteAllItems()
-		data=self.conf.get('ACTIONS', 'triggers')
-		try:
-			temp_list=eval(data)
-		except:temp_list=[]
-		for ii in temp_list:
+		temp_list=self.conf.get_list('ACTIONS', 'triggers')
+		for index,ii in enumerate(temp_list):
 			if ii[1]==-1:
 				self.triggers.append(ii)
+				self.trigger_indexes.append(index)
 				self.list_triggers.Append([_('None (always true)'),'','',])
 				if ii[0]==1:
 					last=self.list_triggers.GetItemCount()-1
@@ -2168,6 +2209,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 				x=self.a.getDataListIndex(ii[1])
 				if x:
 					self.triggers.append(ii)
+					self.trigger_indexes.append(index)
 					self.list_triggers.Append([self.a.DataList[x][0].decode('utf8'),self.a.operators_list[ii[2]].decode('utf8'),ii[3]])
 					if ii[0]==1:
 						last=self.list_triggers.GetItemCount()-1
@@ -2215,6 +2257,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 					tmp.append(-1)
 					tmp.append([])
 					self.triggers.append(tmp)
+					self.trigger_indexes.append(None)
 					total=self.list_triggers.GetItemCount()
 					for x in xrange(0, total, 1):
 						self.list_triggers.Select(x, on=0)
@@ -2247,6 +2290,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 					tmp.append(value2)
 					tmp.append([])
 					self.triggers.append(tmp)
+					self.trigger_indexes.append(None)
 					total=self.list_triggers.GetItemCount()
 					for x in xrange(0, total, 1):
 						self.list_triggers.Select(x, on=0)
@@ -2327,6 +2371,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 			self.ShowMessage(_('Select a trigger to delete.'))
 		else:
 			del self.triggers[selected]
+			del self.trigger_indexes[selected]
 			self.list_triggers.DeleteItem(selected)
 			self.list_actions.DeleteAllItems()
 
@@ -2345,7 +2390,9 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 			if self.list_triggers.IsChecked(i): self.triggers[i][0]=1
 			else: self.triggers[i][0]=0
 			i=i+1
-		self.conf.set('ACTIONS', 'triggers', str(self.triggers))
+		#only the triggers changed are written, the stored list ends in the same order as self.triggers
+		self.conf.update_list('ACTIONS', 'triggers', self.triggers, self.trigger_indexes)
+		self.trigger_indexes=range(len(self.triggers))
 		self.start_monitoring()
 		self.SetStatusText(_('Actions changes applied and restarted'))
 
@@ -2370,16 +2417,12 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 ####################### 1W sensors
 
 	def start_1w(self):
-		subprocess.call(['pkill', '-f', '1w.py'])
-		subprocess.Popen(['python',currentpath+'/1w.py'])
+		reload_daemon('1w.py', currentpath)
 
 	def read_DS18B20(self):
 		self.DS18B20=[]
 		self.list_DS18B20.DeleteAllItems()
-		data=self.conf.get('1W', 'DS18B20')
-		try:
-			temp_list=eval(data)
-		except:temp_list=[]
+		temp_list=self.conf.get_list('1W', 'DS18B20')
 		for ii in temp_list:
 			self.DS18B20.append(ii)
 			self.list_DS18B20.Append([ii[0].decode('utf8'),ii[1].decode('utf8'),ii[2],ii[3]])
@@ -2452,10 +2495,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 		if selected_DS18B20==-1: 
 			self.ShowMessage(_('Select a sensor to delete.'))
 			return
-		data=self.conf.get('ACTIONS', 'triggers')
-		try:
-			temp_list=eval(data)
-		except:temp_list=[]
+		temp_list=self.conf.get_list('ACTIONS', 'triggers')
 		for i in temp_list:
 			if i[1]==self.DS18B20[selected_DS18B20][4]:
 				self.read_triggers()
@@ -2469,7 +2509,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 			index=self.DS18B20.index(i)
 			if self.list_DS18B20.IsChecked(index): self.DS18B20[index][5]='1'
 			else: self.DS18B20[index][5]='0'
-		self.conf.set('1W', 'DS18B20', str(self.DS18B20))
+		self.conf.set_list('1W', 'DS18B20', self.DS18B20)
 		self.start_1w()
 		self.start_monitoring()
 		self.SetStatusText(_('DS18B20 sensors changes applied and restarted'))
@@ -2487,11 +2527,8 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 	def read_USBinst(self):
 		self.USBinst=[]
 		self.list_USBinst.DeleteAllItems()
-		data=self.conf.get('UDEV', 'USBinst')
+		temp_list=self.conf.get_list('UDEV', 'USBinst')
 		sentence=0
-		try:
-			temp_list=eval(data)
-		except:temp_list=[]
 		for ii in temp_list:
 			self.USBinst.append(ii)
 			self.list_USBinst.Append([ii[0].decode('utf8'),ii[1].decode('utf8'),ii[2].decode('utf8'),ii[4].decode('utf8'),ii[3].decode('utf8'),ii[5]])
@@ -2542,7 +2579,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 		self.apply_changes_USBinst()
 
 	def apply_changes_USBinst(self):
-		self.conf.set('UDEV', 'USBinst', str(self.USBinst))
+		self.conf.set_list('UDEV', 'USBinst', self.USBinst)
 		file = open('10-openplotter.rules', 'w')
 		for i in self.USBinst:
 			index=self.USBinst.index(i)
@@ -2607,10 +2644,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 		except NameError:
 			self.context = pyudev.Context()
 
-		data=self.conf.get('UDEV', 'USBinst')
-		try:
-			temp_list=eval(data)
-		except:temp_list=[]
+		temp_list=self.conf.get_list('UDEV', 'USBinst')
 		for ic in temp_list:
 			if ic[5] == 'port':	
 				for device in self.context.list_devices(subsystem='usb'):
@@ -2805,10 +2839,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 
 		self.topics=[]
 		self.list_topics.DeleteAllItems()
-		data=self.conf.get('MQTT', 'topics')
-		try:
-			temp_list=eval(data)
-		except:temp_list=[]
+		temp_list=self.conf.get_list('MQTT', 'topics')
 		for ii in temp_list:
 			self.topics.append(ii)
 			self.list_topics.Append([ii[0].decode('utf8'),ii[1].decode('utf8')])
@@ -2858,10 +2889,7 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 		if selected_topic==-1: 
 			self.ShowMessage(_('Select a topic to delete.'))
 			return
-		data=self.conf.get('ACTIONS', 'triggers')
-		try:
-			temp_list=eval(data)
-		except:temp_list=[]
+		temp_list=self.conf.get_list('ACTIONS', 'triggers')
 		for i in temp_list:
 			if i[1]==self.topics[selected_topic][2]:
 				self.read_triggers()
@@ -2876,14 +2904,15 @@ along with this program.  If not, see http://www.gnu.org/licenses/"""
 		if not username or not passw:
 			self.ShowMessage(_('Enter at least username and password.'))
 			return
-		self.conf.set('MQTT', 'broker', self.mqtt_broker.GetValue())
-		self.conf.set('MQTT', 'port', self.mqtt_port.GetValue())
-		self.conf.set('MQTT', 'username', username)
-		self.conf.set('MQTT', 'topics', str(self.topics))
-		if not '*******' in passw:
-			self.mqtt_pass.SetValue('***************')
-			self.conf.set('MQTT', 'password', passw)
-		else: passw=self.conf.get('MQTT', 'password')
+		with self.conf.batch():
+			self.conf.set('MQTT', 'broker', self.mqtt_broker.GetValue())
+			self.conf.set('MQTT', 'port', self.mqtt_port.GetValue())
+			self.conf.set('MQTT', 'username', username)
+			self.conf.set_list('MQTT', 'topics', self.topics)
+			if not '*******' in passw:
+				self.mqtt_pass.SetValue('***************')
+				self.conf.set('MQTT', 'password', passw)
+			else: passw=self.conf.get('MQTT', 'password')
 		subprocess.call(['sudo', 'sh', '-c', 'echo "'+username+':'+passw+'" > /etc/mosquitto/passwd.pw'])
 		subprocess.call(['sudo','mosquitto_passwd','-U','/etc/mosquitto/passwd.pw'])
 		subprocess.call(['sudo','service','mosquitto','restart'])
@@ -15,12 +15,63 @@
 # You should have received a copy of the GNU General Public License
 # along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
 
-import wx, socket, threading, time, webbrowser
+import wx, threading, time, webbrowser
 from classes.datastream import DataStream
+from classes.nmeabus import NmeaBusClient
 from classes.paths import Paths
 from classes.conf import Conf
 from classes.language import Language
 from classes.mqtt import Mqtt
+from classes.sentencelog import SentenceLog, filter_sentences
+
+def mqtt_settings(conf):
+	#Mqtt is kept by reset while these do not change
+	return (conf.get_list('MQTT', 'topics'), conf.get('MQTT', 'broker'), conf.get('MQTT', 'port'), 
+		conf.get('MQTT', 'username'), conf.get('MQTT', 'password'))
+
+class InspectorList(wx.ListCtrl):
+
+	#virtual list, wx asks for the text of the visible cells only
+	def __init__(self, parent, size, pos):
+		wx.ListCtrl.__init__(self, parent, -1, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.SUNKEN_BORDER, size=size, pos=pos)
+		#[short, magnitude, value, source, NMEA, age] by magnitude
+		self.rows=[]
+
+	def set_rows(self, rows):
+		self.rows=rows
+		self.SetItemCount(len(rows))
+		self.Refresh()
+
+	def update_rows(self, changes):
+		#changes: [(index, row)]
+		if not changes: return
+		for index, row in changes: self.rows[index]=row
+		first=min(i[0] for i in changes)
+		last=max(i[0] for i in changes)
+		self.RefreshItems(first, last)
+
+	def OnGetItemText(self, item, column):
+		try: return self.rows[item][column]
+		except IndexError: return ''
+
+class LogList(wx.ListCtrl):
+
+	#virtual one column list of sentences, the cost of drawing does not depend on the number of lines
+	def __init__(self, parent, size, pos):
+		wx.ListCtrl.__init__(self, parent, -1, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_NO_HEADER | wx.SUNKEN_BORDER, size=size, pos=pos)
+		self.InsertColumn(0, '', width=size[0]-25)
+		self.rows=[]
+
+	def set_rows(self, rows, follow=True):
+		self.rows=rows
+		self.SetItemCount(len(rows))
+		self.Refresh()
+		#scroll to the last sentence, not while paused so the user can scroll back
+		if follow and rows: self.EnsureVisible(len(rows)-1)
+
+	def OnGetItemText(self, item, column):
+		try: return self.rows[item]
+		except IndexError: return ''
 
 class MyFrame(wx.Frame):
 		
@@ -41,9 +92,9 @@ class MyFrame(wx.Frame):
 			self.icon = wx.Icon(self.currentpath+'/openplotter.ico', wx.BITMAP_TYPE_ICO)
 			self.SetIcon(self.icon)
 
-			self.logger = wx.TextCtrl(self, style=wx.TE_MULTILINE|wx.TE_READONLY|wx.TE_DONTWRAP, size=(650,150), pos=(0,0))
+			self.logger = LogList(self, size=(650,150), pos=(0,0))
 
-			self.list = wx.ListCtrl(self, -1, style=wx.LC_REPORT | wx.SUNKEN_BORDER, size=(540, 220), pos=(5, 155))
+			self.list = InspectorList(self, size=(540, 220), pos=(5, 155))
 			self.list.InsertColumn(0, _('Short'), width=50)
 			self.list.InsertColumn(1, _('Magnitude'), width=175)
 			self.list.InsertColumn(2, _('Value'), width=120)
@@ -60,12 +111,35 @@ class MyFrame(wx.Frame):
 			self.button_nmea =wx.Button(self, label=_('NMEA info'), pos=(555, 240))
 			self.Bind(wx.EVT_BUTTON, self.nmea_info, self.button_nmea)
 
-			self.mqtt=''
+			#log filters
+			wx.StaticText(self, label=_('Talker'), pos=(555, 280))
+			self.filter_talker = wx.TextCtrl(self, size=(80, -1), pos=(555, 297))
+			self.Bind(wx.EVT_TEXT, self.log_filter, self.filter_talker)
+			wx.StaticText(self, label=_('Sentence'), pos=(555, 330))
+			self.filter_type = wx.TextCtrl(self, size=(80, -1), pos=(555, 347))
+			self.Bind(wx.EVT_TEXT, self.log_filter, self.filter_type)
+			self.log_talker=''
+			self.log_type=''
+			try: log_lines=int(self.conf.get('GENERAL','inspector_log_lines'))
+			except: log_lines=0
+			if log_lines<=0: log_lines=1000
+			self.log=SentenceLog(log_lines)
 
-			self.reset(0)
+			self.mqtt=''
+			self.mqtt_key=None
+			self.nmea_bus=''
+			self.resetting=False
+			#frames per second of the list
+			try: self.rate=float(self.conf.get('GENERAL','inspector_rate'))
+			except: self.rate=0
+			if self.rate<=0: self.rate=10.0
+			#True while a frame waits for the GUI thread
+			self.drawing=False
 
 			self.pause_all=0
 
+			self.swap_state(*self.build_state())
+
 			self.CreateStatusBar()
 
 			self.Centre()
@@ -77,96 +151,96 @@ class MyFrame(wx.Frame):
 			self.t2_stop= threading.Event()
 			self.thread2=threading.Thread(target=self.refresh_loop, args=(1,self.t2_stop))
 			
-			self.s2=''
+			self.nmea_bus=NmeaBusClient(self.a, raw=True, stop_event=self.t1_stop)
 			self.error=''
-			self.frase_nmea_log=''
-			self.data=[]
 
 			if not self.thread1.isAlive(): self.thread1.start()
 			if not self.thread2.isAlive(): self.thread2.start()
 
  		# thread 1
-		def connect(self):
-			try:
-				self.s2 = socket.socket()
-				self.s2.connect(("localhost", 10110))
-				self.s2.settimeout(5)
-			except socket.error, error_msg:
-				self.error= _('Failed to connect with localhost:10110. Error: ')+ str(error_msg[0])+_(', trying to reconnect...')
-				self.s2=''
-				time.sleep(7)
-			else: self.error=''
-			
-
 		def parse_data(self,arg1,stop_event):
 			while (not stop_event.is_set()):
-				if not self.s2: self.connect()
+				if not self.nmea_bus.connected:
+					if self.nmea_bus.connect(): self.error=''
+					else:
+						self.error= _('Failed to connect with NMEA bus. Error: ')+ self.nmea_bus.error+_(', trying to reconnect...')
+						self.nmea_bus.wait()
 				else:
-					frase_nmea=''
-					try:
-						frase_nmea = self.s2.recv(1024)
-					except socket.error, error_msg:
-						self.error= _('Connected with localhost:10110. Error: ')+ str(error_msg[0])+_(', waiting for data...')
+					self.nmea_bus.pause=self.pause_all
+					sentences=self.nmea_bus.read()
+					if sentences is None: continue
+					#only a real timeout, a read with updates but no sentence is not
+					if self.nmea_bus.error:
+						self.error= _('Connected with NMEA bus. Error: ')+ self.nmea_bus.error+_(', waiting for data...')
 					else:
-						if frase_nmea and self.pause_all==0:
-							self.a.parse_nmea(frase_nmea)
-							self.frase_nmea_log+=frase_nmea
-							self.error = _('Connected with localhost:10110.')
-						else:
-							self.s2=''
+						#kept while paused too, they are shown when resuming
+						if sentences: self.log.append(sentences)
+						self.error = _('Connected with NMEA bus.')
+			self.nmea_bus.close()
 		# end thread 1
 
 		# thread 2
 		def refresh_loop(self,arg1,stop_event):
+			#every frame only the cells changed since the last frame are sent to the GUI thread, in one call
+			a=None
+			shown=[]
+			log_state=None
+			#sentences in the log when paused, the view does not change until resuming
+			frozen=None
 			while (not stop_event.is_set()):
+				time.sleep(1.0/self.rate)
+				if self.drawing: continue
+				changes=[]
 				if self.pause_all==0:
-					self.a.checkinputs()
-					self.a.checkoutputs()
-					index=0
-					for i in self.a.DataList:
+					frozen=None
+					if a is not self.a:
+						#reset
+						a=self.a
+						shown=[[i[1], i[0], '', '', '', ''] for i in a.DataList]
+					a.checkinputs()
+					a.checkoutputs()
+					now=time.time()
+					for index, i in enumerate(a.DataList):
 						timestamp=i[4]
-						if timestamp:
-							now=time.time()
-							age=now-timestamp
-							value=''
-							unit=''
-							talker=''
-							sentence=''
-							value=i[2]
-							unit=i[3]
-							talker=i[5]
-							sentence=i[6]
-							if talker=='OC': talker=_('Calculated')
-							if talker=='OS': talker=_('Sensor')
-							if unit: data = str(value)+' '+str(unit)
-							else: data = str(value)
-							self.data=[index,2,data]
-							wx.CallAfter(self.refresh_data)
-							time.sleep(0.001)
-							if talker:
-								self.data=[index,3,talker]
-								wx.CallAfter(self.refresh_data)
-								time.sleep(0.001)
-							if sentence: 
-								self.data=[index,4,sentence]
-								wx.CallAfter(self.refresh_data)
-								time.sleep(0.001)
-							self.data=[index,5,str(round(age,1))]
-							wx.CallAfter(self.refresh_data)
-							time.sleep(0.001)
-						index=index+1
-					wx.CallAfter(self.refresh_data)
-					time.sleep(0.001)
-					
-				else: time.sleep(0.001)
+						if not timestamp: continue
+						value=i[2]
+						unit=i[3]
+						talker=i[5]
+						sentence=i[6]
+						if talker=='OC': talker=_('Calculated')
+						if talker=='OS': talker=_('Sensor')
+						if unit: data = str(value)+' '+str(unit)
+						else: data = str(value)
+						row=shown[index]
+						new=[row[0], row[1], data, talker or row[3], sentence or row[4], str(round(now-timestamp,1))]
+						if new!=row:
+							shown[index]=new
+							changes.append((index, new))
+				elif frozen is None: frozen=self.log.lines()
+				#log, only when there are new sentences or the filters changed
+				lines=None
+				state=(self.log.total, frozen is None, self.log_talker, self.log_type)
+				if state!=log_state:
+					log_state=state
+					if frozen is None: lines=self.log.lines(self.log_talker, self.log_type)
+					else: lines=filter_sentences(frozen, self.log_talker, self.log_type)
+				self.drawing=True
+				wx.CallAfter(self.refresh_data, a, changes, lines, self.error)
 		# end thread 2
 
-		def refresh_data(self):
-			if self.data: self.list.SetStringItem(self.data[0],self.data[1],self.data[2])
-			if self.frase_nmea_log: 
-				self.logger.AppendText(self.frase_nmea_log)
-				self.frase_nmea_log=''
-			self.SetStatusText(self.error)
+		def refresh_data(self, a, changes, lines, error):
+			#frames of a DataStream replaced by reset are dropped. drawing is cleared also on errors,
+			#otherwise refresh_loop would never post another frame
+			try:
+				if a is self.a: self.list.update_rows(changes)
+				if lines is not None: self.logger.set_rows(lines, follow=self.pause_all==0)
+				self.SetStatusText(error)
+			finally:
+				self.drawing=False
+
+		def log_filter(self, e):
+			self.log_talker=self.filter_talker.GetValue().strip().upper()
+			self.log_type=self.filter_type.GetValue().strip().upper()
 
 		def pause(self, e):
 			if self.pause_all==0: 
@@ -177,23 +251,48 @@ class MyFrame(wx.Frame):
 				self.button_pause.SetLabel(_('Pause'))
 
 		def reset(self, e):
-			self.pause_all=1
-			self.list.DeleteAllItems()
-			self.logger.SetValue('')
-			time.sleep(1)
+			#the new state is built out of the GUI thread and swapped in by swap_state
+			if self.resetting: return
+			self.resetting=True
+			self.button_reset.Disable()
+			self.log.clear()
+			self.logger.set_rows([])
+			thread=threading.Thread(target=self.reset_thread)
+			thread.daemon=True
+			thread.start()
+
+		def reset_thread(self):
+			try: state=self.build_state()
+			except Exception,e:
+				print str(e)
+				state=None
+			wx.CallAfter(self.reset_done, state)
+
+		def reset_done(self, state):
+			if state: self.swap_state(*state)
+			self.resetting=False
+			self.button_reset.Enable()
+
+		def build_state(self):
 			self.conf.read()
-			self.a=DataStream(self.conf)
-			if self.mqtt: self.mqtt.stop()
-			self.mqtt=Mqtt(self.conf,self.a)
-			index=0
-			for i in self.a.DataList:
-				short=i[1]
-				name=i[0]
-				self.list.InsertStringItem(index,short)
-				self.list.SetStringItem(index,1,name)
-				index=index+1
+			a=DataStream(self.conf)
+			rows=[[i[1], i[0], '', '', '', ''] for i in a.DataList]
+			key=mqtt_settings(self.conf)
+			#a new Mqtt only when its settings changed, the broker connections are shared anyway
+			mqtt=None
+			if key!=self.mqtt_key: mqtt=Mqtt(self.conf,a)
+			return a, rows, key, mqtt
 
-			self.pause_all=0
+		def swap_state(self, a, rows, key, mqtt):
+			#GUI thread. The refresh thread and the NMEA bus client see the new DataStream from their next read.
+			self.list.set_rows(rows)
+			self.a=a
+			if self.nmea_bus: self.nmea_bus.a=a
+			if mqtt:
+				if self.mqtt: self.mqtt.stop()
+				self.mqtt=mqtt
+			else: self.mqtt.a=a
+			self.mqtt_key=key
 
 		def nmea_info(self, e):
 			url = self.currentpath+'/docs/NMEA.html'
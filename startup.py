@@ -18,6 +18,8 @@
 import subprocess, time, ConfigParser
 from classes.paths import Paths
 from classes.conf import Conf
+from classes.nmeabus import BUS_SOCKET
+from classes.supervisor import Supervisor, Service, port_ready, unix_ready, NmeaProbe
 
 paths=Paths()
 home=paths.home
@@ -65,102 +67,85 @@ wifi_server=conf.get('WIFI', 'enable')
 
 delay=int(conf.get('STARTUP', 'delay'))
 
-kplex=conf.get('STARTUP', 'kplex')
-opencpn=conf.get('STARTUP', 'opencpn')
 opencpn_no=conf.get('STARTUP', 'opencpn_no_opengl')
 opencpn_fullscreen=conf.get('STARTUP', 'opencpn_fullscreen')
-x11vnc=conf.get('STARTUP', 'x11vnc')
 vnc_pass=conf.get('STARTUP', 'vnc_pass')
-gps_time=conf.get('STARTUP', 'gps_time')
-signalk=conf.get('SIGNALK', 'enable')
 
-enable=conf.get('AIS-SDR', 'enable')
 gain=conf.get('AIS-SDR', 'gain')
 ppm=conf.get('AIS-SDR', 'ppm')
 channel=conf.get('AIS-SDR', 'channel')
 
-nmea_hdg=conf.get('STARTUP', 'nmea_hdg')
-nmea_heel=conf.get('STARTUP', 'nmea_heel')
-nmea_pitch=conf.get('STARTUP', 'nmea_pitch')
-nmea_press=conf.get('STARTUP', 'nmea_press')
-nmea_temp_p=conf.get('STARTUP', 'nmea_temp_p')
-nmea_hum=conf.get('STARTUP', 'nmea_hum')
-nmea_temp_h=conf.get('STARTUP', 'nmea_temp_h')
-
-#1W
-DS18B20='0'
-x=conf.get('1W', 'DS18B20')
-if x: sensors_list=eval(x)
-else: sensors_list=[]
-for i in sensors_list:
-	if i[5]=='1': DS18B20='1'
-
-nmea_mag_var=conf.get('STARTUP', 'nmea_mag_var')
-nmea_hdt=conf.get('STARTUP', 'nmea_hdt')
-nmea_rot=conf.get('STARTUP', 'nmea_rot')
-TW_STW=conf.get('STARTUP', 'tw_stw')
-TW_SOG=conf.get('STARTUP', 'tw_sog')
-play=conf.get('STARTUP', 'play')
 sound=conf.get('STARTUP', 'sound')
 #######################################################
-time.sleep(delay)
-
-subprocess.call(['pkill', '-9', 'x11vnc'])
-if x11vnc=='1':
-	if vnc_pass=='1': subprocess.Popen(['x11vnc', '-forever', '-shared', '-usepw'])
-	else: subprocess.Popen(['x11vnc', '-forever', '-shared' ])         
-
-opencpn_commands=[]
-opencpn_commands.append('opencpn')
-if opencpn_no=='1': opencpn_commands.append('-no_opengl')
-if opencpn_fullscreen=='1': opencpn_commands.append('-fullscreen')
-
-if opencpn=='1' and len(opencpn_commands)>1: subprocess.Popen(opencpn_commands)
-if opencpn=='1' and len(opencpn_commands)==1: subprocess.Popen('opencpn')
-
-if wifi_server=='1':
-	subprocess.Popen(['sudo', 'python', currentpath+'/wifi_server.py', '1'])
-else:
-	subprocess.Popen(['sudo', 'python', currentpath+'/wifi_server.py', '0'])
-	
-time.sleep(16)
-
-subprocess.call(['pkill', '-9', 'kplex'])
-if kplex=='1':
-	subprocess.Popen('kplex')        
-
-subprocess.call(["pkill", '-9', "node"])
-if signalk=='1':
-	subprocess.Popen(home+'/.config/signalk-server-node/bin/openplotter', cwd=home+'/.config/signalk-server-node')       
-
-if gps_time=='1':
-	subprocess.call(['sudo', 'python', currentpath+'/time_gps.py'])
-
-subprocess.call(['pkill', '-f', 'i2c.py'])
-if nmea_hdg=='1' or nmea_heel=='1' or nmea_pitch=='1' or nmea_press=='1' or nmea_temp_p=='1' or nmea_hum=='1' or nmea_temp_h=='1': 
-	subprocess.Popen(['python', currentpath+'/i2c.py'], cwd=currentpath+'/imu')
-
-subprocess.call(['pkill', '-f', '1w.py'])
-if DS18B20=='1': 
-	subprocess.Popen(['python', currentpath+'/1w.py'])
-
-subprocess.call(['pkill', '-f', 'calculate.py'])
-if nmea_mag_var=='1' or nmea_hdt=='1' or nmea_rot=='1' or TW_STW=='1' or TW_SOG=='1': 
-	subprocess.Popen(['python', currentpath+'/calculate.py'])
-
-subprocess.call(['pkill', '-f', 'monitoring.py'])
-subprocess.Popen(['python',currentpath+'/monitoring.py'])
-
-subprocess.call(['pkill', '-9', 'aisdecoder'])
-subprocess.call(['pkill', '-9', 'rtl_fm'])
-if enable=='1':
+def enabled(*items):
+	#checked again before restarting a service, it could have been disabled in openplotter.py
+	def check():
+		conf.read()
+		for section, item in items:
+			if conf.get(section, item)=='1': return True
+		return False
+	return check
+
+def ds18b20_enabled():
+	conf.read()
+	for i in conf.get_list('1W', 'DS18B20'):
+		if i[5]=='1': return True
+	return False
+
+def start_x11vnc():
+	if vnc_pass=='1': return subprocess.Popen(['x11vnc', '-forever', '-shared', '-usepw'])
+	return subprocess.Popen(['x11vnc', '-forever', '-shared' ])
+
+def start_opencpn():
+	opencpn_commands=[]
+	opencpn_commands.append('opencpn')
+	if opencpn_no=='1': opencpn_commands.append('-no_opengl')
+	if opencpn_fullscreen=='1': opencpn_commands.append('-fullscreen')
+	return subprocess.Popen(opencpn_commands)
+
+def start_wifi():
+	if wifi_server=='1': return subprocess.Popen(['sudo', 'python', currentpath+'/wifi_server.py', '1'])
+	return subprocess.Popen(['sudo', 'python', currentpath+'/wifi_server.py', '0'])
+
+def start_sdr():
 	frecuency='161975000'
 	if channel=='b': frecuency='162025000'
 	rtl_fm=subprocess.Popen(['rtl_fm', '-f', frecuency, '-g', gain, '-p', ppm, '-s', '48k'], stdout = subprocess.PIPE)
 	aisdecoder=subprocess.Popen(['aisdecoder', '-h', '127.0.0.1', '-p', '10110', '-a', 'file', '-c', 'mono', '-d', '-f', '/dev/stdin'], stdin = rtl_fm.stdout)
+	return [rtl_fm, aisdecoder]
+
+def start_sound():
+	if sound: return subprocess.Popen(['mpg123',sound])
+
+def python(script, cwd=None):
+	return lambda: subprocess.Popen(['python', currentpath+'/'+script], cwd=cwd)
+
+time.sleep(delay)
 
-subprocess.call(['pkill', '-9', 'mpg123'])
-if play=='1':
-	if sound:
-		try: subprocess.Popen(['mpg123',sound])
-		except: pass
+#services start as soon as the ones they require are ready, the rest at once
+supervisor=Supervisor()
+add=supervisor.add
+add(Service('x11vnc', start_x11vnc, kill=[['pkill', '-9', 'x11vnc']], enabled=enabled(('STARTUP', 'x11vnc')), match='x11vnc'))
+add(Service('opencpn', start_opencpn, enabled=enabled(('STARTUP', 'opencpn')), restart=False))
+add(Service('wifi', start_wifi, once=True))
+add(Service('kplex', lambda: subprocess.Popen('kplex'), requires=('wifi',), ready=port_ready(10110), 
+	kill=[['pkill', '-9', 'kplex']], enabled=enabled(('STARTUP', 'kplex')), match='kplex'))
+add(Service('nmea_bus', python('nmea_bus.py'), requires=('kplex',), ready=unix_ready(BUS_SOCKET), 
+	kill=[['pkill', '-f', 'nmea_bus.py']], match='nmea_bus.py'))
+add(Service('signalk', lambda: subprocess.Popen(home+'/.config/signalk-server-node/bin/openplotter', cwd=home+'/.config/signalk-server-node'), 
+	requires=('kplex',), ready=port_ready(3000), kill=[['pkill', '-9', 'node']], enabled=enabled(('SIGNALK', 'enable')), match='signalk-server-node'))
+add(Service('time_gps', lambda: subprocess.Popen(['sudo', 'python', currentpath+'/time_gps.py']), requires=('kplex',), 
+	once=True, enabled=enabled(('STARTUP', 'gps_time'))))
+add(Service('i2c', python('i2c.py', currentpath+'/imu'), kill=[['pkill', '-f', 'i2c.py']], match='i2c.py', 
+	enabled=enabled(*[('STARTUP', i) for i in ['nmea_hdg', 'nmea_heel', 'nmea_pitch', 'nmea_press', 'nmea_temp_p', 'nmea_hum', 'nmea_temp_h']])))
+add(Service('1w', python('1w.py'), kill=[['pkill', '-f', '1w.py']], match='1w.py', enabled=ds18b20_enabled))
+add(Service('calculate', python('calculate.py'), requires=('nmea_bus',), kill=[['pkill', '-f', 'calculate.py']], match='calculate.py', 
+	enabled=enabled(*[('STARTUP', i) for i in ['nmea_mag_var', 'nmea_hdt', 'nmea_rot', 'tw_stw', 'tw_sog']])))
+add(Service('monitoring', python('monitoring.py'), requires=('nmea_bus',), kill=[['pkill', '-f', 'monitoring.py']], match='monitoring.py'))
+add(Service('ais-sdr', start_sdr, requires=('kplex',), kill=[['pkill', '-9', 'aisdecoder'], ['pkill', '-9', 'rtl_fm']], 
+	enabled=enabled(('AIS-SDR', 'enable')), match='aisdecoder'))
+add(Service('sound', start_sound, kill=[['pkill', '-9', 'mpg123']], once=True, enabled=enabled(('STARTUP', 'play'))))
+#boot to first NMEA sentence
+add(Service('first NMEA', None, requires=('kplex',), ready=NmeaProbe(10110), timeout=None))
+
+supervisor.run()
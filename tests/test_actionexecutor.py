@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import unittest, threading, time
+from classes.actionexecutor import ActionExecutor, POOLS
+
+class FakeActions:
+
+	#records the actions run, they block until release() while hold is set
+	def __init__(self):
+		self.runs=[]
+		self.started=threading.Semaphore(0)
+		self.hold=threading.Event()
+		self.hold.set()
+
+	def run_action(self, option, text, conf, a):
+		self.started.release()
+		self.hold.wait(5)
+		self.runs.append((option, text))
+		return ''
+
+class FakeDataStream:
+
+	def getVariablesValue(self, text):
+		return text
+
+class ActionExecutorTest(unittest.TestCase):
+
+	def setUp(self):
+		self.actions=FakeActions()
+		self.executor=ActionExecutor(self.actions, None, FakeDataStream())
+
+	def tearDown(self):
+		self.actions.hold.set()
+
+	def wait_runs(self, count):
+		end=time.time()+5
+		while len(self.actions.runs) < count and time.time() < end: time.sleep(0.01)
+		return sorted(self.actions.runs)
+
+	def test_queued_in_pools(self):
+		#commands, e-mail and SMS run in their pools, outputs at once in the calling thread
+		self.executor.run([('ACT5', 'ls'), ('ACT14', 'mail'), ('ACT21', 'sms'), ('HOUT', '17')])
+		self.assertTrue(('HOUT', '17') in self.actions.runs)
+		self.assertEqual(self.wait_runs(4), [('ACT14', 'mail'), ('ACT21', 'sms'), ('ACT5', 'ls'), ('HOUT', '17')])
+		self.assertEqual(self.executor.latency()['ACT5'][0], 1)
+
+	def test_full_queue_drops(self):
+		size=dict((name, size) for name, threads, size in POOLS)['modem']
+		self.actions.hold.clear()
+		self.executor.run([('ACT21', 'first')])
+		self.assertTrue(self.actions.started.acquire())
+		#the worker is busy with the first one, the queue takes size more
+		self.executor.run([('ACT21', str(i)) for i in range(size+2)])
+		self.assertEqual(self.executor.latency()['ACT21'][5], 2)
+		self.actions.hold.set()
+		self.assertEqual(len(self.wait_runs(size+1)), size+1)
+		time.sleep(0.05)
+		self.assertEqual(len(self.actions.runs), size+1)
+
+	def test_dedup_by_trigger(self):
+		self.actions.hold.clear()
+		self.executor.run([('ACT21', 'busy')])
+		self.assertTrue(self.actions.started.acquire())
+		self.executor.run([('ACT21', 'sms')], 'trigger 1')
+		#the same action of the same trigger is skipped while it waits, of another trigger it is not
+		self.executor.run([('ACT21', 'sms')], 'trigger 1')
+		self.executor.run([('ACT21', 'sms')], 'trigger 2')
+		self.assertEqual(self.executor.latency()['ACT21'][4], 1)
+		self.actions.hold.set()
+		self.assertEqual(self.wait_runs(3), [('ACT21', 'busy'), ('ACT21', 'sms'), ('ACT21', 'sms')])
+		#once it has run it can be queued again
+		self.executor.run([('ACT21', 'sms')], 'trigger 1')
+		self.assertEqual(len(self.wait_runs(4)), 4)
+
+	def test_wait_continues(self):
+		#ACT1 does not block, the actions after it are run by tick() when the time is up
+		now=time.time()
+		self.executor.run([('HOUT', 'before'), ('ACT1', '10'), ('HOUT', 'after'), ('ACT1', '20'), ('LOUT', 'last')], 'trigger')
+		self.assertEqual(self.actions.runs, [('HOUT', 'before')])
+		self.assertTrue(now+10 <= self.executor.next_due() <= time.time()+10)
+		self.executor.tick(now+9)
+		self.assertEqual(self.actions.runs, [('HOUT', 'before')])
+		self.executor.tick(now+11)
+		self.assertEqual(self.actions.runs, [('HOUT', 'before'), ('HOUT', 'after')])
+		self.executor.tick(self.executor.next_due())
+		self.assertEqual(self.actions.runs, [('HOUT', 'before'), ('HOUT', 'after'), ('LOUT', 'last')])
+		self.assertEqual(self.executor.next_due(), None)
+
+	def test_wait_keeps_trigger(self):
+		#actions after a wait are still deduplicated by their trigger
+		self.actions.hold.clear()
+		self.executor.run([('ACT21', 'busy')])
+		self.assertTrue(self.actions.started.acquire())
+		self.executor.run([('ACT1', '0'), ('ACT21', 'sms')], 'trigger 1')
+		self.executor.run([('ACT21', 'sms')], 'trigger 1')
+		self.executor.tick(time.time()+1)
+		self.assertEqual(self.executor.latency()['ACT21'][4], 1)
+		self.actions.hold.set()
+		self.assertEqual(len(self.wait_runs(2)), 2)
+
+if __name__ == '__main__':
+	unittest.main()
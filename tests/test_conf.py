@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import unittest, shutil, tempfile, os, multiprocessing
+from classes.conf import Conf
+
+def open_conf(path):
+	conf=Conf()
+	conf.file=path
+	conf.stat=None
+	conf.read()
+	return conf
+
+def set_items(path, name, count):
+	conf=open_conf(path)
+	for i in range(count):
+		with conf.batch():
+			conf.set('GENERAL', name+str(i), str(i))
+			conf.set('GENERAL', name+'last', str(i))
+
+class ConfTest(unittest.TestCase):
+
+	def setUp(self):
+		self.dir=tempfile.mkdtemp()
+		self.path=os.path.join(self.dir, 'openplotter.conf')
+		shutil.copy(os.path.join(os.path.dirname(__file__), '..', 'openplotter.conf'), self.path)
+		self.conf=open_conf(self.path)
+		self.other=open_conf(self.path)
+		self.conf.set('GENERAL', 'lang', 'en')
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_batch_keeps_values_when_file_changes(self):
+		with self.conf.batch():
+			self.conf.set('GENERAL', 'lang', 'es')
+			#another process writes during the batch
+			self.other.set('STARTUP', 'kplex', '0')
+			os.utime(self.path, (0, 0))
+			self.conf.set('STARTUP', 'x11vnc', '0')
+		result=open_conf(self.path)
+		self.assertEqual(result.get('GENERAL', 'lang'), 'es')
+		self.assertEqual(result.get('STARTUP', 'x11vnc'), '0')
+		self.assertEqual(result.get('STARTUP', 'kplex'), '0')
+
+	def test_set_outside_batch_reads_other_changes(self):
+		self.other.set('STARTUP', 'kplex', '0')
+		os.utime(self.path, (0, 0))
+		self.conf.set('GENERAL', 'lang', 'es')
+		result=open_conf(self.path)
+		self.assertEqual(result.get('GENERAL', 'lang'), 'es')
+		self.assertEqual(result.get('STARTUP', 'kplex'), '0')
+
+	def test_subscribers_get_changed_keys(self):
+		changes=[]
+		self.conf.subscribe(changes.append)
+		with self.conf.batch():
+			self.conf.set('GENERAL', 'lang', 'es')
+			self.conf.set('STARTUP', 'x11vnc', '0')
+		self.conf.set('GENERAL', 'lang', 'es')
+		self.assertEqual(changes, [set([('GENERAL', 'lang'), ('STARTUP', 'x11vnc')])])
+		#changes of other processes when the file is read
+		self.other.set('STARTUP', 'kplex', '0')
+		os.utime(self.path, (0, 0))
+		self.conf.read()
+		self.assertEqual(changes[1:], [set([('STARTUP', 'kplex')])])
+
+	def test_lists_are_copied_from_the_conf_once(self):
+		triggers=self.conf.get_list('ACTIONS', 'triggers')
+		self.assertTrue(os.path.exists(os.path.join(self.dir, 'openplotter.db')))
+		stat=os.stat(self.path)
+		self.conf.set_list('ACTIONS', 'triggers', triggers+[[1, -1, -1, -1, []]])
+		#openplotter.conf is not written again
+		self.assertEqual(os.stat(self.path), stat)
+		self.assertEqual(self.other.get_list('ACTIONS', 'triggers'), triggers+[[1, -1, -1, -1, []]])
+
+	def test_list_rows(self):
+		rows=[[1, -1, -1, -1, []], [0, -1, -1, -1, [['ACT1', 'a', 0.0, 0]]], [1, -1, -1, -1, []]]
+		self.conf.set_list('ACTIONS', 'triggers', rows)
+		self.other.watch()
+		self.other.check()
+		self.assertTrue(self.conf.set_list_row('ACTIONS', 'triggers', 1, [1, -1, -1, -1, []]))
+		self.assertFalse(self.conf.set_list_row('ACTIONS', 'triggers', 1, ['wrong']))
+		self.assertTrue(self.conf.set_list_row('ACTIONS', 'triggers', None, [0, -1, -1, -1, []]))
+		self.conf.delete_list_row('ACTIONS', 'triggers', 0)
+		expected=[[1, -1, -1, -1, []], [1, -1, -1, -1, []], [0, -1, -1, -1, []]]
+		self.assertEqual(self.conf.get_list('ACTIONS', 'triggers'), expected)
+		self.assertRaises(IndexError, self.conf.delete_list_row, 'ACTIONS', 'triggers', 3)
+		#other processes see the change as before
+		self.other.hup=True
+		self.assertEqual(self.other.check(), set([('ACTIONS', 'triggers')]))
+		self.assertEqual(self.other.get_list('ACTIONS', 'triggers'), expected)
+
+	def test_update_list_writes_changed_rows(self):
+		rows=[[1, -1, -1, str(i), []] for i in range(5)]
+		self.conf.set_list('ACTIONS', 'triggers', rows)
+		db=self.conf.store.db
+		changes=db.total_changes
+		#as the actions editor: row 3 hidden, row 1 changed, row 4 deleted, one added
+		edited=[rows[0], [0, -1, -1, '1', [['ACT1', 'a', 0.0, 0]]], rows[2], [1, -1, -1, 'new', []]]
+		self.conf.update_list('ACTIONS', 'triggers', edited, [0, 1, 2, None])
+		self.assertEqual(self.conf.get_list('ACTIONS', 'triggers'), edited)
+		#rows 0 and 2 untouched: one update, two deletes from the end and one insert, each with its version update
+		self.assertEqual(db.total_changes-changes, 8)
+
+	def test_processes_writing_at_once(self):
+		names=['a', 'b', 'c', 'd']
+		processes=[multiprocessing.Process(target=set_items, args=(self.path, i, 25)) for i in names]
+		for i in processes: i.start()
+		for i in processes: i.join()
+		self.assertEqual([i.exitcode for i in processes], [0]*len(names))
+		result=open_conf(self.path)
+		for name in names:
+			self.assertEqual(result.get('GENERAL', name+'last'), '24')
+			for i in range(25): self.assertEqual(result.get('GENERAL', name+str(i)), str(i))
+		self.assertEqual([i for i in os.listdir(self.dir) if i.startswith('.openplotter.conf.')], [])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import unittest, os, gettext
+from classes import datastream
+from classes.datastream import DataItem, DataStream
+
+#1000 sentences recorded from kplex, CRLF ended, NMEA and AIS
+CAPTURE=os.path.join(os.path.dirname(__file__), 'data', 'capture.nmea')
+
+class ListConf:
+	#no sensors, switches, outputs or topics
+	def get_list(self, section, item): return []
+
+def fields(ds):
+	#(unique id, value, unit, talker, sentence) of every magnitude, numbers as float
+	result=[]
+	for i in ds.DataList:
+		value=i.value
+		try: value=float(value)
+		except (TypeError, ValueError): pass
+		result.append((i.uid, value, i.unit, i.talker, i.sentence))
+	return result
+
+class DataItemTest(unittest.TestCase):
+
+	def test_item_reads_as_the_old_rows(self):
+		row=['Latitude', 'Lat', 4807.038, 'N', 1.0, 'GP', 'RMC', (0, 1), 1, 'Lat']
+		item=DataItem(*row)
+		self.assertEqual(item[2], row[2])
+		self.assertEqual(item[-1], row[-1])
+		self.assertEqual(item[2:4], row[2:4])
+		self.assertEqual(item[:], row)
+		self.assertEqual(item[::3], row[::3])
+		item[2]=1.5
+		self.assertEqual(item.value, 1.5)
+
+class DispatchTest(unittest.TestCase):
+
+	def setUp(self):
+		gettext.NullTranslations().install()
+
+	def test_ais_skipped_and_counted(self):
+		ds=DataStream(ListConf())
+		ds.sentences={}
+		before=fields(ds)
+		ds.parse_nmea('!AIVDM,1,1,,B,15MvqR0P00PD2SHMdBPJa?vN0@4K,0*7C\r\n$HCHDM,178.4,M*23\r\n')
+		self.assertEqual(ds.parse_errors, 0)
+		self.assertEqual(ds.sentences, {'VDM': 1, 'HDM': 1})
+		changed=[i[0] for i, j in zip(fields(ds), before) if i!=j]
+		self.assertEqual(changed, ['HDM'])
+
+class FastPathTest(unittest.TestCase):
+
+	def setUp(self):
+		gettext.NullTranslations().install()
+		self.sentences=[i.strip() for i in open(CAPTURE, 'rb') if i.strip()]
+
+	def slow(self, ds, sentence):
+		#the same sentence through pynmea2 and the extractors
+		fast=dict(datastream.NMEA_FAST)
+		datastream.NMEA_FAST.clear()
+		try: ds.parse_nmea(sentence)
+		finally: datastream.NMEA_FAST.update(fast)
+
+	def test_fast_path_as_pynmea2(self):
+		fast=DataStream(ListConf())
+		slow=DataStream(ListConf())
+		types=set()
+		for sentence in self.sentences:
+			fast.parse_nmea(sentence)
+			self.slow(slow, sentence)
+			self.assertEqual(fields(fast), fields(slow), sentence)
+			if sentence[3:6] in datastream.NMEA_FAST: types.add(sentence[3:6])
+		self.assertEqual(fast.parse_errors, slow.parse_errors)
+		#the capture has every fast sentence type, the values are checked after every sentence
+		self.assertEqual(types, set(datastream.NMEA_FAST))
+
+if __name__ == '__main__':
+	unittest.main()
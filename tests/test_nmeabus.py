@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import unittest, socket, threading, tempfile, shutil, os, time
+from classes.nmeabus import NmeaBusServer, QUEUE_SIZE
+
+def connect(path, mode='data'):
+	sock=socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	sock.connect(path)
+	sock.sendall(mode+'\n')
+	return sock
+
+def read_all(sock, lines):
+	#lines received until the connection closes
+	data=''
+	while True:
+		chunk=sock.recv(65536)
+		if not chunk: break
+		data+=chunk
+	lines.extend(data.split('\n')[:-1])
+
+class NmeaBusServerTest(unittest.TestCase):
+
+	def setUp(self):
+		self.dir=tempfile.mkdtemp()
+		self.server=NmeaBusServer(os.path.join(self.dir, 'bus'))
+
+	def tearDown(self):
+		self.server.close()
+		shutil.rmtree(self.dir)
+
+	def wait_clients(self, count):
+		for i in range(200):
+			if len(self.server.clients)==count: return
+			time.sleep(0.01)
+		self.fail('%d clients, %d expected' % (len(self.server.clients), count))
+
+	def test_slow_client_does_not_block_publish(self):
+		self.server.publish('HDM', 1.0, 'D', 0.0, 'HC', 'HDM')
+		#connected but never reading
+		slow=connect(self.server.path)
+		fast=connect(self.server.path)
+		self.wait_clients(2)
+		received=[]
+		reader=threading.Thread(target=read_all, args=(fast, received))
+		reader.start()
+		longest=0
+		count=0
+		for burst in range(40):
+			for i in range(QUEUE_SIZE//4):
+				start=time.time()
+				self.server.publish('HDM', float(count), 'D', time.time(), 'HC', 'HDM')
+				longest=max(longest, time.time()-start)
+				count+=1
+			time.sleep(0.01)
+		self.assertTrue(longest < 0.1, longest)
+		#the slow client is dropped, the other one gets every update
+		self.assertEqual(self.server.dropped, 1)
+		self.assertEqual(len(self.server.clients), 1)
+		writer=self.server.clients[0]
+		for i in range(500):
+			if writer.queue.empty(): break
+			time.sleep(0.01)
+		self.server.close()
+		reader.join(5)
+		self.assertEqual(len(received), count+1)
+		self.assertEqual([float(i.split('\t')[3]) for i in received[1:]], [float(i) for i in range(count)])
+		slow.close()
+		fast.close()
+
+	def test_new_client_gets_last_values(self):
+		self.server.publish('HDM', 1.0, 'D', 0.0, 'HC', 'HDM')
+		self.server.publish('HDM', 2.0, 'D', 0.0, 'HC', 'HDM')
+		self.server.publish('DPT', 3.0, 'M', 0.0, 'SD', 'DBT')
+		client=connect(self.server.path)
+		self.wait_clients(1)
+		self.server.close()
+		received=[]
+		read_all(client, received)
+		self.assertEqual(sorted(i.split('\t')[3] for i in received), ['2.0', '3.0'])
+		client.close()
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import unittest, random, socket, threading, os
+from classes.nmeastream import NmeaStream
+
+#1000 sentences recorded from kplex, CRLF ended, NMEA and AIS
+CAPTURE=os.path.join(os.path.dirname(__file__), 'data', 'capture.nmea')
+
+def chunks(data, rand, largest):
+	#data cut in random sizes, sentences are split and several are joined in one chunk
+	i=0
+	while i < len(data):
+		size=rand.randint(1, largest)
+		yield data[i:i+size]
+		i+=size
+
+class NmeaStreamTest(unittest.TestCase):
+
+	def setUp(self):
+		self.data=open(CAPTURE, 'rb').read()
+		self.expected=[i.strip() for i in self.data.split('\n') if i.strip()]
+
+	def test_replay_random_chunks(self):
+		for seed in range(20):
+			rand=random.Random(seed)
+			stream=NmeaStream()
+			received=[]
+			for chunk in chunks(self.data, rand, rand.choice((3, 80, 1500, 8192))):
+				received+=stream.feed(chunk)
+			self.assertEqual(received, self.expected)
+			self.assertEqual(stream.sentences, len(self.expected))
+			self.assertEqual(stream.bytes, len(self.data))
+			self.assertEqual(stream.checksum_errors, 0)
+			self.assertEqual(stream.carry, '')
+
+	def test_replay_tcp(self):
+		#the capture sent by a fake kplex in random writes, read until the connection closes
+		server=socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		server.bind(('127.0.0.1', 0))
+		server.listen(1)
+		def send():
+			connection, address=server.accept()
+			connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+			for chunk in chunks(self.data, random.Random(1), 700): connection.sendall(chunk)
+			connection.close()
+		thread=threading.Thread(target=send)
+		thread.start()
+		stream=NmeaStream('127.0.0.1', server.getsockname()[1], timeout=5, reconnect=False)
+		received=list(stream)
+		thread.join()
+		server.close()
+		self.assertEqual(received, self.expected)
+		self.assertEqual(stream.error, 'connection closed')
+
+	def test_timeout_is_not_an_empty_read(self):
+		#a recv with only part of a sentence gives no sentences but is not a timeout
+		server=socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		server.bind(('127.0.0.1', 0))
+		server.listen(1)
+		stream=NmeaStream('127.0.0.1', server.getsockname()[1], timeout=0.2)
+		self.assertTrue(stream.connect())
+		connection, address=server.accept()
+		connection.sendall(self.expected[0][:10])
+		self.assertEqual(stream.read(), [])
+		self.assertEqual(stream.error, '')
+		self.assertEqual(stream.read(), [])
+		self.assertEqual(stream.error, 'timed out')
+		connection.sendall(self.expected[0][10:]+'\r\n')
+		self.assertEqual(stream.read(), [self.expected[0]])
+		self.assertEqual(stream.error, '')
+		stream.close()
+		connection.close()
+		server.close()
+
+	def test_bad_checksum_counted(self):
+		stream=NmeaStream()
+		good=self.expected[0]
+		bad=good[:-2]+('00' if good[-2:]!='00' else '11')
+		self.assertEqual(stream.feed(bad+'\r\n'+good[:10]), [])
+		self.assertEqual(stream.feed(good[10:]+'\r\n'), [good])
+		self.assertEqual(stream.checksum_errors, 1)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import unittest, subprocess, shutil, tempfile, os, time
+from classes.conf import Conf
+from classes.supervisor import Service, Supervisor
+
+class SupervisorTest(unittest.TestCase):
+
+	def setUp(self):
+		#a copy of openplotter.conf, the actions change it as in openplotter
+		self.dir=tempfile.mkdtemp()
+		self.conf=Conf()
+		self.conf.file=os.path.join(self.dir, 'openplotter.conf')
+		shutil.copy(os.path.join(os.path.dirname(__file__), '..', 'openplotter.conf'), self.conf.file)
+		self.conf.stat=None
+		self.conf.read()
+		self.conf.set('STARTUP', 'kplex', '1')
+		def enabled():
+			self.conf.read()
+			return self.conf.get('STARTUP', 'kplex')=='1'
+		self.supervisor=Supervisor()
+		self.service=self.supervisor.add(Service('kplex', lambda: subprocess.Popen(['sleep', '60']), enabled=enabled))
+		self.now=time.time()
+		self.step()
+
+	def tearDown(self):
+		for i in self.service.processes:
+			if i.poll() is None: i.kill()
+			i.wait()
+		shutil.rmtree(self.dir)
+
+	def step(self, seconds=0):
+		#the supervisor passes of seconds
+		end=self.now+seconds
+		while True:
+			self.supervisor.step(self.now)
+			if self.now >= end: break
+			self.now=min(self.now+0.5, end)
+
+	def kill(self):
+		process=self.service.processes[0]
+		process.kill()
+		process.wait()
+		return process
+
+	def test_crashed_is_restarted(self):
+		old=self.kill()
+		self.step(5)
+		self.assertEqual(self.service.restarts, 1)
+		self.assertTrue(self.service.alive())
+		self.assertNotEqual(self.service.processes[0].pid, old.pid)
+
+	def test_stopped_on_purpose_stays_down(self):
+		#action "stop NMEA multiplexer"
+		self.conf.set('STARTUP', 'kplex', '0')
+		self.kill()
+		self.step(120)
+		self.assertEqual(self.service.restarts, 0)
+		self.assertFalse(self.service.alive())
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,105 @@
+#    This file is part of pyrlsdr.
+#    Copyright (C) 2013 by Roger <https://github.com/roger-/pyrtlsdr>
+#
+#    pyrlsdr is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    pyrlsdr is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with pyrlsdr.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from __future__ import division
+import unittest
+import numpy as np
+import matplotlib
+# headless, as the analyze mode
+matplotlib.use('Agg')
+import waterfall
+from waterfall import ChannelAnalysis, NFFT
+
+def adc_samples(codes):
+    # complex samples as read_scan() makes them from the ADC codes (I, Q interleaved)
+    raw = np.array(codes, dtype=np.uint8)
+    out = np.empty(len(raw)//2, dtype=np.complex64)
+    out.real = raw[0::2]
+    out.imag = raw[1::2]
+    out -= 127.5 + 127.5j
+    out /= 127.5
+    return out
+
+
+NOISE_DB = -40.0
+BURST_DB = -10.0
+
+class ChannelAnalysisTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fc = waterfall.ANALYSIS_FC
+        self.rs = waterfall.ANALYSIS_RATE
+        self.bins = self.fc + (np.arange(NFFT) - NFFT//2)*self.rs/NFFT
+        # channel A bursts 1 kHz below the channel, channel B is idle
+        self.freq = waterfall.AIS_CHANNELS[0]
+        self.center = int(np.argmin(np.abs(self.bins - (self.freq - 1e3))))
+        self.burst = np.full(NFFT, NOISE_DB, dtype=np.float32)
+        self.burst[self.center - 2:self.center + 3] = BURST_DB
+
+    def feed(self, analysis, sweeps=20, bursts=5, rms=waterfall.TARGET_RMS):
+        samples = np.full(64, rms, dtype=np.complex64)
+        idle = np.full(NFFT, NOISE_DB, dtype=np.float32)
+        for i in range(sweeps):
+            analysis.add(samples, self.burst if i % (sweeps//bursts) == 0 else idle)
+
+    def test_noise_snr_and_offset(self):
+        analysis = ChannelAnalysis(self.fc, self.rs)
+        self.feed(analysis)
+        result = analysis.result(30, 10)
+        self.assertEqual(result['sweeps'], 20)
+        self.assertAlmostEqual(result['noise_floor'], NOISE_DB, places=4)
+        (freq_a, noise_a, snr_a, activity_a, offset_a), (freq_b, noise_b, snr_b, activity_b, offset_b) = result['channels']
+        # SNR of the channel power in the sweeps with a burst
+        channel = slice(*np.searchsorted(self.bins, [self.freq - waterfall.CHANNEL_HALF_WIDTH, self.freq + waterfall.CHANNEL_HALF_WIDTH]))
+        power = 10*np.log10(np.mean(10**(self.burst[channel].astype(np.float64)/10)))
+        self.assertAlmostEqual(noise_a, NOISE_DB, places=4)
+        self.assertAlmostEqual(snr_a, power - NOISE_DB, places=4)
+        self.assertAlmostEqual(activity_a, 0.25)
+        self.assertAlmostEqual(offset_a, self.bins[self.center] - self.freq, places=3)
+        self.assertAlmostEqual(noise_b, NOISE_DB, places=4)
+        self.assertAlmostEqual(snr_b, 0, places=4)
+        self.assertEqual(activity_b, 0)
+        self.assertEqual(offset_b, None)
+
+    def test_signal_below_the_channel_raises_ppm(self):
+        analysis = ChannelAnalysis(self.fc, self.rs)
+        self.feed(analysis)
+        result = analysis.result(30, 10)
+        offset = result['channels'][0][4]
+        self.assertTrue(offset < 0)
+        # the crystal is fast, the correction goes up
+        self.assertEqual(result['ppm'], int(round(10 - offset/self.freq*1e6)))
+        self.assertTrue(result['ppm'] > 10)
+        # the ADC rms is on target, the gain is kept
+        self.assertEqual(result['gain'], 30)
+
+    def test_low_rms_raises_gain(self):
+        analysis = ChannelAnalysis(self.fc, self.rs)
+        self.feed(analysis, rms=waterfall.TARGET_RMS/10)
+        self.assertEqual(analysis.result(20, 0)['gain'], 40)
+
+
+    def test_only_adc_limits_are_clipped(self):
+        analysis = ChannelAnalysis(waterfall.ANALYSIS_FC, waterfall.ANALYSIS_RATE)
+        samples = adc_samples([0, 255, 1, 254, 127, 128, 255, 2])
+        analysis.add(samples, np.zeros(NFFT, dtype=np.float32))
+        self.assertEqual(analysis.clipped, 3)
+        self.assertEqual(analysis.count, 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import unittest, tempfile, shutil, os, calendar
+from classes.weatherlog import WeatherLog, read_rows
+
+#2020-01-10 00:00 UTC
+DAY=calendar.timegm((2020, 1, 10, 0, 0, 0))
+
+def sample(t, pressure=1013.0):
+	return [t, pressure, 20.0, 50.0]
+
+class WeatherLogTest(unittest.TestCase):
+
+	def setUp(self):
+		self.dir=tempfile.mkdtemp()
+		self.log=WeatherLog(self.dir, days=2, hourly_days=10)
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_torn_line_repaired(self):
+		#a power failure cut the last row, the next row has to start in a new line
+		for i in range(3): self.log.add(sample(DAY+i*60))
+		f=open(self.log.file('raw', DAY), 'a')
+		f.write(str(DAY+180)+',1013.')
+		f.close()
+		log=WeatherLog(self.dir, days=2, hourly_days=10)
+		log.catch_up(DAY+240)
+		log.add(sample(DAY+240))
+		self.assertEqual([i[0] for i in log.read()], [DAY, DAY+60, DAY+120, DAY+240])
+		self.assertTrue(open(log.file('raw', DAY)).read().endswith('\n'+str(DAY+240)+',1013.0,20.0,50.0\n'))
+
+	def test_catch_up_after_restart(self):
+		#i2c.py stopped in the middle of the second hour and started again the next day
+		self.log.add(sample(DAY, 1000.0))
+		self.log.add(sample(DAY+1800, 1010.0))
+		self.log.add(sample(DAY+3600, 1020.0))
+		self.log.add(sample(DAY+3600+1800, 1030.0))
+		self.assertEqual(len(self.log.read('hourly')), 1)
+		self.assertEqual(self.log.read('daily'), [])
+		now=DAY+86400+600
+		for i in range(2):
+			#a second start does not summarize again
+			log=WeatherLog(self.dir, days=2, hourly_days=10)
+			log.catch_up(now)
+			self.assertEqual(log.read('hourly'), [
+				[DAY, 2, 1000.0, 1010.0, 1005.0, 20.0, 20.0, 20.0, 50.0, 50.0, 50.0],
+				[DAY+3600, 2, 1020.0, 1030.0, 1025.0, 20.0, 20.0, 20.0, 50.0, 50.0, 50.0]])
+			self.assertEqual(log.read('daily'), [[DAY, 4, 1000.0, 1030.0, 1015.0, 20.0, 20.0, 20.0, 50.0, 50.0, 50.0]])
+			self.assertEqual(log.rows, [])
+		#rows of the current day are loaded back, the day is summarized when it ends
+		log.add(sample(now, 990.0))
+		log=WeatherLog(self.dir, days=2, hourly_days=10)
+		log.catch_up(now+60)
+		self.assertEqual(log.rows, [sample(now, 990.0)])
+		log.add(sample(DAY+2*86400, 995.0))
+		self.assertEqual(log.read('daily')[-1][:5], [DAY+86400, 1, 990.0, 990.0, 990.0])
+
+	def test_prune_boundaries(self):
+		for day in range(5): self.log.append('raw', sample(DAY+day*86400))
+		#the file of the day ending exactly days before now is kept, the one before is removed
+		now=DAY+3*86400+2*86400
+		self.log.prune(now)
+		self.assertEqual([start for path, start in self.log.files('raw')], [DAY+2*86400, DAY+3*86400, DAY+4*86400])
+		self.log.prune(now+1)
+		self.assertEqual([start for path, start in self.log.files('raw')], [DAY+3*86400, DAY+4*86400])
+
+	def test_prune_keeps_hourly_longer(self):
+		self.log.append('hourly', [DAY]+[1]*10)
+		self.log.prune(DAY+20*86400)
+		self.assertEqual(len(self.log.files('hourly')), 1)
+		#January ends after 31 days
+		self.log.prune(DAY-9*86400+31*86400+10*86400+1)
+		self.assertEqual(self.log.files('hourly'), [])
+
+	def test_read_rows_skips_damaged(self):
+		path=os.path.join(self.dir, 'raw-20200110.csv')
+		f=open(path, 'w')
+		f.write('1,2,3,4\n1,2,x,4\n1,2\n5,6,7,8\n9,10')
+		f.close()
+		self.assertEqual(read_rows(path, 4), [[1.0, 2.0, 3.0, 4.0], [5.0, 6.0, 7.0, 8.0]])
+
+if __name__ == '__main__':
+	unittest.main()
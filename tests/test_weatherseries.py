@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import unittest, tempfile, shutil, os
+import numpy as np
+from classes.weatherseries import read_array, envelope
+
+class ReadArrayTest(unittest.TestCase):
+
+	def setUp(self):
+		self.dir=tempfile.mkdtemp()
+		self.path=os.path.join(self.dir, 'raw-20200110.csv')
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def write(self, data):
+		f=open(self.path, 'w')
+		f.write(data)
+		f.close()
+
+	def test_whole_file(self):
+		self.write('1,2,3,4\n5,6,7,8\n')
+		self.assertEqual(read_array(self.path, 4).tolist(), [[1, 2, 3, 4], [5, 6, 7, 8]])
+
+	def test_damaged_lines(self):
+		#a bad value, a short line and a line cut by a power failure are skipped
+		self.write('1,2,3,4\n1,x,3,4\n1,2\n5,6,7,8\n9,10')
+		self.assertEqual(read_array(self.path, 4).tolist(), [[1, 2, 3, 4], [5, 6, 7, 8]])
+		#the values of a cut line and the start of the next one make a row of the right length
+		self.write('1,2,3,4\n1,2\n3,4\n5,6,7,8\n')
+		self.assertEqual(read_array(self.path, 4).tolist(), [[1, 2, 3, 4], [5, 6, 7, 8]])
+
+	def test_missing_and_empty(self):
+		self.assertEqual(read_array(self.path, 4).shape, (0, 4))
+		self.write('')
+		self.assertEqual(read_array(self.path, 4).shape, (0, 4))
+
+class EnvelopeTest(unittest.TestCase):
+
+	def setUp(self):
+		self.errors=np.seterr(all='raise')
+
+	def tearDown(self):
+		np.seterr(**self.errors)
+
+	def test_peaks_kept(self):
+		times=np.arange(10000, dtype=float)
+		values=np.sin(times/100.0)
+		values[1234]=50.0
+		values[8765]=-50.0
+		x, y=envelope(times, values, 0, 9999, 100)
+		self.assertTrue(len(x) <= 2*101)
+		self.assertEqual(y.max(), 50.0)
+		self.assertEqual(y.min(), -50.0)
+		self.assertTrue(1234 in x and 8765 in x)
+		self.assertTrue(np.all(np.diff(x) > 0))
+		#every column keeps its min and max
+		column=(times*(100/9999.0)).astype(int)
+		for i in (0, 12, 87, 100):
+			self.assertEqual(y[column[x.astype(int)]==i].max(), values[column==i].max())
+			self.assertEqual(y[column[x.astype(int)]==i].min(), values[column==i].min())
+
+	def test_borders(self):
+		#the points just out of the range are kept
+		times=np.arange(100, dtype=float)
+		values=times*2
+		x, y=envelope(times, values, 10.5, 20.5, 50)
+		self.assertEqual(x[0], 10)
+		self.assertEqual(x[-1], 21)
+
+	def test_identical_times(self):
+		times=np.zeros(1000)
+		values=np.arange(1000, dtype=float)
+		x, y=envelope(times, values, -1, 1, 10)
+		self.assertEqual(sorted(y.tolist()), [0.0, 999.0])
+
+if __name__ == '__main__':
+	unittest.main()
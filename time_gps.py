@@ -15,51 +15,30 @@
 # You should have received a copy of the GNU General Public License
 # along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
 
-import socket, pynmea2, subprocess
+import pynmea2, subprocess
+from classes.nmeastream import NmeaStream
 
 fecha=''
 hora=''
 
-try:
-	sock_in = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-	sock_in.settimeout(10)
-	sock_in.connect(('127.0.0.1', 10110))
-except socket.error, error_msg:
-	print 'Failed to connect with localhost:10110.'
-	print 'Error: '+ str(error_msg[0])
-else:
-	cont = 0
-	while True:
-		frase_nmea =''
-		try:
-			frase_nmea = sock_in.recv(1024)
-		except socket.error, error_msg:
-			try:
-				print 'Failed to connect with localhost:10110.'
-				print 'Error: '+ str(error_msg[0])
-				sys.stdout.flush()
-			except: pass
+#without reconnect the stream ends when the connection fails or no data arrives in 10 seconds
+nmea_stream=NmeaStream('127.0.0.1', 10110, timeout=10, reconnect=False)
+cont = 0
+for sentence in nmea_stream:
+	try:
+		msg = pynmea2.parse(sentence)
+		if msg.sentence_type == 'RMC' and msg.datestamp and msg.timestamp:
+			fecha = msg.datestamp
+			hora =  msg.timestamp
 			break
-		else:
-			if frase_nmea:
-				try:
-					nmea_list=frase_nmea.split()
-
-					for i in nmea_list:
-						msg = pynmea2.parse(i)
-						nmea_type=msg.sentence_type
-						if nmea_type == 'RMC':
-							fecha = msg.datestamp
-							hora =  msg.timestamp
-							break
-						else: 
-							cont=cont+1
-				except: pass
-				if cont >= 30: break
+	except: pass
+	cont=cont+1
+	if cont >= 30: break
+nmea_stream.close()
 
-	if fecha and hora:
-		subprocess.call([ 'date', '--set', fecha.strftime('%Y-%m-%d'), '--utc'])
-		subprocess.call([ 'date', '--set', hora.strftime('%H:%M:%S'), '--utc'])
-		print 'Date and time retrieved from NMEA data successfully.'
-	else:
-		print 'Unable to retrieve date or time from NMEA data.'
+if fecha and hora:
+	subprocess.call([ 'date', '--set', fecha.strftime('%Y-%m-%d'), '--utc'])
+	subprocess.call([ 'date', '--set', hora.strftime('%H:%M:%S'), '--utc'])
+	print 'Date and time retrieved from NMEA data successfully.'
+else:
+	print 'Unable to retrieve date or time from NMEA data.'
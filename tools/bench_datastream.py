@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+# This file is part of Openplotter.
+# Copyright (C) 2015 by sailoog <https://github.com/sailoog/openplotter>
+#
+# Openplotter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+# Openplotter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Openplotter. If not, see <http://www.gnu.org/licenses/>.
+import sys, os, time, gettext
+
+#Benchmark of DataStream, from the openplotter directory:
+#
+#python tools/bench_datastream.py [capture.nmea]
+#
+#lookup   updates and validate() of the magnitudes as calculate.py and monitoring.py do every loop
+#replay   sentences per second parsing tests/data/capture.nmea, with and without the fast path
+#types    time per sentence of every type in the capture, with and without the fast path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from classes import datastream
+from classes.datastream import DataStream
+
+CAPTURE=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'data', 'capture.nmea')
+#magnitudes read by calculate.py
+VALIDATE=['Lat','Lon','Date','HDM','Var','HDT','STW','AWS','AWA','SOG','COG','Lat','Lon','Var','HDT']
+#magnitudes of a RMC sentence
+UPDATE=['Lat','Lon','Date','Time','Var','COG','SOG']
+
+class BenchConf:
+	#20 DS18B20 sensors and MQTT topics, the magnitudes read are behind them as in a real DataList
+	def __init__(self, n=20):
+		self.lists={('1W','DS18B20'): [['t%d'%i,'T%d'%i,'C','id%d'%i,'1W%d'%i,'1'] for i in range(n)],
+			('MQTT','topics'): [['M%d'%i,'topic/%d'%i,'MQTT%d'%i] for i in range(n)]}
+	def get_list(self, section, item): return self.lists.get((section, item), [])
+	#older trees eval the text
+	def get(self, section, item): return str(self.lists.get((section, item), ''))
+
+def best(function, repeat=3):
+	result=1e9
+	for i in range(repeat):
+		start=time.time()
+		function()
+		result=min(result, time.time()-start)
+	return result
+
+def without_fast(function):
+	fast=dict(getattr(datastream, 'NMEA_FAST', {}))
+	if fast: datastream.NMEA_FAST.clear()
+	try: return function()
+	finally:
+		if fast: datastream.NMEA_FAST.update(fast)
+
+def bench_lookup(n=5000):
+	ds=DataStream(BenchConf())
+	now=time.time()
+	def updates():
+		for i in xrange(n):
+			for name in UPDATE: ds.updateDataList(name,1.0,'N','GP','RMC')
+	def validates():
+		for i in xrange(n):
+			for name in VALIDATE: ds.validate(name,now,1)
+	print 'lookup: %d magnitudes, %d updates %.1f us, %d validate() %.1f us' % (len(ds.DataList),
+		len(UPDATE), best(updates)/n*1e6, len(VALIDATE), best(validates)/n*1e6)
+
+def bench_replay(data):
+	count=len(data.split())
+	ds=DataStream(BenchConf())
+	fast=best(lambda: ds.parse_nmea(data))
+	slow=without_fast(lambda: best(lambda: ds.parse_nmea(data)))
+	print 'replay: %d sentences, pynmea2 %.0f sentences/s, fast path %.0f sentences/s' % (count, count/slow, count/fast)
+
+def bench_types(data, repeat=200):
+	ds=DataStream(BenchConf())
+	sentences={}
+	for i in data.split(): sentences.setdefault(i[3:6], i)
+	print 'types: us per sentence   pynmea2  fast path'
+	for nmea_type in sorted(sentences):
+		sentence='\n'.join([sentences[nmea_type]]*repeat)
+		fast=best(lambda: ds.parse_nmea(sentence))/repeat*1e6
+		slow=without_fast(lambda: best(lambda: ds.parse_nmea(sentence)))/repeat*1e6
+		print '       %s             %7.1f  %9.1f' % (nmea_type, slow, fast)
+
+def main():
+	gettext.NullTranslations().install()
+	data=open(sys.argv[1] if len(sys.argv) > 1 else CAPTURE, 'rb').read()
+	bench_lookup()
+	bench_replay(data)
+	bench_types(data)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,119 @@
+#    This file is part of pyrlsdr.
+#    Copyright (C) 2013 by Roger <https://github.com/roger-/pyrtlsdr>
+#
+#    pyrlsdr is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    pyrlsdr is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with pyrlsdr.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from __future__ import division
+import sys, os, time, types, multiprocessing
+import numpy as np
+
+# Benchmark of waterfall.py without a dongle, from the openplotter directory:
+#
+# python tools/bench_waterfall.py [seconds]
+#
+# * PSD of a sweep: batched psd_db() in the PSD thread against one process
+#   pool task per scan, as a wideband sweep would send them
+# * sweep time against the number of scans, with the acquisition and PSD threads
+
+SCANS = (1, 2, 3, 4, 6)
+
+class FakeRtlSdr(object):
+    # transfer and retune times of an RTL2832U, random samples
+    rs = 2.4e6
+    gain = 10
+    freq_correction = 0
+    retune = 0.005
+
+    def __init__(self):
+        self._fc = 162e6
+        self.raw = np.random.randint(0, 256, 2*16384).astype(np.uint8).tobytes()
+
+    def _get_fc(self):
+        return self._fc
+
+    def _set_fc(self, fc):
+        time.sleep(self.retune)
+        self._fc = fc
+
+    fc = property(_get_fc, _set_fc)
+
+    def read_bytes(self, num_bytes):
+        time.sleep(num_bytes/2/self.rs)
+        return (self.raw*(num_bytes//len(self.raw) + 1))[:num_bytes]
+
+    def close(self):
+        pass
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import matplotlib
+matplotlib.use('Agg')
+try:
+    import rtlsdr
+except ImportError:
+    # the benchmark needs no dongle, nor pyrtlsdr
+    rtlsdr = types.ModuleType('rtlsdr')
+    rtlsdr.RtlSdr = FakeRtlSdr
+    sys.modules['rtlsdr'] = rtlsdr
+import waterfall
+
+def timed(function, repeat):
+    start = time.time()
+    for i in range(repeat):
+        function()
+    return (time.time() - start)/repeat*1e3
+
+def bench_psd(repeat=50):
+    processes = max(1, multiprocessing.cpu_count() - 1)
+    pool = multiprocessing.Pool(processes)
+    print('PSD of a sweep (ms), pool of %d processes' % processes)
+    print('scans   batched   pool')
+    try:
+        for num_scans in SCANS:
+            buf = (np.random.randn(num_scans, waterfall.NUM_SAMPLES_PER_SCAN) +
+                   1j*np.random.randn(num_scans, waterfall.NUM_SAMPLES_PER_SCAN)).astype(np.complex64)
+            batched = timed(lambda: waterfall.psd_db(buf).ravel(), repeat)
+            pooled = timed(lambda: np.concatenate([i.get() for i in
+                           [pool.apply_async(waterfall.psd_db, (scan.copy(),)) for scan in buf]]), repeat)
+            print('%5d  %8.2f  %6.2f' % (num_scans, batched, pooled))
+    finally:
+        pool.terminate()
+
+def bench_sweep(seconds):
+    print('sweep time (ms), %.1f Msps, %.0f ms retune' % (FakeRtlSdr.rs/1e6, FakeRtlSdr.retune*1e3))
+    print('scans   sweep   dropped')
+    for num_scans in SCANS:
+        wf = waterfall.Waterfall(FakeRtlSdr(), plot=False)
+        wf.set_sweep(num_scans, FakeRtlSdr.rs, 157e6)
+        threads = wf.start_threads()
+        time.sleep(0.5)
+        computed = wf.sweeps_computed
+        dropped = wf.sweeps_dropped
+        start = time.time()
+        time.sleep(seconds)
+        sweeps = wf.sweeps_computed - computed
+        elapsed = time.time() - start
+        dropped = wf.sweeps_dropped - dropped
+        wf.stop_threads(threads)
+        print('%5d  %6.1f  %8d' % (num_scans, elapsed/max(sweeps, 1)*1e3, dropped))
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    bench_psd()
+    print('')
+    bench_sweep(seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -16,11 +16,14 @@
 
 
 from __future__ import division
+import sys, threading
+import matplotlib
+if sys.argv[1:2] == ['analyze']:
+    # headless, no display needed
+    matplotlib.use('Agg')
 import matplotlib.animation as animation
-from matplotlib.mlab import psd
 import pylab as pyl
 import numpy as np
-import sys
 from rtlsdr import RtlSdr
 
 # A simple waterfall, spectrum plotter
@@ -31,15 +34,61 @@ from rtlsdr import RtlSdr
 #   change the center frequency (hold shift for finer control).
 # * Press "+" and "-" to control gain, and space to enable AGC.
 # * Type a frequency (in MHz) and press enter to directly change the center frequency
+# * Press "w" to switch between the channel and the wideband sweep
+#
+# python waterfall.py <gain> <ppm> <a|b|w>  opens the waterfall
+# python waterfall.py analyze <gain> <ppm> [seconds]  measures the AIS channels
+# without display and recommends gain and ppm. The dongle must be free, stop
+# rtl_fm and aisdecoder before. The Analyze button of the SDR-AIS tab does it,
+# pausing the reception and resuming it after.
 
 NFFT = 1024
 NUM_SAMPLES_PER_SCAN = NFFT*16
 NUM_BUFFERED_SWEEPS = 50
 
 # change this to control the number of scans that are combined in a single sweep
-# (e.g. 2, 3, 4, etc.) Note that it can slow things down
+# (e.g. 2, 3, 4, etc.) The PSD thread computes all the scans of a sweep at once
+# while the next sweep is tuned and read, see tools/bench_waterfall.py
 NUM_SCANS_PER_SWEEP = 1
 
+# the wideband sweep covers these frequencies: DSC (channel 70), AIS A and AIS B
+WIDEBAND_FREQS = (156.525e6, 161.975e6, 162.025e6)
+WIDEBAND_RATE = 2.4e6
+
+# PSD as matplotlib.mlab.psd with its defaults (Hanning window, Fs=2, no
+# overlap, two-sided and centered), for all the scans of a sweep at once
+WINDOW = np.hanning(NFFT).astype(np.float32)
+PSD_SCALE = 2*np.sum(WINDOW.astype(np.float64)**2)
+
+def psd_db(samples):
+    # samples (..., NUM_SAMPLES_PER_SCAN) -> power in dB (..., NFFT)
+    segments = samples.reshape(samples.shape[:-1] + (-1, NFFT))
+    spectrum = np.fft.fft(segments*WINDOW, axis=-1)
+    power = (spectrum.real**2 + spectrum.imag**2).mean(axis=-2)
+    power = np.fft.fftshift(power, axes=-1)
+    power /= PSD_SCALE
+    return (10*np.log10(power)).astype(np.float32)
+
+def wideband_sweep(rs=WIDEBAND_RATE, freqs=WIDEBAND_FREQS):
+    # (scans, rs, fc of the first scan) of the narrowest sweep centered on freqs,
+    # with a fifth of a scan as margin
+    span = max(freqs) - min(freqs)
+    num_scans = int(np.ceil((span + rs/5)/rs))
+    center = (max(freqs) + min(freqs))/2
+    return num_scans, rs, center - rs*(num_scans - 1)/2
+
+# the analysis tunes both AIS channels at once, away from the DC spike, with a
+# narrow rate for 244 Hz bins (1.5 ppm)
+AIS_CHANNELS = (161.975e6, 162.025e6)
+ANALYSIS_FC = 162.06e6
+ANALYSIS_RATE = 0.25e6
+ANALYSIS_SECONDS = 10
+CHANNEL_HALF_WIDTH = 12.5e3
+ACTIVE_DB = 6           # above the channel noise a sweep has a burst
+TARGET_RMS = 0.15       # of the ADC full scale, room for strong bursts
+MAX_CLIPPED = 1e-4      # fraction of samples at the ADC limits
+MAX_GAIN = 49.6
+
 # these are the increments when scrolling the mouse wheel or pressing '+' or '-'
 FREQ_INC_COARSE = 1e6
 FREQ_INC_FINE = 0.1e6
@@ -48,14 +97,78 @@ GAIN_INC = 5
 class Waterfall(object):
     keyboard_buffer = []
     shift_key_down = False
-    image_buffer = -100*np.ones((NUM_BUFFERED_SWEEPS,\
-                                 NUM_SCANS_PER_SWEEP*NFFT))
 
-    def __init__(self, sdr=None, fig=None):
-        self.fig = fig if fig else pyl.figure()
+    def __init__(self, sdr=None, fig=None, plot=True):
+        self.fig = fig if fig else pyl.figure() if plot else None
         self.sdr = sdr if sdr else RtlSdr()
 
-        self.init_plot()
+        self.buffer_lock = threading.Lock()
+        self.generation = 0
+        self.num_scans = NUM_SCANS_PER_SWEEP
+        self.allocate()
+        # sweep restored when leaving the wideband one
+        self.channel_sweep = None
+        # center freq. of the first scan, the tuner is moved by the acquisition thread
+        self.start_fc = None
+        self.tuned_fc = None
+        self.forward = True
+        self.new_samples = threading.Event()
+        # the SDR is used by the acquisition thread and the GUI handlers
+        self.sdr_lock = threading.RLock()
+        self.stop_event = threading.Event()
+
+        # counters
+        self.sweeps_read = 0
+        self.sweeps_dropped = 0    # overwritten before the PSD thread got them
+        self.sweeps_computed = 0
+        self.sweeps_rendered = 0
+        self.sweeps_hidden = 0     # computed but replaced before a frame showed them
+        self.frames_skipped = 0    # animation frames without a new sweep
+
+        # ChannelAnalysis fed with every sweep computed
+        self.analysis = None
+
+        if self.fig:
+            self.init_plot()
+
+    def allocate(self):
+        # buffers for self.num_scans, sweeps of the old size are discarded
+        self.generation += 1
+
+        # ring buffer of sweeps, every sweep is written twice (rows i and
+        # i+NUM_BUFFERED_SWEEPS) so the last NUM_BUFFERED_SWEEPS sweeps, newest
+        # first, are always the contiguous view ring[i:i+NUM_BUFFERED_SWEEPS]
+        self.ring = np.full((2*NUM_BUFFERED_SWEEPS, self.num_scans*NFFT),
+                            -100, dtype=np.float32)
+        self.ring_index = 0
+        self.image_buffer = self.ring[0:NUM_BUFFERED_SWEEPS]
+
+        # double buffer of raw samples: the acquisition thread fills one sweep
+        # while the PSD thread processes the other one
+        self.samples = [np.zeros((self.num_scans, NUM_SAMPLES_PER_SCAN), dtype=np.complex64)
+                        for i in range(2)]
+        self.latest = None    # buffer with the last complete sweep
+        self.reading = None   # buffer used by the PSD thread
+
+    def set_sweep(self, num_scans, rs, fc):
+        with self.sdr_lock:
+            self.sdr.rs = rs
+            self.sdr.fc = fc
+            self.start_fc = self.tuned_fc = fc
+            with self.buffer_lock:
+                self.num_scans = num_scans
+                self.allocate()
+        if self.fig:
+            self.image.set_array(self.image_buffer)
+            self.update_plot_labels()
+
+    def toggle_wideband(self):
+        if self.num_scans == 1:
+            with self.sdr_lock:
+                self.channel_sweep = 1, self.sdr.rs, self.start_fc
+            self.set_sweep(*wideband_sweep())
+        elif self.channel_sweep:
+            self.set_sweep(*self.channel_sweep)
 
     def init_plot(self):
         self.ax = self.fig.add_subplot(1,1,1)
@@ -70,35 +183,45 @@ class Waterfall(object):
         self.fig.canvas.set_window_title('AIS signal')
 
     def update_plot_labels(self):
-        fc = self.sdr.fc
-        rs = self.sdr.rs
-        freq_range = (fc - rs/2)/1e6, (fc + rs*(NUM_SCANS_PER_SWEEP - 0.5))/1e6
+        with self.sdr_lock:
+            fc = self.start_fc
+            rs = self.sdr.rs
+        freq_range = (fc - rs/2)/1e6, (fc + rs*(self.num_scans - 0.5))/1e6
 
         self.image.set_extent(freq_range + (0, 1))
         self.fig.canvas.draw_idle()
 
     def on_scroll(self, event):
         if event.button == 'up':
-            self.sdr.fc += FREQ_INC_FINE if self.shift_key_down else FREQ_INC_COARSE
+            with self.sdr_lock:
+                self.start_fc += FREQ_INC_FINE if self.shift_key_down else FREQ_INC_COARSE
             self.update_plot_labels()
         elif event.button == 'down':
-            self.sdr.fc -= FREQ_INC_FINE if self.shift_key_down else FREQ_INC_COARSE
+            with self.sdr_lock:
+                self.start_fc -= FREQ_INC_FINE if self.shift_key_down else FREQ_INC_COARSE
             self.update_plot_labels()
 
     def on_key_press(self, event):
         if event.key == '+':
-            self.sdr.gain += GAIN_INC
+            with self.sdr_lock:
+                self.sdr.gain += GAIN_INC
         elif event.key == '-':
-            self.sdr.gain -= GAIN_INC
+            with self.sdr_lock:
+                self.sdr.gain -= GAIN_INC
         elif event.key == ' ':
-            self.sdr.gain = 'auto'
+            with self.sdr_lock:
+                self.sdr.gain = 'auto'
         elif event.key == 'shift':
             self.shift_key_down = True
+        elif event.key == 'w':
+            self.toggle_wideband()
         elif event.key == 'right':
-            self.sdr.fc += FREQ_INC_FINE if self.shift_key_down else FREQ_INC_COARSE
+            with self.sdr_lock:
+                self.start_fc += FREQ_INC_FINE if self.shift_key_down else FREQ_INC_COARSE
             self.update_plot_labels()
         elif event.key == 'left':
-            self.sdr.fc -= FREQ_INC_FINE if self.shift_key_down else FREQ_INC_COARSE
+            with self.sdr_lock:
+                self.start_fc -= FREQ_INC_FINE if self.shift_key_down else FREQ_INC_COARSE
             self.update_plot_labels()
         elif event.key == 'enter':
             # see if valid frequency was entered, then change center frequency
@@ -108,8 +231,9 @@ class Waterfall(object):
 
                 # if we're doing multiple adjacent scans, we need to figure out
                 # the appropriate center freq for the leftmost scan
-                center_freq = float(input)*1e6 + (self.sdr.rs/2)*(1 - NUM_SCANS_PER_SWEEP)
-                self.sdr.fc = center_freq
+                with self.sdr_lock:
+                    center_freq = float(input)*1e6 + (self.sdr.rs/2)*(1 - self.num_scans)
+                    self.start_fc = center_freq
 
                 self.update_plot_labels()
             except ValueError:
@@ -123,32 +247,142 @@ class Waterfall(object):
         if event.key == 'shift':
             self.shift_key_down = False
 
-    def update(self, *args):
-        # save center freq. since we're gonna be changing it
-        start_fc = self.sdr.fc
+    def read_scan(self, out):
+        # samples straight into the preallocated buffer, same scaling as RtlSdr.read_samples
+        raw = np.frombuffer(self.sdr.read_bytes(2*len(out)), dtype=np.uint8)
+        out.real = raw[0::2]
+        out.imag = raw[1::2]
+        out -= 127.5 + 127.5j
+        out /= 127.5
+
+    def acquire(self):
+        # acquisition thread, USB transfers never block the GUI. The SDR is
+        # locked for one scan at a time so the GUI handlers wait one read at most
+        while not self.stop_event.is_set():
+            with self.sdr_lock:
+                start_fc = self.start_fc
+                rs = self.sdr.rs
+                with self.buffer_lock:
+                    # never the buffer being processed, the other one may hold a
+                    # sweep not processed yet that is dropped
+                    target = 1 if self.reading == 0 or (self.reading is None and self.latest == 0) else 0
+                    if self.latest == target:
+                        self.latest = None
+                        self.sweeps_dropped += 1
+                    generation = self.generation
+                    buf = self.samples[target]
+                    num_scans = self.num_scans
+            # sweeps go up and down so the tuner is not moved back to
+            # the first scan, every scan is retuned once
+            scans = range(num_scans)
+            if not self.forward:
+                scans.reverse()
+            self.forward = not self.forward
+            complete = True
+            for scan_num in scans:
+                try:
+                    with self.sdr_lock:
+                        # sweep changed by the GUI, buffers of another size
+                        if generation != self.generation:
+                            complete = False
+                            break
+                        fc = start_fc + rs*scan_num
+                        if fc != self.tuned_fc:
+                            self.sdr.fc = self.tuned_fc = fc
+                        self.read_scan(buf[scan_num])
+                except IOError as e:
+                    print(str(e))
+                    self.stop_event.wait(1)
+                    complete = False
+                    break
+            if not complete:
+                continue
+            with self.buffer_lock:
+                if generation != self.generation:
+                    continue
+                if self.latest is not None:
+                    self.sweeps_dropped += 1
+                self.latest = target
+                self.sweeps_read += 1
+            self.new_samples.set()
+
+    def compute(self):
+        # PSD thread, all the scans of the sweep at once, the sweep goes to the ring buffer
+        while not self.stop_event.is_set():
+            if not self.new_samples.wait(0.5):
+                continue
+            with self.buffer_lock:
+                self.new_samples.clear()
+                if self.latest is None:
+                    continue
+                self.reading = self.latest
+                self.latest = None
+                generation = self.generation
+                buf = self.samples[self.reading]
 
-        # prepare space in buffer
-        # TODO: use indexing to avoid recreating buffer each time
-        self.image_buffer = np.roll(self.image_buffer, 1, axis=0)
-
-        for scan_num, start_ind in enumerate(range(0, NUM_SCANS_PER_SWEEP*NFFT, NFFT)):
-            self.sdr.fc += self.sdr.rs*scan_num
-
-            # estimate PSD for one scan
-            samples = self.sdr.read_samples(NUM_SAMPLES_PER_SCAN)
-            psd_scan, f = psd(samples, NFFT=NFFT)
-
-            self.image_buffer[0, start_ind: start_ind+NFFT] = 10*np.log10(psd_scan)
+            try:
+                row = psd_db(buf).ravel()
+            except Exception as e:
+                print(str(e))
+                row = None
+
+            if row is not None and self.analysis:
+                # the buffer is not written while it is being read
+                self.analysis.add(buf, row)
+
+            with self.buffer_lock:
+                if generation != self.generation:
+                    continue
+                self.reading = None
+                if row is None:
+                    continue
+                # the copy lands on the oldest row of the image shown, it is
+                # replaced by the newest sweep in the next frame anyway
+                index = (self.ring_index - 1) % NUM_BUFFERED_SWEEPS
+                self.ring[index] = row
+                self.ring[index + NUM_BUFFERED_SWEEPS] = row
+                self.ring_index = index
+                self.sweeps_computed += 1
 
-        # plot entire sweep
+    def update(self, *args):
+        # renderer, only shows the last sweep computed
+        with self.buffer_lock:
+            if self.sweeps_rendered == self.sweeps_computed:
+                self.frames_skipped += 1
+                return self.image,
+            computed = self.sweeps_computed
+            self.sweeps_hidden += computed - self.sweeps_rendered - 1
+            self.sweeps_rendered = computed
+
+            # plot entire sweep, newest first
+            self.image_buffer = self.ring[self.ring_index:self.ring_index + NUM_BUFFERED_SWEEPS]
         self.image.set_array(self.image_buffer)
 
-        # restore original center freq.
-        self.sdr.fc = start_fc
-
         return self.image,
 
+    def stats(self):
+        return ('sweeps read %d, dropped before PSD %d, computed %d, not shown %d, '
+                'frames without new sweep %d') % (
+            self.sweeps_read, self.sweeps_dropped, self.sweeps_computed,
+            self.sweeps_hidden, self.frames_skipped)
+
+    def start_threads(self):
+        with self.sdr_lock:
+            if self.start_fc is None:
+                self.start_fc = self.tuned_fc = self.sdr.fc
+        threads = [threading.Thread(target=self.acquire), threading.Thread(target=self.compute)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        return threads
+
+    def stop_threads(self, threads):
+        self.stop_event.set()
+        for thread in threads:
+            thread.join(2)
+
     def start(self):
+        threads = self.start_threads()
         self.update_plot_labels()
         if sys.platform == 'darwin':
             # Disable blitting. The matplotlib.animation's restore_region()
@@ -162,17 +396,133 @@ class Waterfall(object):
 
         pyl.show()
 
+        self.stop_threads(threads)
+        print(self.stats())
+
         return
 
 
+class ChannelAnalysis(object):
+    # noise floor, SNR, activity and frequency offset of the AIS channels from
+    # the single scan sweeps of the PSD thread. Only a few numbers and the
+    # channel bins are kept per sweep.
+    def __init__(self, fc, rs, channels=AIS_CHANNELS):
+        self.channels = channels
+        bins = fc + (np.arange(NFFT) - NFFT//2)*rs/NFFT
+        self.slices = []
+        self.offsets = []
+        noise = (np.abs(bins - fc) > 4*rs/NFFT) & (np.abs(bins - fc) < 0.4*rs)
+        for freq in channels:
+            first, last = np.searchsorted(bins, [freq - CHANNEL_HALF_WIDTH, freq + CHANNEL_HALF_WIDTH])
+            self.slices.append(slice(first, last))
+            self.offsets.append(bins[first:last] - freq)
+            noise &= np.abs(bins - freq) > 2*CHANNEL_HALF_WIDTH
+        self.noise = noise
+        self.floors = []
+        self.spectra = [[] for i in channels]
+        self.rms = []
+        self.clipped = 0
+        self.count = 0
+
+    def add(self, samples, row):
+        self.floors.append(np.median(row[self.noise]))
+        for spectrum, bins in zip(self.spectra, self.slices):
+            spectrum.append(row[bins])
+        self.rms.append(np.sqrt(np.mean(samples.real**2 + samples.imag**2)))
+        # only 0 and 255 from the ADC, exactly -1 and 1, are at the limits
+        self.clipped += (np.count_nonzero(np.abs(samples.real) >= 1.0) +
+                         np.count_nonzero(np.abs(samples.imag) >= 1.0))
+        self.count += 2*samples.size
+
+    def channel(self, i):
+        # (noise dB, SNR dB, activity, offset Hz or None)
+        spectra = 10**(np.array(self.spectra[i], dtype=np.float64)/10)
+        power = 10*np.log10(spectra.mean(axis=1))
+        noise = np.median(power)
+        active = power > noise + ACTIVE_DB
+        offset = None
+        if active.any():
+            # centroid of the power over the idle channel, weighted by burst
+            excess = np.clip(spectra[active] - np.median(spectra, axis=0), 0, None)
+            total = excess.sum(axis=1)
+            centroids = (excess*self.offsets[i]).sum(axis=1)/np.maximum(total, 1e-30)
+            offset = float(np.sum(centroids*total)/np.sum(total))
+        return noise, power.max() - noise, active.mean(), offset
+
+    def result(self, gain, ppm):
+        if not self.count:
+            return None
+        result = {'sweeps': len(self.floors), 'noise_floor': float(np.median(self.floors)),
+                  'rms': float(np.median(self.rms)), 'clipped': self.clipped/self.count,
+                  'channels': []}
+        offsets = []
+        for i, freq in enumerate(self.channels):
+            noise, snr, activity, offset = self.channel(i)
+            result['channels'].append((freq, noise, snr, activity, offset))
+            if offset is not None:
+                offsets.append(offset/freq*1e6)
+
+        # gain to take the noise to TARGET_RMS, always down if the ADC clips
+        step = 20*np.log10(TARGET_RMS/max(result['rms'], 1e-6))
+        if result['clipped'] > MAX_CLIPPED:
+            step = min(step, -GAIN_INC)
+        result['gain'] = float(np.clip(round(gain + np.clip(step, -20, 20)), 0, MAX_GAIN))
+
+        # a signal seen below its channel means the crystal is fast, the correction goes up
+        result['ppm'] = ppm
+        if offsets:
+            result['ppm'] = int(round(ppm - np.mean(offsets)))
+        return result
+
+def report(result, gain, ppm):
+    if not result:
+        return 'no samples'
+    lines = ['%d sweeps, noise floor %.1f dB, ADC rms %.3f, clipped %.5f%%' % (
+        result['sweeps'], result['noise_floor'], result['rms'], 100*result['clipped'])]
+    for freq, noise, snr, activity, offset in result['channels']:
+        line = '%.3f MHz: noise %.1f dB, peak SNR %.1f dB, active %.0f%%' % (
+            freq/1e6, noise, snr, 100*activity)
+        if offset is None:
+            line += ', no bursts'
+        else:
+            line += ', offset %+.0f Hz (%+.1f ppm)' % (offset, offset/freq*1e6)
+        lines.append(line)
+    lines.append('recommended gain %g (now %g), ppm %d (now %d)' % (result['gain'], gain, result['ppm'], ppm))
+    return '\n'.join(lines)
+
+def analyze(sdr, gain, ppm, seconds=ANALYSIS_SECONDS):
+    wf = Waterfall(sdr, plot=False)
+    sdr.gain = gain
+    # pyrtlsdr fails setting 0
+    if ppm:
+        sdr.freq_correction = ppm
+    wf.set_sweep(1, ANALYSIS_RATE, ANALYSIS_FC)
+    wf.analysis = ChannelAnalysis(ANALYSIS_FC, ANALYSIS_RATE)
+    threads = wf.start_threads()
+    wf.stop_event.wait(seconds)
+    wf.stop_threads(threads)
+    return wf.analysis.result(gain, ppm)
+
 def main():
 
+    if sys.argv[1] == 'analyze':
+        gain = float(sys.argv[2])
+        ppm = int(float(sys.argv[3]))
+        seconds = float(sys.argv[4]) if len(sys.argv) > 4 else ANALYSIS_SECONDS
+        sdr = RtlSdr()
+        try:
+            print(report(analyze(sdr, gain, ppm, seconds), gain, ppm))
+        finally:
+            sdr.close()
+        return
+
     gin=sys.argv[1]
     ppm=sys.argv[2]
     chn=sys.argv[3]
     if ppm=='0': ppm='1'
     if chn=='a': frc=161.975e6
     if chn=='b': frc=162.025e6
+    if chn=='w': frc=161.975e6
 
     sdr = RtlSdr()
     wf = Waterfall(sdr)
@@ -182,6 +532,9 @@ def main():
     sdr.fc = frc
     sdr.gain = float(gin)
     sdr.freq_correction = int(float(ppm))
+    if chn=='w':
+        wf.channel_sweep = 1, sdr.rs, sdr.fc
+        wf.set_sweep(*wideband_sweep())
 
     wf.start()
 